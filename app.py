@@ -1,18 +1,16 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import io
+import os
+import time
+from collections import OrderedDict
 import gspread
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
 import altair as alt
 import calendar
 from datetime import datetime, date, timedelta
-
-# --- GLOBAL VARIABLES ---
-thai_months = ["มกราคม", "กุมภาพันธ์", "มีนาคม", "เมษายน", "พฤษภาคม", "มิถุนายน",
-               "กรกฎาคม", "สิงหาคม", "กันยายน", "ตุลาคม", "พฤศจิกายน", "ธันวาคม"]
+from pipeline import (thai_months, SHEET_MASTER_URL, CACHE_DIR, credentials_from_info, get_data_source,
+                      data_source_id, StageCache, process_data, DiskSnapshot, DataRefresher, REFRESH_DEBOUNCE,
+                      build_day_matrix, slice_dates, slice_month, pct_of)
 
 # --- COLOR SETTINGS ---
 COLOR_SALES = "#33FFFF"
@@ -292,44 +290,10 @@ st.markdown("""
 # ==========================================
 # 2. SETTINGS & HELPERS
 # ==========================================
-FOLDER_ID_DATA = "1ciI_X2m8pVcsjRsPuUf5sg--6uPSPPDp"  # ไฟล์ยอดขาย JST
-FOLDER_ID_ADS = "1ZE76TXNA_vNeXjhAZfLgBQQGIV0GY7w8"   # ไฟล์ค่า ADS
-SHEET_MASTER_URL = "https://docs.google.com/spreadsheets/d/1Q3akHm1GKkDI2eilGfujsd9pO7aOjJvyYJNuXd98lzo/edit?gid=0#gid=0" # ชีทตั้งค่าทุน
-
-def safe_float(val):
-    if pd.isna(val) or val == "" or val is None: return 0.0
-    s = str(val).strip().replace(',', '').replace('฿', '').replace(' ', '')
-    if s in ['-', 'nan', 'NaN', 'None']: return 0.0
-    try:
-        if '%' in s: return float(s.replace('%', '')) / 100
-        return float(s)
-    except: return 0.0
-
-def safe_date(val):
-    try: return pd.to_datetime(val).date()
-    except: return None
-
 def get_val_color(val, default_hex):
     if val < 0: return COLOR_NEGATIVE
     return default_hex
 
-# ฟังก์ชันจัดกึ่งกลางชื่อขนส่งให้ตรงกับคอลัมน์ใน Master
-def normalize_courier_name(courier):
-    if pd.isna(courier) or courier == "":
-        return "Standard Delivery - ส่งธรรมดาในประเทศ"
-    
-    courier = str(courier).strip()
-    mapping = {
-        "J&T Express": "J&T Express", "J&T": "J&T Express",
-        "Flash Express": "Flash Express", "Flash": "Flash Express",
-        "Kerry Express": "Kerry Express", "Kerry": "Kerry Express",
-        "Thailand Post": "ThailandPost", "ThailandPost": "ThailandPost",
-        "DHL Domestic": "DHL_1", "DHL": "DHL_1",
-        "Shopee Express": "SPX Express", "SPX Express": "SPX Express",
-        "Lazada Express": "LEX TH", "LEX": "LEX TH"
-    }
-    return mapping.get(courier, courier)
-
 # ------------------------------
 # GLOBAL METRIC CARD COMPONENT (อัปเดตเป็น 6 กล่อง)
 # ------------------------------
@@ -390,336 +354,181 @@ def render_metric_row(total_sales, total_ops, total_com, total_cost_prod, total_
 """
     st.markdown(html, unsafe_allow_html=True)
 
+# ------------------------------
+# HTML TABLE (ใช้ร่วมกันใน REPORT_MONTH / REPORT_ADS / REPORT_DAILY)
+# ------------------------------
+# สร้างเซลล์ทีละคอลัมน์ (หรือทั้งตาราง วัน x SKU ทีเดียว) แล้วต่อเป็นแถวด้วย join ครั้งเดียว
+# แทนการวน iterrows + html += ทีละเซลล์ markup ที่ได้ต้องเหมือนเดิมทุกตัวอักษร
+NEG_CELL_ATTR = ' style="color: #FF0000 !important; font-weight: bold !important;" class="negative-value"'
+
+def fmt_col(values, spec, suffix="", blank_nan=False):
+    # format(v, spec) + suffix ทั้ง array (1 หรือ 2 มิติ), 0 -> "-" (blank_nan=True: NaN -> "-" ด้วย)
+    # format เฉพาะค่าที่ไม่ซ้ำแล้วกระจายกลับ ตาราง วัน x SKU ส่วนใหญ่เป็น 0 ซ้ำๆ
+    arr = np.asarray(values, dtype=float)
+    uniq, inverse = np.unique(arr, return_inverse=True)
+    text = np.array([("-" if v == 0 or (blank_nan and v != v) else format(v, spec) + suffix) for v in uniq.tolist()], dtype=object)
+    return text[inverse.reshape(arr.shape)]
+
+def td_col(text, open_tag):
+    # open_tag: '<td ...>' เดียวทั้งคอลัมน์ หรือ array ต่อเซลล์ (เช่นเลือกสีตามค่าบวก/ลบด้วย np.where)
+    return np.asarray(open_tag, dtype=object) + text + '</td>'
+
+def join_rows(blocks, row_open='<tr>'):
+    # blocks: เซลล์ HTML เป็นคอลัมน์ (1 มิติ) หรือกลุ่มคอลัมน์ (2 มิติ แถว x คอลัมน์) เรียงซ้ายไปขวา
+    grid = np.hstack([b if b.ndim == 2 else b[:, None] for b in blocks])
+    return ''.join(row_open + ''.join(row) + '</tr>' for row in grid.tolist())
+
+def sku_header_cells(skus, names):
+    return ''.join(f'<th class="th-sku">{sku}<span class="sku-header">{str(names.get(sku, ""))}</span></th>' for sku in skus)
+
+# ตาราง วัน x SKU ที่กว้างมาก (เช่น "แสดงรายการทั้งหมด") แบ่งคอลัมน์ SKU เป็นหน้า ส่งไป browser ทีละหน้า
+# คอลัมน์ fix-m-* และยอด "รวม" ยังคิดจาก SKU ทั้งหมดเสมอ
+SKU_PAGE_SIZE = 40
+
+GRID_STYLE_MAX_CELLS = 6000  # Styler ส่งข้อความที่ format แล้วของทุกช่องไปด้วย (~2 เท่าของ Arrow) ตารางใหญ่กว่านี้จึงไม่ระบายสีติดลบ
+
+def show_grid(frame, pinned, pct_cols=(), num_format="%,.0f", pct_format="%,.1f%%", help_text=None):
+    # โหมด Grid: ส่งตัวเลขดิบผ่าน Arrow ให้ st.dataframe จัดรูปแบบฝั่ง browser แทน HTML ที่ format แล้ว
+    # คอลัมน์ pinned (วันที่ / SKU) ค้างซ้ายตอนเลื่อน ค่าติดลบเป็นสีแดงผ่าน Styler (เฉพาะตารางไม่ใหญ่)
+    help_text = help_text or {}
+    config = {}
+    for col in frame.columns:
+        if col in pinned: config[col] = st.column_config.Column(pinned=True, help=help_text.get(col))
+        else: config[col] = st.column_config.NumberColumn(format=pct_format if col in pct_cols else num_format, help=help_text.get(col))
+    data = frame
+    if frame.size <= GRID_STYLE_MAX_CELLS:
+        num_cols = [col for col in frame.columns if col not in pinned]
+        data = frame.style.apply(lambda d: np.where(d < 0, 'color: #FF0000;', ''), axis=None, subset=num_cols)
+    st.dataframe(data, column_config=config, hide_index=True, use_container_width=True, height=min(35 * (len(frame) + 1) + 3, 738))
+
+def sku_page_slice(skus, page):
+    # page เริ่มที่ 1 ถ้าเกินจำนวนหน้า (เช่นหลังเปลี่ยน filter) กลับไปหน้า 1
+    n_pages = max(1, -(-len(skus) // SKU_PAGE_SIZE))
+    if not 1 <= page <= n_pages: page = 1
+    labels = [f"SKU {i * SKU_PAGE_SIZE + 1}-{min((i + 1) * SKU_PAGE_SIZE, len(skus))} จาก {len(skus)}" for i in range(n_pages)]
+    return skus[(page - 1) * SKU_PAGE_SIZE:page * SKU_PAGE_SIZE], {'page': page, 'labels': labels}
+
+# ------------------------------
+# DATA (การโหลด/คำนวณอยู่ใน pipeline.py ส่วนนี้คือส่วนที่ผูกกับ Streamlit)
+# ------------------------------
 @st.cache_resource
 def get_drive_service():
     if "gcp_service_account" not in st.secrets:
         st.error("Error: ไม่พบ Secrets กรุณาตรวจสอบการตั้งค่า")
         st.stop()
-    creds_dict = dict(st.secrets["gcp_service_account"])
-    scopes = ['https://www.googleapis.com/auth/drive.readonly', 'https://www.googleapis.com/auth/spreadsheets']
-    return service_account.Credentials.from_service_account_info(creds_dict, scopes=scopes)
-
-def load_raw_files():
-    creds = get_drive_service()
-    service = build('drive', 'v3', credentials=creds)
-    gc = gspread.authorize(creds)
-
-    def get_files(folder_id):
-        try:
-            results = service.files().list(q=f"'{folder_id}' in parents and trashed=false", fields="files(id, name)").execute()
-            return results.get('files', [])
-        except: return []
-
-    def read_file(file_id, filename):
-        try:
-            request = service.files().get_media(fileId=file_id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while done is False: status, done = downloader.next_chunk()
-            fh.seek(0)
-            if filename.lower().endswith('.csv'): return pd.read_csv(fh, dtype={'หมายเลขคำสั่งซื้อออนไลน์': str})
-            elif filename.lower().endswith(('.xlsx', '.xls')): return pd.read_excel(fh)
-        except: pass
-        return None
-
-    files_data = get_files(FOLDER_ID_DATA)
-    df_list = []
-    for f in files_data:
-        df = read_file(f['id'], f['name'])
-        if df is not None:
-            if 'หมายเลขคำสั่งซื้อออนไลน์' in df.columns:
-                df['หมายเลขคำสั่งซื้อออนไลน์'] = df['หมายเลขคำสั่งซื้อออนไลน์'].astype(str).str.replace(r'\.0$', '', regex=True)
-            df_list.append(df)
-    df_data = pd.concat(df_list, ignore_index=True) if df_list else pd.DataFrame()
-
-    files_ads = get_files(FOLDER_ID_ADS)
-    df_ads_list = []
-    for f in files_ads:
-        df = read_file(f['id'], f['name'])
-        if df is not None: df_ads_list.append(df)
-    df_ads_raw = pd.concat(df_ads_list, ignore_index=True) if df_ads_list else pd.DataFrame()
-
-    df_master = pd.DataFrame()
-    df_fix = pd.DataFrame()
-    try:
-        sh = gc.open_by_url(SHEET_MASTER_URL)
-        df_master = pd.DataFrame(sh.worksheet("MASTER_ITEM").get_all_records())
-        try: df_fix = pd.DataFrame(sh.worksheet("FIX_COST").get_all_records())
-        except: 
-            try: df_fix = pd.DataFrame(sh.worksheet("FIXED_COST").get_all_records())
-            except: pass
-    except: pass
-
-    return df_data, df_ads_raw, df_master, df_fix
+    return credentials_from_info(st.secrets["gcp_service_account"])
 
-@st.cache_data(ttl=600)
-def process_data():
-    df_data, df_ads_raw, df_master, df_fix_cost = load_raw_files()
+def filter_skus_by_category(current_skus, selected_category, sku_dim):
+    if selected_category == "แสดงทั้งหมด":
+        return current_skus
+    members = sku_dim['by_type'].get(selected_category, frozenset())
+    return [sku for sku in current_skus if sku in members]
 
-    if df_data.empty: return pd.DataFrame(), pd.DataFrame(), {}, [], {}
+# SHOP_SNAPSHOT_ONLY=1: ให้ cron รัน `python pipeline.py` เป็นคนโหลด/คำนวณข้อมูล แอปเปิดแค่ชุดล่าสุดจากดิสก์
+# (ตรวจชุดใหม่ทุก SNAPSHOT_POLL_INTERVAL วินาที ไม่โหลดจาก Drive เองเลย)
+SNAPSHOT_ONLY = os.environ.get("SHOP_SNAPSHOT_ONLY", "") not in ("", "0")
 
-    # --- 1. PREPARE MASTER ITEM ---
-    if not df_master.empty:
-        df_master.columns = df_master.columns.astype(str).str.strip()
-        
-        # [แก้ไข] เพิ่มการเปลี่ยนชื่อคอลัมน์จาก 'ทุน' เป็น 'ต้นทุน' อัตโนมัติ
-        if 'ทุน' in df_master.columns:
-            df_master.rename(columns={'ทุน': 'ต้นทุน'}, inplace=True)
-            
-        if 'ชื่อสินค้า' not in df_master.columns:
-            if len(df_master.columns) >= 2:
-                col_b = df_master.columns[1]
-                df_master.rename(columns={col_b: 'ชื่อสินค้า'}, inplace=True)
-            else:
-                df_master['ชื่อสินค้า'] = df_master['SKU'] if 'SKU' in df_master.columns else "Unknown"
-        
-        if 'Type' not in df_master.columns:
-            df_master['Type'] = 'กลุ่ม ปกติ'
-        df_master['Type'] = df_master['Type'].fillna('กลุ่ม ปกติ').astype(str).str.strip()
-
-    # --- 2. PREPARE DATA ---
-    cols = [c for c in ['หมายเลขคำสั่งซื้อออนไลน์', 'สถานะคำสั่งซื้อ', 
-            'บริษัทขนส่ง', 'เวลาสั่งซื้อ', 'รูปแบบสินค้า', 'จำนวน', 
-            'รายละเอียดยอดที่ชำระแล้ว', 'ผู้สร้างคำสั่งซื้อ', 
-            'วิธีการชำระเงิน', 'ชื่อสินค้า', 'ประเภทการทำงาน'] 
-            if c in df_data.columns]
-    
-    df = df_data[cols].copy()
-
-    if 'สถานะคำสั่งซื้อ' in df.columns:
-        df = df[~df['สถานะคำสั่งซื้อ'].isin(['ยกเลิก'])]
-
-    df['Date'] = df['เวลาสั่งซื้อ'].apply(safe_date)
-    df = df.dropna(subset=['Date'])
-    
-    df['SKU_Main'] = df['รูปแบบสินค้า'].astype(str).str.split('-').str[0].str.strip()
-
-    # --- 3. MERGE WITH MASTER ITEM ---
-    master_cols = ['SKU', 'ชื่อสินค้า', 'Type', 'ต้นทุน', 'ราคากล่อง', 'ค่าส่งเฉลี่ย',
-                   'ค่าคอมมิชชั่น Admin', 'ค่าคอมมิชชั่น Telesale',
-                   'J&T Express', 'Flash Express', 'ThailandPost', 
-                   'DHL_1', 'LEX TH', 'SPX Express',
-                   'Express Delivery - ส่งด่วน', 'Standard Delivery - ส่งธรรมดาในประเทศ']
-    
-    master_cols = [c for c in master_cols if c in df_master.columns]
-    df_master_filtered = df_master[master_cols].drop_duplicates('SKU')
-
-    df['SKU_Raw'] = df['รูปแบบสินค้า'].astype(str).str.strip()
-    df['SKU_Norm'] = df['SKU_Raw'].str.replace(' ', '', regex=False)
-    df['SKU_Norm_Root'] = df['SKU_Norm'].str.split('-').str[0]
-
-    df_master_filtered['SKU_Norm'] = df_master_filtered['SKU'].astype(str).str.strip().str.replace(' ', '', regex=False)
-    df_merged = pd.merge(df, df_master_filtered, on='SKU_Norm', how='left')
-
-    if 'SKU_x' in df_merged.columns: df_merged.rename(columns={'SKU_x': 'SKU_Original'}, inplace=True)
-    if 'SKU_y' in df_merged.columns: df_merged.rename(columns={'SKU_y': 'SKU_Master'}, inplace=True)
-    if 'ชื่อสินค้า_y' in df_merged.columns: df_merged.rename(columns={'ชื่อสินค้า_y': 'ชื่อสินค้า_Master'}, inplace=True)
-    if 'ชื่อสินค้า_x' in df_merged.columns: df_merged.rename(columns={'ชื่อสินค้า_x': 'ชื่อสินค้า'}, inplace=True)
-
-    # Fallback Logic
-    df_master_root = df_master_filtered.copy()
-    df_root_lookup = pd.merge(df[['SKU_Norm_Root']], df_master_root, left_on='SKU_Norm_Root', right_on='SKU_Norm', how='left')
-    
-    cols_to_fill = ['ต้นทุน', 'ราคากล่อง', 'ค่าส่งเฉลี่ย', 
-                    'ค่าคอมมิชชั่น Admin', 'ค่าคอมมิชชั่น Telesale', 'Type']
-
-    for col in cols_to_fill:
-        if col in df_merged.columns and col in df_root_lookup.columns:
-            df_merged[col] = df_merged[col].combine_first(df_root_lookup[col])
-        elif col not in df_merged.columns and col in df_root_lookup.columns:
-             df_merged[col] = df_root_lookup[col]
-
-    root_name_map = df_master_filtered.set_index('SKU_Norm')['ชื่อสินค้า'].to_dict()
-    df_merged['Name_Root'] = df_merged['SKU_Norm_Root'].map(root_name_map)
-    
-    if 'ชื่อสินค้า_Master' in df_merged.columns:
-        df_merged['ชื่อสินค้า'] = df_merged['ชื่อสินค้า_Master'].combine_first(df_merged['Name_Root']).combine_first(df_merged['ชื่อสินค้า'])
-    else:
-        df_merged['ชื่อสินค้า'] = df_merged['Name_Root'].combine_first(df_merged['ชื่อสินค้า'])
-
-    # --- 4. CALCULATE COST ---
-    numeric_cols = ['จำนวน', 'รายละเอียดยอดที่ชำระแล้ว', 'ต้นทุน', 'ราคากล่อง', 'ค่าส่งเฉลี่ย']
-    for col in numeric_cols:
-        if col in df_merged.columns:
-            df_merged[col] = df_merged[col].apply(safe_float)
-    
-    df_merged['CAL_COST'] = df_merged['จำนวน'] * df_merged['ต้นทุน']
-    df_merged['BOX_COST_PER_LINE'] = df_merged['ราคากล่อง'].fillna(0)
-    df_merged['DELIV_COST_PER_LINE'] = df_merged['ค่าส่งเฉลี่ย'].fillna(0)
-
-    def get_shipping_percent(row):
-        courier = str(row.get('บริษัทขนส่ง', '')).strip()
-        normalized_courier = normalize_courier_name(courier)
-        if normalized_courier in row:
-            return safe_float(row[normalized_courier])
-        return safe_float(row.get('Standard Delivery - ส่งธรรมดาในประเทศ', 0))
-
-    df_merged['SHIP_PERCENT'] = df_merged.apply(get_shipping_percent, axis=1)
-
-    def calculate_cod_cost(row):
-        payment = str(row.get('วิธีการชำระเงิน', '')).lower()
-        is_cod = any(cod_term in payment for cod_term in ['cod', 'ปลายทาง'])
-        if is_cod and row['SHIP_PERCENT'] > 0:
-            return row['รายละเอียดยอดที่ชำระแล้ว'] * row['SHIP_PERCENT'] * 1.07
-        return 0
-
-    df_merged['CAL_COD_COST'] = df_merged.apply(calculate_cod_cost, axis=1)
-
-    def calculate_role(row):
-        work_type = str(row.get('ประเภทการทำงาน', '')).lower()
-        creator = str(row.get('ผู้สร้างคำสั่งซื้อ', '')).lower()
-        if 'admin' in work_type or 'แอดมิน' in work_type or 'admin' in creator: return 'Admin'
-        if 'tele' in work_type or 'เทเล' in work_type or 'tele' in creator: return 'Telesale'
-        return 'Unknown'
-
-    df_merged['Calculated_Role'] = df_merged.apply(calculate_role, axis=1)
-
-    com_admin = df_merged.get('ค่าคอมมิชชั่น Admin', 0).fillna(0).apply(safe_float)
-    com_tele = df_merged.get('ค่าคอมมิชชั่น Telesale', 0).fillna(0).apply(safe_float)
-
-    df_merged['CAL_COM_ADMIN'] = np.where((df_merged['Calculated_Role'] == 'Admin'), 
-                                          df_merged['รายละเอียดยอดที่ชำระแล้ว'] * com_admin, 0)
-    df_merged['CAL_COM_TELESALE'] = np.where((df_merged['Calculated_Role'] == 'Telesale'), 
-                                             df_merged['รายละเอียดยอดที่ชำระแล้ว'] * com_tele, 0)
-
-    df_merged['SKU_Main'] = df_merged['SKU_Norm_Root']
-    df_merged['Display_Name'] = df_merged['ชื่อสินค้า']
-
-    # --- AGGREGATE ---
-    order_agg = {
-        'Date': 'first',
-        'SKU_Main': 'first',
-        'ชื่อสินค้า': 'first',
-        'จำนวน': 'sum',
-        'รายละเอียดยอดที่ชำระแล้ว': 'sum',
-        'CAL_COST': 'sum', 
-        'BOX_COST_PER_LINE': 'max', 
-        'DELIV_COST_PER_LINE': 'max',
-        'CAL_COD_COST': 'sum',
-        'CAL_COM_ADMIN': 'sum',
-        'CAL_COM_TELESALE': 'sum',
-        'Type': 'first'
-    }
-
-    df_order = df_merged.groupby('หมายเลขคำสั่งซื้อออนไลน์').agg(order_agg).reset_index()
-    df_order.rename(columns={'BOX_COST_PER_LINE': 'BOX_COST', 'DELIV_COST_PER_LINE': 'DELIV_COST'}, inplace=True)
-
-    # --- ADS ---
-    df_ads_agg = pd.DataFrame(columns=['Date', 'SKU_Main', 'Ads_Amount'])
-    if not df_ads_raw.empty:
-        col_cost = next((c for c in ['จำนวนเงินที่ใช้จ่ายไป (THB)', 'Cost', 'Amount'] if c in df_ads_raw.columns), None)
-        col_date = next((c for c in ['วัน', 'Date'] if c in df_ads_raw.columns), None)
-        col_camp = next((c for c in ['ชื่อแคมเปญ', 'Campaign'] if c in df_ads_raw.columns), None)
-
-        if col_cost and col_date and col_camp:
-            df_ads_raw['Date'] = df_ads_raw[col_date].apply(safe_date)
-            df_ads_raw = df_ads_raw.dropna(subset=['Date'])
-            df_ads_raw[col_cost] = df_ads_raw[col_cost].apply(safe_float)
-            df_ads_raw['SKU_Extracted'] = df_ads_raw[col_camp].astype(str).str.extract(r'\[(.*?)\]')
-            df_ads_raw['SKU_Main'] = df_ads_raw['SKU_Extracted'].str.replace(' ', '', regex=False)
-            
-            df_ads_agg = df_ads_raw.groupby(['Date', 'SKU_Main'])[col_cost].sum().reset_index(name='Ads_Amount')
-
-    # --- FINAL DAILY AGG ---
-    daily_agg = {
-        'ชื่อสินค้า': 'first',
-        'จำนวนออเดอร์': 'count',
-        'จำนวน': 'sum',
-        'รายละเอียดยอดที่ชำระแล้ว': 'sum',
-        'CAL_COST': 'sum',
-        'BOX_COST': 'sum',
-        'DELIV_COST': 'sum',
-        'CAL_COD_COST': 'sum',
-        'CAL_COM_ADMIN': 'sum',
-        'CAL_COM_TELESALE': 'sum',
-        'Type': 'first'
-    }
+@st.cache_resource
+def get_refresher():
+    # snapshot ชุดเดียวกับที่ `python pipeline.py` เขียน (แยกตามแหล่งข้อมูล) ชุดที่ใหม่กว่าจาก cron ถูกสลับเข้ามาอัตโนมัติ
+    disk = DiskSnapshot(os.path.join(CACHE_DIR, "snapshot"), data_source_id())
+    if SNAPSHOT_ONLY: return DataRefresher(None, warm_start=disk.load, poll=disk.load_newer)
+    stages = StageCache()
+
+    def build():
+        data = process_data(get_data_source(get_drive_service), stages=stages)
+        disk.save(data, stages.key('costing'))
+        return data
+    return DataRefresher(build, warm_start=disk.load, poll=disk.load_newer)
+
+def format_age(seconds):
+    seconds = int(max(seconds, 0))
+    if seconds < 60: return f"{seconds} วินาที"
+    if seconds < 3600: return f"{seconds // 60} นาที"
+    return f"{seconds // 3600} ชม. {seconds % 3600 // 60} นาที"
 
-    df_order_renamed = df_order.rename(columns={'หมายเลขคำสั่งซื้อออนไลน์': 'จำนวนออเดอร์'})
-    df_daily = df_order_renamed.groupby(['Date', 'SKU_Main']).agg(daily_agg).reset_index()
-
-    if not df_ads_agg.empty:
-        df_daily = pd.merge(df_daily, df_ads_agg, on=['Date', 'SKU_Main'], how='outer')
-    else: df_daily['Ads_Amount'] = 0
-
-    df_daily = df_daily.fillna(0)
-    df_daily['Other_Costs'] = df_daily['BOX_COST'] + df_daily['DELIV_COST'] + df_daily['CAL_COD_COST'] + df_daily['CAL_COM_ADMIN'] + df_daily['CAL_COM_TELESALE']
-    df_daily['Total_Cost'] = df_daily['CAL_COST'] + df_daily['Other_Costs'] + df_daily['Ads_Amount']
-    df_daily['Net_Profit'] = df_daily['รายละเอียดยอดที่ชำระแล้ว'] - df_daily['Total_Cost']
-
-    df_daily['Date'] = pd.to_datetime(df_daily['Date'])
-    df_daily['Year'] = df_daily['Date'].dt.year
-    df_daily['Month_Num'] = df_daily['Date'].dt.month
-    df_daily['Month_Thai'] = df_daily['Month_Num'].apply(lambda x: thai_months[x-1] if 1<=x<=12 else "")
-    df_daily['Day'] = df_daily['Date'].dt.day
-    df_daily['Date'] = df_daily['Date'].dt.date 
-
-    # --- MAPPING ---
-    sku_map = df_daily.groupby('SKU_Main')['ชื่อสินค้า'].last().to_dict()
-    master_skus_set = set()
-    if not df_master.empty and 'SKU' in df_master.columns:
-        master_skus_set = set(df_master['SKU'].astype(str).str.strip().str.replace(' ', '', regex=False))
-        if 'ชื่อสินค้า' in df_master.columns:
-            temp_master = df_master.copy()
-            temp_master['SKU_Norm'] = temp_master['SKU'].astype(str).str.strip().str.replace(' ', '', regex=False)
-            sku_map.update(temp_master.set_index('SKU_Norm')['ชื่อสินค้า'].to_dict())
-    
-    daily_skus_set = set(df_daily['SKU_Main'].unique())
-    sku_list = sorted(list(daily_skus_set.union(master_skus_set)))
-
-    sku_type_map = {}
-    if not df_master.empty and 'SKU' in df_master.columns and 'Type' in df_master.columns:
-        temp_master = df_master.copy()
-        temp_master['SKU_Norm'] = temp_master['SKU'].astype(str).str.strip().str.replace(' ', '', regex=False)
-        sku_type_map = temp_master.set_index('SKU_Norm')['Type'].to_dict()
-    
-    if 'Type' in df_daily.columns:
-        daily_type_map = df_daily.groupby('SKU_Main')['Type'].first().to_dict()
-        for k, v in daily_type_map.items():
-            if k not in sku_type_map:
-                sku_type_map[k] = v
-            elif pd.isna(sku_type_map[k]) or sku_type_map[k] == '':
-                sku_type_map[k] = v
-
-    return df_daily, df_fix_cost, sku_map, sku_list, sku_type_map
+# ------------------------------
+# PAGE RESULT CACHE (ต่อ session)
+# ------------------------------
+# ทุกครั้งที่ widget ใดเปลี่ยน Streamlit จะรันสคริปต์ใหม่ทั้งไฟล์ หน้า report จึงเก็บผลลัพธ์ที่คำนวณแล้ว
+# (ตัวเลข metric + HTML ตาราง) ไว้ใน session_state ตาม key (ชุดข้อมูล, หน้า, ช่วงวันที่, filter, หมวดหมู่, SKU ที่เลือก)
+# เก็บไม่เกิน PAGE_CACHE_SIZE รายการ และรวมกันไม่เกิน PAGE_CACHE_BYTES ต่อ session (ตัวที่ไม่ได้ใช้นานสุดถูกทิ้งก่อน)
+# ขนาดนับจาก HTML ตาราง (len) หรือ DataFrame ของโหมด Grid (memory_usage) เพราะช่วงวันที่ยาวๆ ตารางเดียวก็หลาย MB
+# รายการล่าสุดเก็บไว้เสมอแม้ใหญ่เกินงบ (กำลังแสดงอยู่)
+PAGE_CACHE_SIZE = 16
+PAGE_CACHE_BYTES = 32 * 1024 * 1024
+
+def page_view_size(view):
+    size = len(view.get('html') or "")
+    grid = view.get('grid')
+    if grid is not None:
+        try: size += int(grid['frame'].memory_usage(index=True, deep=True).sum())
+        except: pass
+    return size
+
+class PageCache:
+    def __init__(self, max_items=PAGE_CACHE_SIZE, max_bytes=PAGE_CACHE_BYTES):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.sizes = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        if key in self.items:
+            self.hits += 1
+            self.items.move_to_end(key)
+            return self.items[key]
+        self.misses += 1
+        value = compute()
+        self.items[key] = value
+        self.sizes[key] = page_view_size(value)
+        self.total_bytes += self.sizes[key]
+        while len(self.items) > 1 and (len(self.items) > self.max_items or self.total_bytes > self.max_bytes):
+            old_key, _ = self.items.popitem(last=False)
+            self.total_bytes -= self.sizes.pop(old_key)
+        return value
+
+def show_page_view(view, heading=None, pager_key=None):
+    # view: {'warning': ข้อความ} หรือ {'metrics': (ค่าสำหรับ render_metric_row), 'html': ตาราง, 'sku_pages': จาก sku_page_slice}
+    #       โหมด Grid ใช้ 'grid': (argument ของ show_grid) แทน 'html'
+    if 'warning' in view:
+        st.warning(view['warning'])
+        return
+    render_metric_row(*view['metrics'])
+    if 'grid' in view:
+        if heading: st.markdown(heading)
+        show_grid(**view['grid'])
+        return
+    pages = view.get('sku_pages')
+    if pager_key and pages and len(pages['labels']) > 1:
+        st.session_state[pager_key] = pages['page']
+        c_pg, _ = st.columns([1.5, 4.5])
+        with c_pg:
+            st.selectbox("คอลัมน์ SKU", range(1, len(pages['labels']) + 1), format_func=lambda p: pages['labels'][p - 1], key=pager_key)
+    if heading: st.markdown(heading)
+    st.markdown(view['html'], unsafe_allow_html=True)
 # ==========================================
 # 5. FRONTEND: UI
 # ==========================================
 try:
-    df_daily, df_fix_cost, master_map_lookup, master_sku_list, sku_type_map = process_data()
+    data_snapshot = get_refresher().get()
+    data = data_snapshot['data']
+    df_daily, sku_dim = data['df_daily'], data['sku_dim']
+    sku_report, rollups, range_sums = data['sku_report'], data['rollups'], data['range_sums']
 
     if df_daily.empty:
         st.warning("⚠️ ไม่พบข้อมูล กรุณาตรวจสอบ Google Drive")
         st.stop()
 
-    sku_name_lookup = df_daily.groupby('SKU_Main')['ชื่อสินค้า'].last().to_dict()
-    sku_name_lookup.update(master_map_lookup)
-    daily_skus = df_daily['SKU_Main'].unique().tolist()
-    all_skus_global = sorted(list(set(daily_skus + master_sku_list)))
-
-    sku_options_list_global = []
-    sku_map_reverse_global = {}
-    for sku in all_skus_global:
-        name = str(sku_name_lookup.get(sku, "")); name = "" if name in ['nan','0','0.0'] else name
-        label = f"{sku} : {name}"
-        sku_options_list_global.append(label)
-        sku_map_reverse_global[label] = sku
+    # ชื่อ / label / หมวดหมู่ของ SKU มาจาก sku_dim ที่สร้างไว้พร้อมข้อมูล (ไม่ต้องสร้างใหม่ทุก rerun)
+    sku_name_lookup, all_skus_global = sku_dim['names'], sku_dim['skus']
+    sku_options_list_global, sku_map_reverse_global = sku_dim['labels'], sku_dim['label_to_sku']
 
     # --- CATEGORY SETTINGS ---
     CATEGORY_OPTIONS = ["แสดงทั้งหมด", "กลุ่ม DKUB", "กลุ่ม SMASH", "กลุ่ม อาหารเสริม"]
-
-    def filter_skus_by_category(current_skus, selected_category, type_map):
-        if selected_category == "แสดงทั้งหมด":
-            return current_skus
-        
-        filtered = []
-        for sku in current_skus:
-            # Default to 'กลุ่ม ปกติ' if not found
-            sku_type = type_map.get(sku, 'กลุ่ม ปกติ')
-            if sku_type == selected_category:
-                filtered.append(sku)
-        return filtered
     # -------------------------
 
     if 'selected_skus' not in st.session_state: st.session_state.selected_skus = []
@@ -732,6 +541,10 @@ try:
     def cb_clear_g(): st.session_state.selected_skus_g = []
     def cb_clear_a(): st.session_state.selected_skus_a = []
 
+    if 'page_cache' not in st.session_state: st.session_state.page_cache = PageCache()
+    page_cache = st.session_state.page_cache
+    data_version = data['version']  # เวอร์ชันตามเนื้อหา: รีเฟรชเบื้องหลังที่ได้ชุดเดิมไม่ล้างแคชหน้า
+
     # --- [ส่วนที่เพิ่ม] ปุ่ม REFRESH (SIDEBAR) ---
     with st.sidebar:
         # 1. ส่วน User และปุ่มควบคุมระบบ
@@ -743,8 +556,19 @@ try:
              st.rerun()
 
         if st.button("🔄 รีเฟรชข้อมูลล่าสุด", type="primary", use_container_width=True):
-            st.cache_data.clear()
+            with st.spinner("⏳ กำลังโหลดข้อมูลใหม่..."):
+                get_refresher().refresh(debounce=REFRESH_DEBOUNCE)
             st.rerun()
+
+        refresher = get_refresher()
+        if data_snapshot.get('from_disk'):
+            st.caption(f"💾 ข้อมูลจากแคชบนดิสก์ เมื่อ {format_age(time.time() - data_snapshot['built_at'])} ที่แล้ว")
+        else:
+            st.caption(f"🕒 ข้อมูลเมื่อ {format_age(time.time() - data_snapshot['built_at'])} ที่แล้ว · โหลดล่าสุดใช้เวลา {data_snapshot['duration']:.1f} วินาที")
+        if refresher.refreshing:
+            st.caption("⏳ กำลังโหลดข้อมูลชุดใหม่อยู่เบื้องหลัง")
+        if refresher.last_error is not None:
+            st.caption(f"⚠️ โหลดข้อมูลรอบล่าสุดไม่สำเร็จ (ใช้ข้อมูลชุดเดิม): {refresher.last_error}")
         
         st.markdown("---") # เส้นขีดคั่น
 
@@ -785,9 +609,10 @@ try:
     selected_page = st.radio("เลือกหน้าจอที่ต้องการแสดงผล:", page_options, horizontal=True, label_visibility="collapsed")
 
     # --- PAGE 1: REPORT_MONTH ---
-    if selected_page == "📊 REPORT_MONTH":
+    @st.fragment
+    def page_report_month():
         st.markdown('<div class="header-bar"><div class="header-title"><i class="fas fa-chart-line"></i> สรุปยอดขายรายเดือน</div></div>', unsafe_allow_html=True)
-        all_years = sorted(df_daily['Year'].unique(), reverse=True)
+        all_years = sorted(df_daily['Year'].unique().tolist(), reverse=True)
         
         today = datetime.now().date()
         
@@ -827,247 +652,166 @@ try:
                 st.markdown("<div style='margin-top: 29px;'></div>", unsafe_allow_html=True)
                 st.button("🚀 ประมวลผล", type="primary", use_container_width=True, key="btn_run_m")
 
-        mask_date = (df_daily['Date'] >= start_date_m) & (df_daily['Date'] <= end_date_m)
-        df_base = df_daily[mask_date]
+        use_grid_m = st.toggle("⚡ แสดงแบบ Grid (เลื่อน/เรียงคอลัมน์ได้ ส่งข้อมูลน้อยกว่า)", key="m_grid")
 
-        sku_summary = df_base.groupby('SKU_Main').agg({'รายละเอียดยอดที่ชำระแล้ว': 'sum', 'Ads_Amount': 'sum', 'Net_Profit': 'sum'}).reset_index()
-        auto_skus = []
-        if "แสดงสินค้ากำไร" in filter_mode: auto_skus = sku_summary[sku_summary['Net_Profit'] > 0]['SKU_Main'].tolist()
-        elif "แสดงสินค้าขาดทุน" in filter_mode: auto_skus = sku_summary[sku_summary['Net_Profit'] < 0]['SKU_Main'].tolist()
-        elif "แสดงรายการทั้งหมด" in filter_mode: auto_skus = all_skus_global
-        else: auto_skus = sku_summary[(sku_summary['รายละเอียดยอดที่ชำระแล้ว'] > 0) | (sku_summary['Ads_Amount'] > 0)]['SKU_Main'].tolist()
+        def build_month_view():
+            df_base = slice_dates(df_daily, start_date_m, end_date_m)
 
-        selected_labels = st.session_state.selected_skus
-        selected_skus_real = [sku_map_reverse_global[l] for l in selected_labels]
-        
-        pre_final_skus = sorted(selected_skus_real) if selected_skus_real else sorted(auto_skus)
-        final_skus = filter_skus_by_category(pre_final_skus, sel_category, sku_type_map)
+            sku_summary = range_sums.by_sku(start_date_m, end_date_m).reset_index()
+            auto_skus = []
+            if "แสดงสินค้ากำไร" in filter_mode: auto_skus = sku_summary[sku_summary['Net_Profit'] > 0]['SKU_Main'].tolist()
+            elif "แสดงสินค้าขาดทุน" in filter_mode: auto_skus = sku_summary[sku_summary['Net_Profit'] < 0]['SKU_Main'].tolist()
+            elif "แสดงรายการทั้งหมด" in filter_mode: auto_skus = all_skus_global
+            else: auto_skus = sku_summary[(sku_summary['รายละเอียดยอดที่ชำระแล้ว'] > 0) | (sku_summary['Ads_Amount'] > 0)]['SKU_Main'].tolist()
 
-        if not final_skus: st.warning(f"⚠️ ไม่พบข้อมูลสินค้าตามเงื่อนไข ในช่วงวันที่ {start_date_m} ถึง {end_date_m} (หมวดหมู่: {sel_category})")
-        else:
-            df_view = df_base[df_base['SKU_Main'].isin(final_skus)]
+            selected_labels = st.session_state.selected_skus
+            selected_skus_real = [sku_map_reverse_global[l] for l in selected_labels]
         
-            total_sales = df_view['รายละเอียดยอดที่ชำระแล้ว'].sum()
-            total_ads = df_view['Ads_Amount'].sum()
-            total_cost_prod = df_view['CAL_COST'].sum()
-            total_ops = df_view['BOX_COST'].sum() + df_view['DELIV_COST'].sum() + df_view['CAL_COD_COST'].sum()
-            total_com = df_view['CAL_COM_ADMIN'].sum() + df_view['CAL_COM_TELESALE'].sum()
-            total_cost_all = total_cost_prod + total_ops + total_com + total_ads
-            net_profit = total_sales - total_cost_all
+            pre_final_skus = sorted(selected_skus_real) if selected_skus_real else sorted(auto_skus)
+            final_skus = filter_skus_by_category(pre_final_skus, sel_category, sku_dim)
 
-            render_metric_row(total_sales, total_ops, total_com, total_cost_prod, total_ads, net_profit)
-
-            date_list = pd.date_range(start_date_m, end_date_m)
-            matrix_data = []
+            if not final_skus: return {'warning': f"⚠️ ไม่พบข้อมูลสินค้าตามเงื่อนไข ในช่วงวันที่ {start_date_m} ถึง {end_date_m} (หมวดหมู่: {sel_category})"}
+            else:
+                df_view = df_base[df_base['SKU_Main'].isin(final_skus)]
+                # Grid เลื่อนคอลัมน์เองได้ ไม่ต้องแบ่งหน้า SKU
+                page_skus, sku_pages = (final_skus, None) if use_grid_m else sku_page_slice(final_skus, sku_page_m)
         
-            for d in date_list:
-                d_date = d.date()
-                day_data = df_view[df_view['Date'] == d_date]
-                
-                d_sales = day_data['รายละเอียดยอดที่ชำระแล้ว'].sum()
-                d_orders = day_data['จำนวนออเดอร์'].sum() # ใช้จำนวนออเดอร์แทนจำนวนชิ้น
-                d_profit = day_data['Net_Profit'].sum()
-                d_ads = day_data['Ads_Amount'].sum()
-                
-                d_pct_profit = (d_profit / d_sales * 100) if d_sales != 0 else 0
-                d_pct_ads = (d_ads / d_sales * 100) if d_sales != 0 else 0
-
-                day_str = d.strftime("%a. %d/%m/%Y")
-
-                row = {
-                    'วันที่': day_str, 
-                    'จำนวนออเดอร์': d_orders,
-                    'ยอดขาย': d_sales, 
-                    'กำไร': d_profit,
-                    '%กำไร': d_pct_profit,
-                    'ค่าแอด': d_ads,
-                    '%แอด': d_pct_ads
-                }
-                
-                for sku in final_skus:
-                    sku_row = day_data[day_data['SKU_Main'] == sku]
-                    val = sku_row['Net_Profit'].sum() if not sku_row.empty else 0
-                    row[sku] = val
-                matrix_data.append(row)
-
-            df_matrix = pd.DataFrame(matrix_data)
-            
-            footer_sums = df_view.groupby('SKU_Main').agg({'รายละเอียดยอดที่ชำระแล้ว': 'sum', 'จำนวนออเดอร์': 'sum', 'CAL_COST': 'sum', 'Other_Costs': 'sum', 'Ads_Amount': 'sum', 'Net_Profit': 'sum',
-                                                            'CAL_COM_ADMIN': 'sum', 'CAL_COM_TELESALE': 'sum'})
-            footer_sums = footer_sums.reindex(final_skus, fill_value=0)
-
-            def fmt_n(v): return f"{v:,.0f}" if v!=0 else "-"
-            def fmt_p(v): return f"{v:,.1f}%" if v!=0 else "-"
-
-            html = '<div class="table-wrapper"><table class="custom-table month-table"><thead><tr>'
-            html += '<th class="fix-m-1" style="background-color:#2c3e50;color:white;">วันที่</th>'
-            html += '<th class="fix-m-2" style="background-color:#2c3e50;color:white;">ยอดขาย</th>'
-            html += '<th class="fix-m-3" style="background-color:#2c3e50;color:white;">ออเดอร์</th>' # เปลี่ยนหัวข้อ
-            html += '<th class="fix-m-4" style="background-color:#27ae60;color:white;">กำไร</th>'
-            html += '<th class="fix-m-5" style="background-color:#27ae60;color:white;">%</th>'
-            html += '<th class="fix-m-6" style="background-color:#e67e22;color:white;">ค่าแอด</th>'
-            html += '<th class="fix-m-7" style="background-color:#e67e22;color:white;">%</th>'
-
-            for sku in final_skus:
-                name = str(sku_name_lookup.get(sku, ""))
-                html += f'<th class="th-sku">{sku}<span class="sku-header">{name}</span></th>'
-            html += '</tr></thead><tbody>'
+                kpi = range_sums.totals(start_date_m, end_date_m, final_skus)
+                total_sales = kpi['รายละเอียดยอดที่ชำระแล้ว']
+                total_ads = kpi['Ads_Amount']
+                total_cost_prod = kpi['CAL_COST']
+                total_ops = kpi['BOX_COST'] + kpi['DELIV_COST'] + kpi['CAL_COD_COST']
+                total_com = kpi['CAL_COM_ADMIN'] + kpi['CAL_COM_TELESALE']
+                total_cost_all = total_cost_prod + total_ops + total_com + total_ads
+                net_profit = total_sales - total_cost_all
+
+                metrics = (total_sales, total_ops, total_com, total_cost_prod, total_ads, net_profit)
+
+                date_list = pd.date_range(start_date_m, end_date_m)
+                day_totals, sku_grid = build_day_matrix(df_view, date_list, page_skus, 'Net_Profit',
+                                                        ['รายละเอียดยอดที่ชำระแล้ว', 'จำนวนออเดอร์', 'Net_Profit', 'Ads_Amount'])
+                d_sales = day_totals['รายละเอียดยอดที่ชำระแล้ว']
+                d_profit = day_totals['Net_Profit']
+                d_ads = day_totals['Ads_Amount']
+
+                df_matrix = pd.DataFrame({
+                    'วันที่': date_list.strftime("%a. %d/%m/%Y"),
+                    'จำนวนออเดอร์': day_totals['จำนวนออเดอร์'].to_numpy(), # ใช้จำนวนออเดอร์แทนจำนวนชิ้น
+                    'ยอดขาย': d_sales.to_numpy(),
+                    'กำไร': d_profit.to_numpy(),
+                    '%กำไร': pct_of(d_profit, d_sales).to_numpy(),
+                    'ค่าแอด': d_ads.to_numpy(),
+                    '%แอด': pct_of(d_ads, d_sales).to_numpy()
+                })
+                df_matrix = pd.concat([df_matrix, sku_grid.reset_index(drop=True)], axis=1)
             
-            for _, r in df_matrix.iterrows():
-                color_profit = "#FF0000" if r["กำไร"] < 0 else "#27ae60"
-                color_pct_profit = "#FF0000" if r["%กำไร"] < 0 else "#27ae60"
-                html += f'<tr>'
-                html += f'<td class="fix-m-1">{r["วันที่"]}</td>'
-                html += f'<td class="fix-m-2" style="font-weight:bold;">{fmt_n(r["ยอดขาย"])}</td>'
-                html += f'<td class="fix-m-3" style="font-weight:bold;color:#ddd;">{fmt_n(r["จำนวนออเดอร์"])}</td>' # แสดงยอดออเดอร์
-                html += f'<td class="fix-m-4" style="font-weight:bold; color:{color_profit};">{fmt_n(r["กำไร"])}</td>'
-                html += f'<td class="fix-m-5" style="color:{color_pct_profit};">{fmt_p(r["%กำไร"])}</td>'
-                html += f'<td class="fix-m-6" style="color:#e67e22;">{fmt_n(r["ค่าแอด"])}</td>'
-                html += f'<td class="fix-m-7" style="color:#e67e22;">{fmt_p(r["%แอด"])}</td>'
-
-                for sku in final_skus:
-                    val = r.get(sku, 0)
-                    color = "#FF0000" if val < 0 else "#ddd"
-                    html += f'<td style="color:{color};">{fmt_n(val)}</td>'
+                footer_sums = range_sums.by_sku(start_date_m, end_date_m, present_only=False).reindex(page_skus, fill_value=0)
+
+                if use_grid_m:
+                    frame = df_matrix[['วันที่', 'ยอดขาย', 'จำนวนออเดอร์', 'กำไร', '%กำไร', 'ค่าแอด', '%แอด']].rename(columns={'จำนวนออเดอร์': 'ออเดอร์'})
+                    frame = pd.concat([frame, sku_grid.set_axis([str(s) for s in page_skus], axis=1).reset_index(drop=True)], axis=1)
+                    frame.loc[len(frame)] = ['รวม', total_sales, kpi['จำนวนออเดอร์'], net_profit, (net_profit / total_sales * 100) if total_sales else 0,
+                                             total_ads, (total_ads / total_sales * 100) if total_sales else 0] + footer_sums['Net_Profit'].tolist()
+                    return {'metrics': metrics, 'grid': {'frame': frame, 'pinned': ['วันที่'], 'pct_cols': ['%กำไร', '%แอด'],
+                                                         'help_text': {str(s): str(sku_name_lookup.get(s, "")) for s in page_skus}}}
+
+                def fmt_n(v): return f"{v:,.0f}" if v!=0 else "-"
+                def fmt_p(v): return f"{v:,.1f}%" if v!=0 else "-"
+
+                html = '<div class="table-wrapper"><table class="custom-table month-table"><thead><tr>'
+                html += '<th class="fix-m-1" style="background-color:#2c3e50;color:white;">วันที่</th>'
+                html += '<th class="fix-m-2" style="background-color:#2c3e50;color:white;">ยอดขาย</th>'
+                html += '<th class="fix-m-3" style="background-color:#2c3e50;color:white;">ออเดอร์</th>' # เปลี่ยนหัวข้อ
+                html += '<th class="fix-m-4" style="background-color:#27ae60;color:white;">กำไร</th>'
+                html += '<th class="fix-m-5" style="background-color:#27ae60;color:white;">%</th>'
+                html += '<th class="fix-m-6" style="background-color:#e67e22;color:white;">ค่าแอด</th>'
+                html += '<th class="fix-m-7" style="background-color:#e67e22;color:white;">%</th>'
+                html += sku_header_cells(page_skus, sku_name_lookup)
+                html += '</tr></thead><tbody>'
+
+                grid = sku_grid.to_numpy(dtype=float)
+                html += join_rows([
+                    td_col(df_matrix['วันที่'].to_numpy(dtype=object), '<td class="fix-m-1">'),
+                    td_col(fmt_col(d_sales, ',.0f'), '<td class="fix-m-2" style="font-weight:bold;">'),
+                    td_col(fmt_col(df_matrix['จำนวนออเดอร์'], ',.0f'), '<td class="fix-m-3" style="font-weight:bold;color:#ddd;">'), # แสดงยอดออเดอร์
+                    td_col(fmt_col(d_profit, ',.0f'), np.where(d_profit < 0, '<td class="fix-m-4" style="font-weight:bold; color:#FF0000;">', '<td class="fix-m-4" style="font-weight:bold; color:#27ae60;">')),
+                    td_col(fmt_col(df_matrix['%กำไร'], ',.1f', '%'), np.where(df_matrix['%กำไร'] < 0, '<td class="fix-m-5" style="color:#FF0000;">', '<td class="fix-m-5" style="color:#27ae60;">')),
+                    td_col(fmt_col(d_ads, ',.0f'), '<td class="fix-m-6" style="color:#e67e22;">'),
+                    td_col(fmt_col(df_matrix['%แอด'], ',.1f', '%'), '<td class="fix-m-7" style="color:#e67e22;">'),
+                    td_col(fmt_col(grid, ',.0f'), np.where(grid < 0, '<td style="color:#FF0000;">', '<td style="color:#ddd;">')),
+                ])
+                html += '</tbody><tfoot>'
+
+                g_sales = total_sales; g_ads = total_ads; g_cost = total_cost_prod + total_ops + total_com; g_profit = net_profit
+                g_orders = kpi['จำนวนออเดอร์'] # รวมยอดออเดอร์
+                g_pct_profit = (g_profit / g_sales * 100) if g_sales else 0
+                g_pct_ads = (g_ads / g_sales * 100) if g_sales else 0
+                bg_total = "#010538"; c_total = "#ffffff"
+
+                html += f'<tr style="background-color: {bg_total}; font-weight: bold;">'
+                html += f'<td class="fix-m-1" style="background-color: {bg_total}; color: {c_total};">รวม</td>'
+                html += f'<td class="fix-m-2" style="background-color: {bg_total}; color: {c_total};">{fmt_n(g_sales)}</td>'
+                html += f'<td class="fix-m-3" style="background-color: {bg_total}; color: {c_total};">{fmt_n(g_orders)}</td>'
+                c_prof_sum = "#7CFC00" if g_profit >= 0 else "#FF0000"
+                html += f'<td class="fix-m-4" style="background-color: {bg_total}; color: {c_prof_sum};">{fmt_n(g_profit)}</td>'
+                html += f'<td class="fix-m-5" style="background-color: {bg_total}; color: {c_prof_sum};">{fmt_p(g_pct_profit)}</td>'
+                html += f'<td class="fix-m-6" style="background-color: {bg_total}; color: #FF6633;">{fmt_n(g_ads)}</td>'
+                html += f'<td class="fix-m-7" style="background-color: {bg_total}; color: #FF6633;">{fmt_p(g_pct_ads)}</td>'
+                sku_profit = footer_sums['Net_Profit'].to_numpy()
+                html += ''.join(td_col(fmt_col(sku_profit, ',.0f'), np.where(sku_profit >= 0, f'<td style="background-color: {bg_total}; color: #7CFC00;">', f'<td style="background-color: {bg_total}; color: #FF0000;">')))
                 html += '</tr>'
-            
-            html += '</tbody><tfoot>'
-
-            g_sales = total_sales; g_ads = total_ads; g_cost = total_cost_prod + total_ops + total_com; g_profit = net_profit
-            g_orders = df_view['จำนวนออเดอร์'].sum() # รวมยอดออเดอร์
-            g_pct_profit = (g_profit / g_sales * 100) if g_sales else 0
-            g_pct_ads = (g_ads / g_sales * 100) if g_sales else 0
-            bg_total = "#010538"; c_total = "#ffffff"
-
-            html += f'<tr style="background-color: {bg_total}; font-weight: bold;">'
-            html += f'<td class="fix-m-1" style="background-color: {bg_total}; color: {c_total};">รวม</td>'
-            html += f'<td class="fix-m-2" style="background-color: {bg_total}; color: {c_total};">{fmt_n(g_sales)}</td>'
-            html += f'<td class="fix-m-3" style="background-color: {bg_total}; color: {c_total};">{fmt_n(g_orders)}</td>'
-            c_prof_sum = "#7CFC00" if g_profit >= 0 else "#FF0000"
-            html += f'<td class="fix-m-4" style="background-color: {bg_total}; color: {c_prof_sum};">{fmt_n(g_profit)}</td>'
-            html += f'<td class="fix-m-5" style="background-color: {bg_total}; color: {c_prof_sum};">{fmt_p(g_pct_profit)}</td>'
-            html += f'<td class="fix-m-6" style="background-color: {bg_total}; color: #FF6633;">{fmt_n(g_ads)}</td>'
-            html += f'<td class="fix-m-7" style="background-color: {bg_total}; color: #FF6633;">{fmt_p(g_pct_ads)}</td>'
-
-            for sku in final_skus:
-                val = footer_sums.loc[sku, 'Net_Profit']
-                c_sku = "#7CFC00" if val >= 0 else "#FF0000"
-                html += f'<td style="background-color: {bg_total}; color: {c_sku};">{fmt_n(val)}</td>'
-            html += '</tr>'
-            
-            def create_footer_row_new(row_cls, label, data_dict, val_type='num', dark_bg=False):
-                if "row-sales" in row_cls: bg_color = "#f9a825"       
-                elif "row-cost" in row_cls: bg_color = "#3366FF"      
-                elif "row-ads" in row_cls: bg_color = "#b802b8"       
-                elif "row-ops" in row_cls: bg_color = "#039be5"       
-                elif "row-com" in row_cls: bg_color = "#259b24"       
-                elif "row-pct-ads" in row_cls: bg_color = "#b802b8"    
-                elif "row-pct-cost" in row_cls: bg_color = "#A020F0"   
-                elif "row-pct-ops" in row_cls: bg_color = "#1E90FF"   
-                elif "row-pct-com" in row_cls: bg_color = "#5e35b1"    
-                else: bg_color = "#ffffff"
-
-                if bg_color != "#ffffff": dark_bg = True
-                
-                target_bold_rows = ["row-pct-ads", "row-pct-cost", "row-pct-ops", "row-pct-com"]
-                is_bold = row_cls in target_bold_rows
-                
-                style_bg = f"background-color:{bg_color};"
-                lbl_color = "#ffffff" if dark_bg else "#000000"
-                
-                grand_val = 0
-                if label == "รวมทุนสินค้า": grand_val = total_cost_prod
-                elif label == "รวมยอดขาย": grand_val = g_sales
-                elif label == "รวมออเดอร์": grand_val = g_orders
-                elif label == "รวมค่าแอด": grand_val = g_ads
-                elif label == "รวมค่าดำเนินการ": grand_val = total_ops
-                elif label == "รวมค่าคอมมิชชั่น": grand_val = total_com
-                elif label == "ค่าแอด / ยอดขาย": grand_val = (g_ads/g_sales*100) if g_sales else 0
-                elif label == "ทุน/ยอดขาย": grand_val = (g_cost/g_sales*100) if g_sales else 0
-                elif label == "ค่าดำเนินการ/ยอดขาย": grand_val = (total_ops/g_sales*100) if g_sales else 0
-                elif label == "ค่าคอมมิชชั่น/ยอดขาย": grand_val = (total_com/g_sales*100) if g_sales else 0
-
-                txt_val = fmt_p(grand_val) if val_type=='pct' else fmt_n(grand_val)
-                grand_text_col = "#333333"
-                if grand_val < 0: grand_text_col = "#FF0000"
-                elif dark_bg: grand_text_col = "#ffffff"
-
-                if is_bold:
-                    label_display = f"<b>{label}</b>"
-                    txt_val_display = f"<b>{txt_val}</b>"
-                else:
-                    label_display = label
-                    txt_val_display = txt_val
-
-                row_html = f'<tr class="{row_cls}">'
-                row_html += f'<td class="fix-m-1" style="{style_bg} color: {lbl_color} !important;">{label_display}</td>'
-                row_html += f'<td class="fix-m-2" style="{style_bg} color:{grand_text_col};">{txt_val_display}</td>'
-                row_html += f'<td class="fix-m-3" style="{style_bg} color:{grand_text_col};"></td>'
-                row_html += f'<td class="fix-m-4" style="{style_bg}"></td>'
-                row_html += f'<td class="fix-m-5" style="{style_bg}"></td>'
-                row_html += f'<td class="fix-m-6" style="{style_bg}"></td>'
-                row_html += f'<td class="fix-m-7" style="{style_bg}"></td>'
-
-                for sku in final_skus:
-                    val = 0
-                    if label == "รวมทุนสินค้า": 
-                        val = data_dict.loc[sku, 'CAL_COST'] # <--- แก้ตรงนี้ (ลบ + data_dict.loc[sku, 'Other_Costs'] ออก)
-                    elif label == "รวมยอดขาย": 
-                        val = data_dict.loc[sku, 'รายละเอียดยอดที่ชำระแล้ว']
-                    elif label == "รวมค่าแอด": 
-                        val = data_dict.loc[sku, 'Ads_Amount']
-                    elif label == "รวมค่าดำเนินการ":
-                        val = (data_dict.loc[sku, 'Other_Costs'] - 
-                               data_dict.loc[sku, 'CAL_COM_ADMIN'] - 
-                               data_dict.loc[sku, 'CAL_COM_TELESALE'])
-                    elif label == "รวมค่าคอมมิชชั่น":
-                        val = data_dict.loc[sku, 'CAL_COM_ADMIN'] + data_dict.loc[sku, 'CAL_COM_TELESALE']
-                    elif label == "ค่าแอด / ยอดขาย":
-                        s = data_dict.loc[sku, 'รายละเอียดยอดที่ชำระแล้ว']
-                        val = (data_dict.loc[sku, 'Ads_Amount']/s*100) if s else 0
-                    elif label == "ทุน/ยอดขาย":
-                        s = data_dict.loc[sku, 'รายละเอียดยอดที่ชำระแล้ว']
-                        cost = data_dict.loc[sku, 'CAL_COST'] + data_dict.loc[sku, 'Other_Costs']
-                        val = (cost/s*100) if s else 0
-                    elif label == "ค่าดำเนินการ/ยอดขาย":
-                        s = data_dict.loc[sku, 'รายละเอียดยอดที่ชำระแล้ว']
-                        ops = (data_dict.loc[sku, 'Other_Costs'] - 
-                               data_dict.loc[sku, 'CAL_COM_ADMIN'] - 
-                               data_dict.loc[sku, 'CAL_COM_TELESALE'])
-                        val = (ops/s*100) if s else 0
-                    elif label == "ค่าคอมมิชชั่น/ยอดขาย":
-                        s = data_dict.loc[sku, 'รายละเอียดยอดที่ชำระแล้ว']
-                        com = data_dict.loc[sku, 'CAL_COM_ADMIN'] + data_dict.loc[sku, 'CAL_COM_TELESALE']
-                        val = (com/s*100) if s else 0
-
-                    txt = fmt_p(val) if val_type=='pct' else fmt_n(val)
-                    cell_text_col = "#333333"
-                    if val < 0: cell_text_col = "#FF0000"
-                    elif dark_bg: cell_text_col = "#ffffff"
-                    txt_display = f"<b>{txt}</b>" if is_bold else txt
-                    row_html += f'<td style="{style_bg} color:{cell_text_col};">{txt_display}</td>'
-                row_html += '</tr>'
-                return row_html
-
-            html += create_footer_row_new("row-sales", "รวมยอดขาย", footer_sums, 'num')
-            html += create_footer_row_new("row-cost", "รวมทุนสินค้า", footer_sums, 'num')
-            html += create_footer_row_new("row-ads", "รวมค่าแอด", footer_sums, 'num')
-            html += create_footer_row_new("row-ops", "รวมค่าดำเนินการ", footer_sums, 'num')
-            html += create_footer_row_new("row-com", "รวมค่าคอมมิชชั่น", footer_sums, 'num')
-            
-            html += create_footer_row_new("row-pct-ads", "ค่าแอด / ยอดขาย", footer_sums, 'pct')
-            html += create_footer_row_new("row-pct-cost", "ทุน/ยอดขาย", footer_sums, 'pct')
-            html += create_footer_row_new("row-pct-ops", "ค่าดำเนินการ/ยอดขาย", footer_sums, 'pct')
-            html += create_footer_row_new("row-pct-com", "ค่าคอมมิชชั่น/ยอดขาย", footer_sums, 'pct')
-            
-            html += '</tfoot></table></div>'
-            st.markdown(html, unsafe_allow_html=True)
+
+                # แถวสรุปท้ายตาราง: (class, label, ค่าต่อ SKU, ค่ารวม, ชนิด) ทุกแถวพื้นเข้ม แถว % เป็นตัวหนา
+                f_sales = footer_sums['รายละเอียดยอดที่ชำระแล้ว']
+                f_ops = footer_sums['Other_Costs'] - footer_sums['CAL_COM_ADMIN'] - footer_sums['CAL_COM_TELESALE']
+                f_com = footer_sums['CAL_COM_ADMIN'] + footer_sums['CAL_COM_TELESALE']
+                footer_rows = [
+                    ("row-sales", "รวมยอดขาย", "#f9a825", f_sales, g_sales, 'num'),
+                    ("row-cost", "รวมทุนสินค้า", "#3366FF", footer_sums['CAL_COST'], total_cost_prod, 'num'),
+                    ("row-ads", "รวมค่าแอด", "#b802b8", footer_sums['Ads_Amount'], g_ads, 'num'),
+                    ("row-ops", "รวมค่าดำเนินการ", "#039be5", f_ops, total_ops, 'num'),
+                    ("row-com", "รวมค่าคอมมิชชั่น", "#259b24", f_com, total_com, 'num'),
+                    ("row-pct-ads", "ค่าแอด / ยอดขาย", "#b802b8", pct_of(footer_sums['Ads_Amount'], f_sales), (g_ads/g_sales*100) if g_sales else 0, 'pct'),
+                    ("row-pct-cost", "ทุน/ยอดขาย", "#A020F0", pct_of(footer_sums['CAL_COST'] + footer_sums['Other_Costs'], f_sales), (g_cost/g_sales*100) if g_sales else 0, 'pct'),
+                    ("row-pct-ops", "ค่าดำเนินการ/ยอดขาย", "#1E90FF", pct_of(f_ops, f_sales), (total_ops/g_sales*100) if g_sales else 0, 'pct'),
+                    ("row-pct-com", "ค่าคอมมิชชั่น/ยอดขาย", "#5e35b1", pct_of(f_com, f_sales), (total_com/g_sales*100) if g_sales else 0, 'pct'),
+                ]
+                for row_cls, label, bg_color, sku_vals, grand_val, val_type in footer_rows:
+                    style_bg = f"background-color:{bg_color};"
+                    is_bold = val_type == 'pct'
+                    txt_val = fmt_p(grand_val) if is_bold else fmt_n(grand_val)
+                    grand_text_col = "#FF0000" if grand_val < 0 else "#ffffff"
+                    if is_bold:
+                        label = f"<b>{label}</b>"
+                        txt_val = f"<b>{txt_val}</b>"
+
+                    html += f'<tr class="{row_cls}">'
+                    html += f'<td class="fix-m-1" style="{style_bg} color: #ffffff !important;">{label}</td>'
+                    html += f'<td class="fix-m-2" style="{style_bg} color:{grand_text_col};">{txt_val}</td>'
+                    html += f'<td class="fix-m-3" style="{style_bg} color:{grand_text_col};"></td>'
+                    html += f'<td class="fix-m-4" style="{style_bg}"></td>'
+                    html += f'<td class="fix-m-5" style="{style_bg}"></td>'
+                    html += f'<td class="fix-m-6" style="{style_bg}"></td>'
+                    html += f'<td class="fix-m-7" style="{style_bg}"></td>'
+                    sku_vals = sku_vals.to_numpy(dtype=float)
+                    sku_txt = fmt_col(sku_vals, ',.1f', '%') if is_bold else fmt_col(sku_vals, ',.0f')
+                    if is_bold: sku_txt = '<b>' + sku_txt + '</b>'
+                    html += ''.join(td_col(sku_txt, np.where(sku_vals < 0, f'<td style="{style_bg} color:#FF0000;">', f'<td style="{style_bg} color:#ffffff;">')))
+                    html += '</tr>'
+
+                html += '</tfoot></table></div>'
+                return {'metrics': metrics, 'html': html, 'sku_pages': sku_pages}
+
+        sku_page_m = st.session_state.get('m_sku_page', 1)
+        view = page_cache.get((data_version, selected_page, start_date_m, end_date_m, filter_mode, sel_category, tuple(st.session_state.selected_skus), sku_page_m, use_grid_m), build_month_view)
+        show_page_view(view, pager_key='m_sku_page')
 
             
     # --- [NEW] PAGE: REPORT_ADS ---
-    elif selected_page == "📢 REPORT_ADS":
+    @st.fragment
+    def page_report_ads():
         st.markdown('<div class="header-bar"><div class="header-title"><i class="fas fa-bullhorn"></i> สรุปค่าโฆษณา (รายวัน)</div></div>', unsafe_allow_html=True)
-        all_years = sorted(df_daily['Year'].unique(), reverse=True)
+        all_years = sorted(df_daily['Year'].unique().tolist(), reverse=True)
         today = datetime.now().date()
         
         def update_a_dates():
@@ -1106,92 +850,89 @@ try:
                 st.markdown("<div style='margin-top: 29px;'></div>", unsafe_allow_html=True)
                 st.button("🚀 ประมวลผล", type="primary", use_container_width=True, key="btn_run_a")
 
-        mask_date_a = (df_daily['Date'] >= start_date_a) & (df_daily['Date'] <= end_date_a)
-        df_base_a = df_daily[mask_date_a]
+        use_grid_a = st.toggle("⚡ แสดงแบบ Grid (เลื่อน/เรียงคอลัมน์ได้ ส่งข้อมูลน้อยกว่า)", key="a_grid")
 
-        sku_summary_a = df_base_a.groupby('SKU_Main').agg({'Ads_Amount': 'sum', 'รายละเอียดยอดที่ชำระแล้ว': 'sum'}).reset_index()
-        auto_skus_a = []
-        if "แสดงรายการทั้งหมด" in filter_mode_a: auto_skus_a = all_skus_global
-        else: auto_skus_a = sku_summary_a[(sku_summary_a['Ads_Amount'] > 0) | (sku_summary_a['รายละเอียดยอดที่ชำระแล้ว'] > 0)]['SKU_Main'].tolist()
+        def build_ads_view():
+            df_base_a = slice_dates(df_daily, start_date_a, end_date_a)
 
-        selected_labels_a = st.session_state.selected_skus_a
-        selected_skus_real_a = [sku_map_reverse_global[l] for l in selected_labels_a]
-        
-        pre_final_skus_a = sorted(selected_skus_real_a) if selected_skus_real_a else sorted(auto_skus_a)
-        final_skus_a = filter_skus_by_category(pre_final_skus_a, sel_category_a, sku_type_map)
+            sku_summary_a = range_sums.by_sku(start_date_a, end_date_a).reset_index()
+            auto_skus_a = []
+            if "แสดงรายการทั้งหมด" in filter_mode_a: auto_skus_a = all_skus_global
+            else: auto_skus_a = sku_summary_a[(sku_summary_a['Ads_Amount'] > 0) | (sku_summary_a['รายละเอียดยอดที่ชำระแล้ว'] > 0)]['SKU_Main'].tolist()
 
-        if not final_skus_a: 
-            st.warning(f"⚠️ ไม่พบข้อมูลสินค้าตามเงื่อนไข ในช่วงวันที่ {start_date_a} ถึง {end_date_a}")
-        else:
-            df_view_a = df_base_a[df_base_a['SKU_Main'].isin(final_skus_a)]
-            
-            total_sales = df_view_a['รายละเอียดยอดที่ชำระแล้ว'].sum()
-            total_ads = df_view_a['Ads_Amount'].sum()
-            total_cost_prod = df_view_a['CAL_COST'].sum()
-            total_ops = df_view_a['BOX_COST'].sum() + df_view_a['DELIV_COST'].sum() + df_view_a['CAL_COD_COST'].sum()
-            total_com = df_view_a['CAL_COM_ADMIN'].sum() + df_view_a['CAL_COM_TELESALE'].sum()
-            total_cost_all = total_cost_prod + total_ops + total_com + total_ads
-            net_profit = total_sales - total_cost_all
+            selected_labels_a = st.session_state.selected_skus_a
+            selected_skus_real_a = [sku_map_reverse_global[l] for l in selected_labels_a]
+        
+            pre_final_skus_a = sorted(selected_skus_real_a) if selected_skus_real_a else sorted(auto_skus_a)
+            final_skus_a = filter_skus_by_category(pre_final_skus_a, sel_category_a, sku_dim)
 
-            render_metric_row(total_sales, total_ops, total_com, total_cost_prod, total_ads, net_profit)
-            
-            date_list_a = pd.date_range(start_date_a, end_date_a)
-            matrix_data_a = []
-            
-            for d in date_list_a:
-                d_date = d.date()
-                day_data = df_view_a[df_view_a['Date'] == d_date]
-                d_total_ads = day_data['Ads_Amount'].sum()
-                day_str = d.strftime("%a. %d/%m/%Y")
-                row = {
-                    'วันที่': day_str,
-                    'ค่าแอดรวม': d_total_ads
-                }
-                for sku in final_skus_a:
-                    val = day_data[day_data['SKU_Main'] == sku]['Ads_Amount'].sum()
-                    row[sku] = val
-                matrix_data_a.append(row)
-                
-            df_matrix_a = pd.DataFrame(matrix_data_a)
-            footer_sums_a = df_view_a.groupby('SKU_Main')['Ads_Amount'].sum()
-            total_period_ads = footer_sums_a.sum()
+            if not final_skus_a: 
+                return {'warning': f"⚠️ ไม่พบข้อมูลสินค้าตามเงื่อนไข ในช่วงวันที่ {start_date_a} ถึง {end_date_a}"}
+            else:
+                df_view_a = df_base_a[df_base_a['SKU_Main'].isin(final_skus_a)]
+                page_skus_a, sku_pages_a = (final_skus_a, None) if use_grid_a else sku_page_slice(final_skus_a, sku_page_a)
             
-            def fmt_n(v): return f"{v:,.0f}" if v!=0 else "-"
+                kpi_a = range_sums.totals(start_date_a, end_date_a, final_skus_a)
+                total_sales = kpi_a['รายละเอียดยอดที่ชำระแล้ว']
+                total_ads = kpi_a['Ads_Amount']
+                total_cost_prod = kpi_a['CAL_COST']
+                total_ops = kpi_a['BOX_COST'] + kpi_a['DELIV_COST'] + kpi_a['CAL_COD_COST']
+                total_com = kpi_a['CAL_COM_ADMIN'] + kpi_a['CAL_COM_TELESALE']
+                total_cost_all = total_cost_prod + total_ops + total_com + total_ads
+                net_profit = total_sales - total_cost_all
+
+                metrics = (total_sales, total_ops, total_com, total_cost_prod, total_ads, net_profit)
             
-            html = '<div class="table-wrapper"><table class="custom-table month-table"><thead><tr>'
-            html += '<th class="fix-m-1" style="background-color:#2c3e50;color:white;">วันที่</th>'
-            html += '<th class="fix-m-2" style="background-color:#e67e22;color:white;border-right: 2px solid #bbb !important;">ค่าแอดรวม</th>'
-            for sku in final_skus_a:
-                name = str(sku_name_lookup.get(sku, ""))
-                html += f'<th class="th-sku">{sku}<span class="sku-header">{name}</span></th>'
-            html += '</tr></thead><tbody>'
+                date_list_a = pd.date_range(start_date_a, end_date_a)
+                day_totals_a, sku_grid_a = build_day_matrix(df_view_a, date_list_a, page_skus_a, 'Ads_Amount', ['Ads_Amount'])
+
+                df_matrix_a = pd.DataFrame({
+                    'วันที่': date_list_a.strftime("%a. %d/%m/%Y"),
+                    'ค่าแอดรวม': day_totals_a['Ads_Amount'].to_numpy()
+                })
+                df_matrix_a = pd.concat([df_matrix_a, sku_grid_a.reset_index(drop=True)], axis=1)
+                footer_sums_a = range_sums.by_sku(start_date_a, end_date_a)['Ads_Amount']
+                total_period_ads = total_ads
+
+                if use_grid_a:
+                    frame = pd.concat([df_matrix_a[['วันที่', 'ค่าแอดรวม']], sku_grid_a.set_axis([str(s) for s in page_skus_a], axis=1).reset_index(drop=True)], axis=1)
+                    frame.loc[len(frame)] = ['รวม', total_period_ads] + footer_sums_a.reindex(page_skus_a, fill_value=0).tolist()
+                    return {'metrics': metrics, 'grid': {'frame': frame, 'pinned': ['วันที่'],
+                                                         'help_text': {str(s): str(sku_name_lookup.get(s, "")) for s in page_skus_a}}}
             
-            for _, r in df_matrix_a.iterrows():
-                html += '<tr>'
-                html += f'<td class="fix-m-1">{r["วันที่"]}</td>'
-                html += f'<td class="fix-m-2" style="font-weight:bold; color:#e67e22; border-right: 2px solid #bbb !important;">{fmt_n(r["ค่าแอดรวม"])}</td>'
-                for sku in final_skus_a:
-                    val = r.get(sku, 0)
-                    color = "#e67e22" if val > 0 else "#ddd"
-                    html += f'<td style="color:{color};">{fmt_n(val)}</td>'
-                html += '</tr>'
+                def fmt_n(v): return f"{v:,.0f}" if v!=0 else "-"
             
-            html += '</tbody><tfoot>'
-            bg_total = "#010538"; c_total = "#ffffff"
-            html += f'<tr style="background-color: {bg_total}; font-weight: bold;">'
-            html += f'<td class="fix-m-1" style="background-color: {bg_total}; color: {c_total};">รวม</td>'
-            html += f'<td class="fix-m-2" style="background-color: {bg_total}; color: #FF6633; border-right: 2px solid #bbb !important;">{fmt_n(total_period_ads)}</td>'
-            for sku in final_skus_a:
-                val = footer_sums_a.get(sku, 0)
-                html += f'<td style="background-color: {bg_total}; color: #FF6633;">{fmt_n(val)}</td>'
-            html += '</tr></tfoot></table></div>'
-            st.markdown(html, unsafe_allow_html=True)
+                html = '<div class="table-wrapper"><table class="custom-table month-table"><thead><tr>'
+                html += '<th class="fix-m-1" style="background-color:#2c3e50;color:white;">วันที่</th>'
+                html += '<th class="fix-m-2" style="background-color:#e67e22;color:white;border-right: 2px solid #bbb !important;">ค่าแอดรวม</th>'
+                html += sku_header_cells(page_skus_a, sku_name_lookup)
+                html += '</tr></thead><tbody>'
+
+                grid_a = sku_grid_a.to_numpy(dtype=float)
+                html += join_rows([
+                    td_col(df_matrix_a['วันที่'].to_numpy(dtype=object), '<td class="fix-m-1">'),
+                    td_col(fmt_col(df_matrix_a['ค่าแอดรวม'], ',.0f'), '<td class="fix-m-2" style="font-weight:bold; color:#e67e22; border-right: 2px solid #bbb !important;">'),
+                    td_col(fmt_col(grid_a, ',.0f'), np.where(grid_a > 0, '<td style="color:#e67e22;">', '<td style="color:#ddd;">')),
+                ])
+                html += '</tbody><tfoot>'
+                bg_total = "#010538"; c_total = "#ffffff"
+                html += f'<tr style="background-color: {bg_total}; font-weight: bold;">'
+                html += f'<td class="fix-m-1" style="background-color: {bg_total}; color: {c_total};">รวม</td>'
+                html += f'<td class="fix-m-2" style="background-color: {bg_total}; color: #FF6633; border-right: 2px solid #bbb !important;">{fmt_n(total_period_ads)}</td>'
+                html += ''.join(td_col(fmt_col(footer_sums_a.reindex(page_skus_a, fill_value=0), ',.0f'), f'<td style="background-color: {bg_total}; color: #FF6633;">'))
+                html += '</tr></tfoot></table></div>'
+                return {'metrics': metrics, 'html': html, 'sku_pages': sku_pages_a}
+
+        sku_page_a = st.session_state.get('a_sku_page', 1)
+        view = page_cache.get((data_version, selected_page, start_date_a, end_date_a, filter_mode_a, sel_category_a, tuple(st.session_state.selected_skus_a), sku_page_a, use_grid_a), build_ads_view)
+        show_page_view(view, pager_key='a_sku_page')
 
     # --- PAGE 2: REPORT_DAILY ---
-    elif selected_page == "📅 REPORT_DAILY":
+    @st.fragment
+    def page_report_daily():
         st.markdown('<div class="header-bar"><div class="header-title"><i class="fas fa-calendar-day"></i> สรุปการขายรายวัน (ตามช่วงเวลา)</div></div>', unsafe_allow_html=True)
         
-        all_years = sorted(df_daily['Year'].unique(), reverse=True)
+        all_years = sorted(df_daily['Year'].unique().tolist(), reverse=True)
         today = datetime.now().date()
 
         def update_d_dates():
@@ -1230,156 +971,171 @@ try:
                 st.markdown("<div style='margin-top: 29px;'></div>", unsafe_allow_html=True)
                 st.button("🚀 ประมวลผล", type="primary", use_container_width=True, key="btn_run_d")
 
-        mask = (df_daily['Date'] >= start_d) & (df_daily['Date'] <= end_d)
-        df_range = df_daily[mask]
-
-        df_grouped = df_range.groupby(['SKU_Main']).agg({
-            'ชื่อสินค้า': 'last', 
-            'จำนวนออเดอร์': 'sum', 
-            'จำนวน': 'sum', 
-            'รายละเอียดยอดที่ชำระแล้ว': 'sum',
-            'CAL_COST': 'sum', 'BOX_COST': 'sum', 'DELIV_COST': 'sum', 'CAL_COD_COST': 'sum',
-            'CAL_COM_ADMIN': 'sum', 'CAL_COM_TELESALE': 'sum', 'Ads_Amount': 'sum', 'Net_Profit': 'sum'
-        }).reset_index()
-        df_grouped['ชื่อสินค้า'] = df_grouped['SKU_Main'].map(sku_name_lookup).fillna("ไม่ระบุชื่อ")
-
-        auto_skus_d = []
-        if "แสดงสินค้ากำไร" in filter_mode_d: auto_skus_d = df_grouped[df_grouped['Net_Profit'] > 0]['SKU_Main'].tolist()
-        elif "แสดงสินค้าขาดทุน" in filter_mode_d: auto_skus_d = df_grouped[df_grouped['Net_Profit'] < 0]['SKU_Main'].tolist()
-        elif "แสดงรายการทั้งหมด" in filter_mode_d: auto_skus_d = all_skus_global
-        else: auto_skus_d = df_grouped[(df_grouped['รายละเอียดยอดที่ชำระแล้ว'] > 0) | (df_grouped['Ads_Amount'] > 0)]['SKU_Main'].tolist()
-
-        selected_labels_d = st.session_state.selected_skus_d
-        selected_skus_real_d = [sku_map_reverse_global[l] for l in selected_labels_d]
+        use_grid_d = st.toggle("⚡ แสดงแบบ Grid (เลื่อน/เรียงคอลัมน์ได้ ส่งข้อมูลน้อยกว่า)", key="d_grid")
+
+        def build_daily_view():
+            df_grouped = range_sums.by_sku(start_d, end_d).reset_index()
+            df_grouped.insert(1, 'ชื่อสินค้า', df_grouped['SKU_Main'].map(sku_name_lookup).fillna("ไม่ระบุชื่อ"))
+
+            auto_skus_d = []
+            if "แสดงสินค้ากำไร" in filter_mode_d: auto_skus_d = df_grouped[df_grouped['Net_Profit'] > 0]['SKU_Main'].tolist()
+            elif "แสดงสินค้าขาดทุน" in filter_mode_d: auto_skus_d = df_grouped[df_grouped['Net_Profit'] < 0]['SKU_Main'].tolist()
+            elif "แสดงรายการทั้งหมด" in filter_mode_d: auto_skus_d = all_skus_global
+            else: auto_skus_d = df_grouped[(df_grouped['รายละเอียดยอดที่ชำระแล้ว'] > 0) | (df_grouped['Ads_Amount'] > 0)]['SKU_Main'].tolist()
+
+            selected_labels_d = st.session_state.selected_skus_d
+            selected_skus_real_d = [sku_map_reverse_global[l] for l in selected_labels_d]
         
-        pre_final_skus_d = sorted(selected_skus_real_d) if selected_skus_real_d else sorted(auto_skus_d)
-        final_skus_d = filter_skus_by_category(pre_final_skus_d, sel_category_d, sku_type_map)
+            pre_final_skus_d = sorted(selected_skus_real_d) if selected_skus_real_d else sorted(auto_skus_d)
+            final_skus_d = filter_skus_by_category(pre_final_skus_d, sel_category_d, sku_dim)
 
-        df_final_d = df_grouped[df_grouped['SKU_Main'].isin(final_skus_d)].copy()
+            df_final_d = df_grouped[df_grouped['SKU_Main'].isin(final_skus_d)].copy()
 
-        if df_final_d.empty: st.warning(f"⚠️ ไม่พบข้อมูลตามเงื่อนไข ({sel_category_d}) ในช่วงเวลานี้")
-        else:
-            sum_sales = df_final_d['รายละเอียดยอดที่ชำระแล้ว'].sum()
-            sum_ads = df_final_d['Ads_Amount'].sum()
-            sum_cost_prod = df_final_d['CAL_COST'].sum()
-            sum_ops = df_final_d['BOX_COST'].sum() + df_final_d['DELIV_COST'].sum() + df_final_d['CAL_COD_COST'].sum()
-            sum_com = df_final_d['CAL_COM_ADMIN'].sum() + df_final_d['CAL_COM_TELESALE'].sum()
-            sum_profit = df_final_d['Net_Profit'].sum()
+            if df_final_d.empty: return {'warning': f"⚠️ ไม่พบข้อมูลตามเงื่อนไข ({sel_category_d}) ในช่วงเวลานี้"}
+            else:
+                kpi_d = range_sums.totals(start_d, end_d, final_skus_d)
+                sum_sales = kpi_d['รายละเอียดยอดที่ชำระแล้ว']
+                sum_ads = kpi_d['Ads_Amount']
+                sum_cost_prod = kpi_d['CAL_COST']
+                sum_ops = kpi_d['BOX_COST'] + kpi_d['DELIV_COST'] + kpi_d['CAL_COD_COST']
+                sum_com = kpi_d['CAL_COM_ADMIN'] + kpi_d['CAL_COM_TELESALE']
+                sum_profit = kpi_d['Net_Profit']
             
-            render_metric_row(sum_sales, sum_ops, sum_com, sum_cost_prod, sum_ads, sum_profit)
+                metrics = (sum_sales, sum_ops, sum_com, sum_cost_prod, sum_ads, sum_profit)
 
-            df_final_d['กำไร/ขาดทุน'] = df_final_d['Net_Profit']
-            df_final_d['ROAS'] = np.where(df_final_d['Ads_Amount']>0, df_final_d['รายละเอียดยอดที่ชำระแล้ว']/df_final_d['Ads_Amount'], 0)
-            sls = df_final_d['รายละเอียดยอดที่ชำระแล้ว']
+                df_final_d['กำไร/ขาดทุน'] = df_final_d['Net_Profit']
+                df_final_d['ROAS'] = np.where(df_final_d['Ads_Amount']>0, df_final_d['รายละเอียดยอดที่ชำระแล้ว']/df_final_d['Ads_Amount'], 0)
+                sls = df_final_d['รายละเอียดยอดที่ชำระแล้ว']
 
-            val_ops_item = df_final_d['BOX_COST'] + df_final_d['DELIV_COST'] + df_final_d['CAL_COD_COST']
-            df_final_d['% ค่าดำเนินการ'] = np.where(sls>0, (val_ops_item/sls)*100, 0)
+                val_ops_item = df_final_d['BOX_COST'] + df_final_d['DELIV_COST'] + df_final_d['CAL_COD_COST']
+                df_final_d['% ค่าดำเนินการ'] = np.where(sls>0, (val_ops_item/sls)*100, 0)
 
-            val_com_item = df_final_d['CAL_COM_ADMIN'] + df_final_d['CAL_COM_TELESALE']
-            df_final_d['% ค่าคอมมิชชัน'] = np.where(sls>0, (val_com_item/sls)*100, 0)
+                val_com_item = df_final_d['CAL_COM_ADMIN'] + df_final_d['CAL_COM_TELESALE']
+                df_final_d['% ค่าคอมมิชชัน'] = np.where(sls>0, (val_com_item/sls)*100, 0)
 
-            df_final_d['% ทุนสินค้า'] = np.where(sls>0, (df_final_d['CAL_COST']/sls)*100, 0)
-            df_final_d['% Ads'] = np.where(sls>0, (df_final_d['Ads_Amount']/sls)*100, 0)
-            df_final_d['% กำไร'] = np.where(sls>0, (df_final_d['Net_Profit']/sls)*100, 0)
+                df_final_d['% ทุนสินค้า'] = np.where(sls>0, (df_final_d['CAL_COST']/sls)*100, 0)
+                df_final_d['% Ads'] = np.where(sls>0, (df_final_d['Ads_Amount']/sls)*100, 0)
+                df_final_d['% กำไร'] = np.where(sls>0, (df_final_d['Net_Profit']/sls)*100, 0)
             
-            df_final_d = df_final_d.sort_values('กำไร/ขาดทุน', ascending=False)
+                df_final_d = df_final_d.sort_values('กำไร/ขาดทุน', ascending=False)
 
-            def fmt(val, is_percent=False):
-                if val == 0 or pd.isna(val): return "-"
-                text = f"{val:,.2f}%" if is_percent else f"{val:,.2f}"
-                return text
+                def fmt(val, is_percent=False):
+                    if val == 0 or pd.isna(val): return "-"
+                    text = f"{val:,.2f}%" if is_percent else f"{val:,.2f}"
+                    return text
 
-            def get_cell_style(val):
-                if isinstance(val, (int, float)) and val < 0:
-                    return ' style="color: #FF0000 !important; font-weight: bold !important;" class="negative-value"'
-                return '' 
+                def get_cell_style(val):
+                    if isinstance(val, (int, float)) and val < 0:
+                        return NEG_CELL_ATTR
+                    return '' 
 
-            st.markdown("##### 📋 รายละเอียดสินค้า")
             
-            cols_cfg = [
-                ('SKU', 'SKU_Main', ''), 
-                ('ชื่อสินค้า', 'ชื่อสินค้า', ''), 
-                ('ออเดอร์', 'จำนวนออเดอร์', ''), # Changed
-                ('ยอดขาย', 'รายละเอียดยอดที่ชำระแล้ว', ''), 
-                ('ต้นทุน', 'CAL_COST', ''), 
-                ('ค่ากล่อง', 'BOX_COST', ''), 
-                ('ค่าส่ง', 'DELIV_COST', ''), 
-                ('COD', 'CAL_COD_COST', ''), 
-                ('Admin', 'CAL_COM_ADMIN', ''), 
-                ('Tele', 'CAL_COM_TELESALE', ''), 
-                ('ค่า Ads', 'Ads_Amount', ''), 
-                ('กำไร', 'Net_Profit', ''), 
-                ('ROAS', 'ROAS', 'col-small'), 
-                ('%ค่าดำเนินการ', '% ค่าดำเนินการ', 'col-medium'), 
-                ('%ค่าคอม', '% ค่าคอมมิชชัน', 'col-medium'),       
-                ('%ทุน', '% ทุนสินค้า', 'col-small'), 
-                ('%Ads', '% Ads', 'col-small'), 
-                ('%กำไร', '% กำไร', 'col-small')
-            ]
-
-            html = '<div class="table-wrapper"><table class="custom-table daily-table"><thead><tr>'
-            for title, _, cls in cols_cfg: html += f'<th class="{cls}">{title}</th>'
-            html += '</tr></thead><tbody>'
-
-            for i, (_, r) in enumerate(df_final_d.iterrows()):
-                html += '<tr>'
-                html += f'<td style="font-weight:bold;color:#1e3c72 !important;">{r["SKU_Main"]}</td>'
-                html += f'<td style="text-align:left;font-size:11px;color:#1e3c72 !important; max-width: 100px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;" title="{r["ชื่อสินค้า"]}">{r["ชื่อสินค้า"]}</td>'
-                html += f'<td{get_cell_style(r["จำนวนออเดอร์"])}>{fmt(r["จำนวนออเดอร์"])}</td>' # Show Orders
-                html += f'<td{get_cell_style(r["รายละเอียดยอดที่ชำระแล้ว"])}>{fmt(r["รายละเอียดยอดที่ชำระแล้ว"])}</td>'
-                html += f'<td{get_cell_style(r["CAL_COST"])}>{fmt(r["CAL_COST"])}</td>'
-                html += f'<td{get_cell_style(r["BOX_COST"])}>{fmt(r["BOX_COST"])}</td>'
-                html += f'<td{get_cell_style(r["DELIV_COST"])}>{fmt(r["DELIV_COST"])}</td>'
-                html += f'<td{get_cell_style(r["CAL_COD_COST"])}>{fmt(r["CAL_COD_COST"])}</td>'
-                html += f'<td{get_cell_style(r["CAL_COM_ADMIN"])}>{fmt(r["CAL_COM_ADMIN"])}</td>'
-                html += f'<td{get_cell_style(r["CAL_COM_TELESALE"])}>{fmt(r["CAL_COM_TELESALE"])}</td>'
-                html += f'<td style="color:#e67e22 !important;">{fmt(r["Ads_Amount"])}</td>'
-                html += f'<td{get_cell_style(r["Net_Profit"])}>{fmt(r["Net_Profit"])}</td>'
-                html += f'<td class="col-small" style="color:#1e3c72 !important;">{fmt(r["ROAS"])}</td>'
-                html += f'<td class="col-small" style="color:#1e3c72 !important;">{fmt(r["% ค่าดำเนินการ"],True)}</td>'
-                html += f'<td class="col-small" style="color:#1e3c72 !important;">{fmt(r["% ค่าคอมมิชชัน"],True)}</td>'
-                html += f'<td class="col-small" style="color:#1e3c72 !important;">{fmt(r["% ทุนสินค้า"],True)}</td>'
-                html += f'<td class="col-small" style="color:#1e3c72 !important;">{fmt(r["% Ads"],True)}</td>'
-                html += f'<td class="col-small"{get_cell_style(r["% กำไร"])}>{fmt(r["% กำไร"],True)}</td>'
-                html += '</tr>'
+                cols_cfg = [
+                    ('SKU', 'SKU_Main', ''), 
+                    ('ชื่อสินค้า', 'ชื่อสินค้า', ''), 
+                    ('ออเดอร์', 'จำนวนออเดอร์', ''), # Changed
+                    ('ยอดขาย', 'รายละเอียดยอดที่ชำระแล้ว', ''), 
+                    ('ต้นทุน', 'CAL_COST', ''), 
+                    ('ค่ากล่อง', 'BOX_COST', ''), 
+                    ('ค่าส่ง', 'DELIV_COST', ''), 
+                    ('COD', 'CAL_COD_COST', ''), 
+                    ('Admin', 'CAL_COM_ADMIN', ''), 
+                    ('Tele', 'CAL_COM_TELESALE', ''), 
+                    ('ค่า Ads', 'Ads_Amount', ''), 
+                    ('กำไร', 'Net_Profit', ''), 
+                    ('ROAS', 'ROAS', 'col-small'), 
+                    ('%ค่าดำเนินการ', '% ค่าดำเนินการ', 'col-medium'), 
+                    ('%ค่าคอม', '% ค่าคอมมิชชัน', 'col-medium'),       
+                    ('%ทุน', '% ทุนสินค้า', 'col-small'), 
+                    ('%Ads', '% Ads', 'col-small'), 
+                    ('%กำไร', '% กำไร', 'col-small')
+                ]
 
-            html += '<tr class="footer-row"><td>TOTAL</td><td></td>'
-            ts = df_final_d['รายละเอียดยอดที่ชำระแล้ว'].sum(); tp = df_final_d['Net_Profit'].sum()
-            ta = df_final_d['Ads_Amount'].sum(); tc = df_final_d['CAL_COST'].sum()
-            t_box = df_final_d['BOX_COST'].sum()
-            t_ship = df_final_d['DELIV_COST'].sum()
-            t_cod = df_final_d['CAL_COD_COST'].sum()
-            t_adm = df_final_d['CAL_COM_ADMIN'].sum()
-            t_tel = df_final_d['CAL_COM_TELESALE'].sum()
-
-            html += f'<td{get_cell_style(df_final_d["จำนวนออเดอร์"].sum())}>{fmt(df_final_d["จำนวนออเดอร์"].sum())}</td>' # Sum Orders
-            html += f'<td{get_cell_style(ts)}>{fmt(ts)}</td>'
-            html += f'<td{get_cell_style(tc)}>{fmt(tc)}</td>'
-            html += f'<td{get_cell_style(t_box)}>{fmt(t_box)}</td>'
-            html += f'<td{get_cell_style(t_ship)}>{fmt(t_ship)}</td>'
-            html += f'<td{get_cell_style(t_cod)}>{fmt(t_cod)}</td>'
-            html += f'<td{get_cell_style(t_adm)}>{fmt(t_adm)}</td>'
-            html += f'<td{get_cell_style(t_tel)}>{fmt(t_tel)}</td>'
-            html += f'<td{get_cell_style(ta)}>{fmt(ta)}</td>'
-            html += f'<td{get_cell_style(tp)}>{fmt(tp)}</td>'
-
-            f_roas = ts/ta if ta>0 else 0
-            val_pct_ops = ((t_box + t_ship + t_cod)/ts*100) if ts>0 else 0
-            val_pct_comm = ((t_adm + t_tel)/ts*100) if ts>0 else 0
-            val_pct_cost = (tc/ts*100) if ts>0 else 0
-            val_pct_ads = (ta/ts*100) if ts>0 else 0
-            val_pct_profit = (tp/ts*100) if ts>0 else 0
-            
-            html += f'<td class="col-small"{get_cell_style(f_roas)}>{fmt(f_roas)}</td>'
-            html += f'<td class="col-medium"{get_cell_style(val_pct_ops)}>{fmt(val_pct_ops,True)}</td>'
-            html += f'<td class="col-medium"{get_cell_style(val_pct_comm)}>{fmt(val_pct_comm,True)}</td>'
-            html += f'<td class="col-small"{get_cell_style(val_pct_cost)}>{fmt(val_pct_cost,True)}</td>'
-            html += f'<td class="col-small"{get_cell_style(val_pct_ads)}>{fmt(val_pct_ads,True)}</td>'
-            html += f'<td class="col-small"{get_cell_style(val_pct_profit)}>{fmt(val_pct_profit,True)}</td></tr></tbody></table></div>'
-            st.markdown(html, unsafe_allow_html=True)
+                ts = kpi_d['รายละเอียดยอดที่ชำระแล้ว']; tp = kpi_d['Net_Profit']
+                ta = kpi_d['Ads_Amount']; tc = kpi_d['CAL_COST']
+                t_box = kpi_d['BOX_COST']
+                t_ship = kpi_d['DELIV_COST']
+                t_cod = kpi_d['CAL_COD_COST']
+                t_adm = kpi_d['CAL_COM_ADMIN']
+                t_tel = kpi_d['CAL_COM_TELESALE']
+
+                f_roas = ts/ta if ta>0 else 0
+                val_pct_ops = ((t_box + t_ship + t_cod)/ts*100) if ts>0 else 0
+                val_pct_comm = ((t_adm + t_tel)/ts*100) if ts>0 else 0
+                val_pct_cost = (tc/ts*100) if ts>0 else 0
+                val_pct_ads = (ta/ts*100) if ts>0 else 0
+                val_pct_profit = (tp/ts*100) if ts>0 else 0
+
+                if use_grid_d:
+                    frame = df_final_d[[src for _, src, _ in cols_cfg]].set_axis([title for title, _, _ in cols_cfg], axis=1).reset_index(drop=True)
+                    frame['SKU'] = frame['SKU'].astype(str)
+                    frame.loc[len(frame)] = ['TOTAL', '', kpi_d['จำนวนออเดอร์'], ts, tc, t_box, t_ship, t_cod, t_adm, t_tel, ta, tp,
+                                             f_roas, val_pct_ops, val_pct_comm, val_pct_cost, val_pct_ads, val_pct_profit]
+                    return {'metrics': metrics, 'grid': {'frame': frame, 'pinned': ['SKU', 'ชื่อสินค้า'],
+                                                         'pct_cols': [title for title, _, _ in cols_cfg if title.startswith('%')],
+                                                         'num_format': "%,.2f", 'pct_format': "%,.2f%%"}}
+
+                html = '<div class="table-wrapper"><table class="custom-table daily-table"><thead><tr>'
+                for title, _, cls in cols_cfg: html += f'<th class="{cls}">{title}</th>'
+                html += '</tr></thead><tbody>'
+
+                def num_cells(col, is_percent=False, open_tag=None, cls=''):
+                    # open_tag=None: สีแดงตัวหนาเมื่อติดลบ (เหมือน get_cell_style)
+                    vals = df_final_d[col].to_numpy(dtype=float)
+                    text = fmt_col(vals, ',.2f', '%' if is_percent else '', blank_nan=True)
+                    if open_tag is None: open_tag = np.where(vals < 0, f'<td{cls}{NEG_CELL_ATTR}>', f'<td{cls}>')
+                    return td_col(text, open_tag)
+
+                sku_txt = np.array([f"{v}" for v in df_final_d['SKU_Main']], dtype=object)
+                name_txt = np.array([f"{v}" for v in df_final_d['ชื่อสินค้า']], dtype=object)
+                plain = '<td class="col-small" style="color:#1e3c72 !important;">'
+                html += join_rows([
+                    td_col(sku_txt, '<td style="font-weight:bold;color:#1e3c72 !important;">'),
+                    '<td style="text-align:left;font-size:11px;color:#1e3c72 !important; max-width: 100px; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;" title="' + name_txt + '">' + name_txt + '</td>',
+                    num_cells('จำนวนออเดอร์'), # Show Orders
+                    num_cells('รายละเอียดยอดที่ชำระแล้ว'),
+                    num_cells('CAL_COST'),
+                    num_cells('BOX_COST'),
+                    num_cells('DELIV_COST'),
+                    num_cells('CAL_COD_COST'),
+                    num_cells('CAL_COM_ADMIN'),
+                    num_cells('CAL_COM_TELESALE'),
+                    num_cells('Ads_Amount', open_tag='<td style="color:#e67e22 !important;">'),
+                    num_cells('Net_Profit'),
+                    num_cells('ROAS', open_tag=plain),
+                    num_cells('% ค่าดำเนินการ', True, open_tag=plain),
+                    num_cells('% ค่าคอมมิชชัน', True, open_tag=plain),
+                    num_cells('% ทุนสินค้า', True, open_tag=plain),
+                    num_cells('% Ads', True, open_tag=plain),
+                    num_cells('% กำไร', True, cls=' class="col-small"'),
+                ])
+
+                html += '<tr class="footer-row"><td>TOTAL</td><td></td>'
+                html += f'<td{get_cell_style(kpi_d["จำนวนออเดอร์"])}>{fmt(kpi_d["จำนวนออเดอร์"])}</td>' # Sum Orders
+                html += f'<td{get_cell_style(ts)}>{fmt(ts)}</td>'
+                html += f'<td{get_cell_style(tc)}>{fmt(tc)}</td>'
+                html += f'<td{get_cell_style(t_box)}>{fmt(t_box)}</td>'
+                html += f'<td{get_cell_style(t_ship)}>{fmt(t_ship)}</td>'
+                html += f'<td{get_cell_style(t_cod)}>{fmt(t_cod)}</td>'
+                html += f'<td{get_cell_style(t_adm)}>{fmt(t_adm)}</td>'
+                html += f'<td{get_cell_style(t_tel)}>{fmt(t_tel)}</td>'
+                html += f'<td{get_cell_style(ta)}>{fmt(ta)}</td>'
+                html += f'<td{get_cell_style(tp)}>{fmt(tp)}</td>'
+
+                html += f'<td class="col-small"{get_cell_style(f_roas)}>{fmt(f_roas)}</td>'
+                html += f'<td class="col-medium"{get_cell_style(val_pct_ops)}>{fmt(val_pct_ops,True)}</td>'
+                html += f'<td class="col-medium"{get_cell_style(val_pct_comm)}>{fmt(val_pct_comm,True)}</td>'
+                html += f'<td class="col-small"{get_cell_style(val_pct_cost)}>{fmt(val_pct_cost,True)}</td>'
+                html += f'<td class="col-small"{get_cell_style(val_pct_ads)}>{fmt(val_pct_ads,True)}</td>'
+                html += f'<td class="col-small"{get_cell_style(val_pct_profit)}>{fmt(val_pct_profit,True)}</td></tr></tbody></table></div>'
+                return {'metrics': metrics, 'html': html}
+
+        view = page_cache.get((data_version, selected_page, start_d, end_d, filter_mode_d, sel_category_d, tuple(st.session_state.selected_skus_d), use_grid_d), build_daily_view)
+        show_page_view(view, heading="##### 📋 รายละเอียดสินค้า")
 
     # --- PAGE 3: PRODUCT GRAPH ---
-    elif selected_page == "📈 PRODUCT GRAPH":
+    @st.fragment
+    def page_product_graph():
         st.markdown('<div class="header-bar"><div class="header-title"><i class="fas fa-chart-line"></i> กราฟแสดงแนวโน้มยอดขายรายสินค้า</div></div>', unsafe_allow_html=True)
 
         with st.container():
@@ -1401,10 +1157,9 @@ try:
                 st.markdown("<div style='margin-top: 29px;'></div>", unsafe_allow_html=True)
                 st.button("🚀 สร้างกราฟ", type="primary", use_container_width=True, key="btn_run_g")
 
-        mask_g_date = (df_daily['Date'] >= pd.to_datetime(start_g).date()) & (df_daily['Date'] <= pd.to_datetime(end_g).date())
-        df_range_g = df_daily[mask_g_date]
+        df_range_g = slice_dates(df_daily, start_g, end_g)
 
-        sku_stats_g = df_range_g.groupby('SKU_Main').agg({'รายละเอียดยอดที่ชำระแล้ว': 'sum', 'Ads_Amount': 'sum', 'Net_Profit': 'sum'}).reset_index()
+        sku_stats_g = range_sums.by_sku(start_g, end_g).reset_index()
         auto_skus_g = []
 
         if "แสดงสินค้ากำไร" in filter_mode_g:
@@ -1420,31 +1175,32 @@ try:
         real_selected_g = [sku_map_reverse_global[l] for l in selected_labels_g]
 
         pre_final_skus_g = sorted(real_selected_g) if real_selected_g else sorted(auto_skus_g)
-        final_skus_g = filter_skus_by_category(pre_final_skus_g, sel_category_g, sku_type_map)
+        final_skus_g = filter_skus_by_category(pre_final_skus_g, sel_category_g, sku_dim)
 
         if not final_skus_g:
             st.info(f"👈 ไม่พบข้อมูลตามเงื่อนไข ({sel_category_g}) หรือกรุณาเลือกสินค้า")
         else:
-            df_graph = df_range_g[df_range_g['SKU_Main'].isin(final_skus_g)].copy()
+            df_graph = df_range_g[df_range_g['SKU_Main'].isin(final_skus_g)]
 
             if df_graph.empty:
                 st.warning("⚠️ ไม่พบข้อมูลการขายของสินค้าที่เลือกในช่วงเวลานี้")
             else:
-                g_sales = df_graph['รายละเอียดยอดที่ชำระแล้ว'].sum()
-                g_ads = df_graph['Ads_Amount'].sum()
-                g_cost_prod = df_graph['CAL_COST'].sum()
-                g_ops = df_graph['BOX_COST'].sum() + df_graph['DELIV_COST'].sum() + df_graph['CAL_COD_COST'].sum()
-                g_com = df_graph['CAL_COM_ADMIN'].sum() + df_graph['CAL_COM_TELESALE'].sum()
-                g_net_profit = df_graph['Net_Profit'].sum()
+                kpi_g = range_sums.totals(start_g, end_g, final_skus_g)
+                g_sales = kpi_g['รายละเอียดยอดที่ชำระแล้ว']
+                g_ads = kpi_g['Ads_Amount']
+                g_cost_prod = kpi_g['CAL_COST']
+                g_ops = kpi_g['BOX_COST'] + kpi_g['DELIV_COST'] + kpi_g['CAL_COD_COST']
+                g_com = kpi_g['CAL_COM_ADMIN'] + kpi_g['CAL_COM_TELESALE']
+                g_net_profit = kpi_g['Net_Profit']
                 
                 render_metric_row(g_sales, g_ops, g_com, g_cost_prod, g_ads, g_net_profit)
                 
-                df_chart = df_graph.groupby(['Date', 'SKU_Main']).agg({
+                df_chart = df_graph.groupby(['Date', 'SKU_Main'], observed=True).agg({
                     'รายละเอียดยอดที่ชำระแล้ว': 'sum',
                     'จำนวน': 'sum'
                 }).reset_index()
 
-                df_chart['Product_Name'] = df_chart['SKU_Main'].apply(lambda x: f"{x} : {sku_name_lookup.get(x, '')}")
+                df_chart['Product_Name'] = df_chart['SKU_Main'].astype(str).apply(lambda x: f"{x} : {sku_name_lookup.get(x, '')}")
                 df_chart['DateStr'] = df_chart['Date'].astype(str)
 
                 st.markdown("##### 📈 แนวโน้มยอดขายรายวัน (Sales Trend)")
@@ -1482,7 +1238,8 @@ try:
                     st.altair_chart(chart_bar_qty, use_container_width=True)
 
     # --- PAGE 4: YEARLY P&L ---
-    elif selected_page == "📈 YEARLY P&L":
+    @st.fragment
+    def page_yearly_pnl():
         st.markdown('<div class="pnl-container">', unsafe_allow_html=True)
         st.markdown("""
         <div class="header-gradient-pnl">
@@ -1497,19 +1254,15 @@ try:
 
         c_year, c_dummy = st.columns([1, 5])
         with c_year:
-            sel_year_pnl = st.selectbox("เลือกปีงบประมาณ", sorted(df_daily['Year'].unique(), reverse=True), key="pnl_year")
+            sel_year_pnl = st.selectbox("เลือกปีงบประมาณ", sorted(df_daily['Year'].unique().tolist(), reverse=True), key="pnl_year")
 
-        df_yr = df_daily[df_daily['Year'] == sel_year_pnl].copy()
+        month_rollup = rollups['month']
 
-        if df_yr.empty:
+        if sel_year_pnl not in month_rollup.index.get_level_values('Year'):
             st.warning("ไม่พบข้อมูลสำหรับปีที่เลือก")
         else:
-            df_m = df_yr.groupby('Month_Num').agg({
-                'รายละเอียดยอดที่ชำระแล้ว': 'sum',
-                'CAL_COST': 'sum', 'BOX_COST': 'sum',
-                'DELIV_COST': 'sum', 'CAL_COD_COST': 'sum', 'CAL_COM_ADMIN': 'sum', 'CAL_COM_TELESALE': 'sum', 'Ads_Amount': 'sum',
-                'Net_Profit': 'sum'
-            }).reset_index()
+            df_m = month_rollup.loc[sel_year_pnl, ['รายละเอียดยอดที่ชำระแล้ว', 'CAL_COST', 'BOX_COST', 'DELIV_COST', 'CAL_COD_COST',
+                                                   'CAL_COM_ADMIN', 'CAL_COM_TELESALE', 'Ads_Amount', 'Net_Profit']].reset_index()
 
             monthly_fix = []
             for m in range(1, 13):
@@ -1622,7 +1375,8 @@ try:
             st.markdown('</div></div>', unsafe_allow_html=True)
 
     # --- PAGE 5: MONTHLY P&L ---
-    elif selected_page == "📅 MONTHLY P&L":
+    @st.fragment
+    def page_monthly_pnl():
         st.markdown('<div class="pnl-container">', unsafe_allow_html=True)
         st.markdown("""
         <div class="header-gradient-pnl">
@@ -1636,10 +1390,10 @@ try:
         """, unsafe_allow_html=True)
 
         c_y, c_m, c_d = st.columns([1, 1, 4])
-        with c_y: sel_y_m = st.selectbox("เลือกปี", sorted(df_daily['Year'].unique(), reverse=True), key="pm_y")
+        with c_y: sel_y_m = st.selectbox("เลือกปี", sorted(df_daily['Year'].unique().tolist(), reverse=True), key="pm_y")
         with c_m: sel_m_m = st.selectbox("เลือกเดือน", thai_months, index=datetime.now().month-1, key="pm_m")
 
-        df_m_data = df_daily[(df_daily['Year'] == sel_y_m) & (df_daily['Month_Thai'] == sel_m_m)].copy()
+        df_m_days = slice_month(rollups['day'], sel_y_m, thai_months.index(sel_m_m) + 1)
 
         days_in_m = calendar.monthrange(sel_y_m, thai_months.index(sel_m_m)+1)[1]
         df_full_days = pd.DataFrame({'Day': range(1, days_in_m + 1)})
@@ -1647,16 +1401,12 @@ try:
         fix_cost_month = 0
         fix_cost_daily = fix_cost_month / days_in_m if days_in_m > 0 else 0
 
-        if df_m_data.empty:
+        if df_m_days.empty:
             st.warning(f"ไม่พบข้อมูลการขายสำหรับเดือน {sel_m_m} {sel_y_m} (แต่จะแสดงกราฟเปล่าที่มี Fix Cost)")
             df_d_agg_raw = pd.DataFrame(columns=['Day', 'รายละเอียดยอดที่ชำระแล้ว', 'Ads_Amount', 'CAL_COST', 'BOX_COST', 'DELIV_COST', 'CAL_COD_COST', 'CAL_COM_ADMIN', 'CAL_COM_TELESALE'])
         else:
-            df_d_agg_raw = df_m_data.groupby('Day').agg({
-                'รายละเอียดยอดที่ชำระแล้ว': 'sum',
-                'Ads_Amount': 'sum',
-                'CAL_COST': 'sum', 'BOX_COST': 'sum',
-                'DELIV_COST': 'sum', 'CAL_COD_COST': 'sum', 'CAL_COM_ADMIN': 'sum', 'CAL_COM_TELESALE': 'sum'
-            }).reset_index()
+            df_d_agg_raw = df_m_days[['Day', 'รายละเอียดยอดที่ชำระแล้ว', 'Ads_Amount', 'CAL_COST', 'BOX_COST',
+                                      'DELIV_COST', 'CAL_COD_COST', 'CAL_COM_ADMIN', 'CAL_COM_TELESALE']]
 
         df_d_agg = pd.merge(df_full_days, df_d_agg_raw, on='Day', how='left').fillna(0)
 
@@ -1736,9 +1486,9 @@ try:
 
         with c4:
             st.markdown('<div class="chart-box"><div class="chart-header"><span class="pill" style="background:#6366f1"></span> สินค้าขายดีประจำเดือน (Top 12)</div>', unsafe_allow_html=True)
-            if not df_m_data.empty:
-                top_sku_m = df_m_data.groupby('SKU_Main')['รายละเอียดยอดที่ชำระแล้ว'].sum().nlargest(12).reset_index()
-                top_sku_m['Display_Name'] = top_sku_m['SKU_Main'].apply(lambda x: f"{x} : {sku_name_lookup.get(x, 'ไม่ระบุชื่อ')}")
+            if not df_m_days.empty:
+                top_sku_m = rollups['month_sku'].loc[(sel_y_m, thai_months.index(sel_m_m) + 1), 'รายละเอียดยอดที่ชำระแล้ว'].nlargest(12).reset_index()
+                top_sku_m['Display_Name'] = top_sku_m['SKU_Main'].astype(str).apply(lambda x: f"{x} : {sku_name_lookup.get(x, 'ไม่ระบุชื่อ')}")
 
                 chart_sku_m = alt.Chart(top_sku_m).mark_bar(cornerRadiusEnd=4).encode(
                     x=alt.X('รายละเอียดยอดที่ชำระแล้ว', title='ยอดขาย'),
@@ -1790,19 +1540,19 @@ try:
         st.markdown('</div></div>', unsafe_allow_html=True)
 
     # --- PAGE 6: COMMISSION ---
-    elif selected_page == "💰 COMMISSION":
+    @st.fragment
+    def page_commission():
         st.markdown('<div class="header-bar"><div class="header-title"><i class="fas fa-coins"></i> สรุปค่าคอมมิชชั่น (Admin & Telesale)</div></div>', unsafe_allow_html=True)
 
         with st.container():
             c_c1, c_c2, c_c3 = st.columns([1, 1, 3])
-            with c_c1: sel_year_c = st.selectbox("เลือกปี", sorted(df_daily['Year'].unique(), reverse=True), key="c_y")
+            with c_c1: sel_year_c = st.selectbox("เลือกปี", sorted(df_daily['Year'].unique().tolist(), reverse=True), key="c_y")
             with c_c2: sel_month_c = st.selectbox("เลือกเดือน", thai_months, index=datetime.now().month-1, key="c_m")
 
         st.markdown(f"### 📅 ประจำเดือน: {sel_month_c} {sel_year_c}")
 
-        df_comm = df_daily[(df_daily['Year'] == sel_year_c) & (df_daily['Month_Thai'] == sel_month_c)].copy()
-
         month_idx = thai_months.index(sel_month_c) + 1
+        df_comm = slice_month(rollups['day'], sel_year_c, month_idx)
         days_in_m = calendar.monthrange(sel_year_c, month_idx)[1]
         df_full_days = pd.DataFrame({'Day': range(1, days_in_m + 1)})
 
@@ -1834,10 +1584,7 @@ try:
             with c_chart:
                 st.markdown("##### 📈 แนวโน้มค่าคอมรายวัน (Daily Trend)")
 
-                df_chart_c = df_comm.groupby('Day').agg({
-                    'CAL_COM_ADMIN': 'sum',
-                    'CAL_COM_TELESALE': 'sum'
-                }).reset_index()
+                df_chart_c = df_comm[['Day', 'CAL_COM_ADMIN', 'CAL_COM_TELESALE']]
 
                 df_merged_c = pd.merge(df_full_days, df_chart_c, on='Day', how='left').fillna(0)
 
@@ -1875,13 +1622,8 @@ try:
             'Month_Thai': thai_months
         })
 
-        df_year_comm = df_daily[df_daily['Year'] == sel_year_c].copy()
-
-        if not df_year_comm.empty:
-            df_year_agg = df_year_comm.groupby(['Month_Num']).agg({
-                'CAL_COM_ADMIN': 'sum',
-                'CAL_COM_TELESALE': 'sum'
-            }).reset_index()
+        if sel_year_c in rollups['month'].index.get_level_values('Year'):
+            df_year_agg = rollups['month'].loc[sel_year_c, ['CAL_COM_ADMIN', 'CAL_COM_TELESALE']].reset_index()
         else:
             df_year_agg = pd.DataFrame(columns=['Month_Num', 'CAL_COM_ADMIN', 'CAL_COM_TELESALE'])
 
@@ -1902,7 +1644,8 @@ try:
         st.altair_chart(chart_year, use_container_width=True)
 
     # --- PAGE 7: MASTER_ITEM (UI ปรับความสูงตารางได้) ---
-    elif selected_page == "🔧 MASTER_ITEM":
+    @st.fragment
+    def page_master_item():
         st.markdown('<div class="header-bar"><div class="header-title"><i class="fas fa-tools"></i> จัดการ Master Item (แก้ไขต้นทุน/เรทค่าใช้จ่าย)</div></div>', unsafe_allow_html=True)
         
         def get_master_worksheet():
@@ -1915,7 +1658,18 @@ try:
                 st.error(f"⚠️ ไม่สามารถเชื่อมต่อ MASTER_ITEM: {e}")
                 return None
 
-        ws = get_master_worksheet()
+        if not sku_report.empty:
+            n_root = int((sku_report['Match'] == 'root').sum())
+            n_unres = int((sku_report['Match'] == 'unresolved').sum())
+            with st.expander(f"🔍 SKU ที่ไม่ตรงกับ MASTER: ใช้ SKU หลักแทน {n_root} รายการ | ไม่พบใน MASTER {n_unres} รายการ"):
+                st.dataframe(sku_report, use_container_width=True, hide_index=True)
+
+        if os.environ.get("SHOP_DATA_DIR"):
+            # โหมดอ่านไฟล์จากโฟลเดอร์บนเครื่อง: แก้ไขที่ไฟล์ MASTER_ITEM.xlsx โดยตรง
+            st.info(f"📁 กำลังใช้ข้อมูลจากโฟลเดอร์ {os.environ['SHOP_DATA_DIR']} (แก้ไขต้นทุนได้ที่ไฟล์ MASTER_ITEM.xlsx ในโฟลเดอร์นี้)")
+            ws = None
+        else:
+            ws = get_master_worksheet()
         
         if ws:
             try:
@@ -1995,13 +1749,32 @@ try:
                             vals = [save_df.columns.values.tolist()] + save_df.astype(str).values.tolist()
                             ws.clear()
                             ws.update(range_name='A1', values=vals)
-                            st.success("✅ บันทึกข้อมูลเรียบร้อยแล้ว!")
-                            st.cache_data.clear() 
+                            if SNAPSHOT_ONLY:
+                                st.success("✅ บันทึกข้อมูลเรียบร้อยแล้ว! ตัวเลขในรายงานจะอัปเดตหลัง pipeline รอบถัดไปทำงานเสร็จ")
+                            else:
+                                get_refresher().refresh(fresh=True)
+                                st.success("✅ บันทึกข้อมูลเรียบร้อยแล้ว!")
                     except Exception as e:
                         st.error(f"❌ เกิดข้อผิดพลาดขณะบันทึก: {e}")
 
             except Exception as e:
                 st.error(f"❌ เกิดข้อผิดพลาดในการโหลดข้อมูล: {e}")
 
+    PAGES = {
+        "📊 REPORT_MONTH": page_report_month,
+        "📢 REPORT_ADS": page_report_ads,
+        "📅 REPORT_DAILY": page_report_daily,
+        "📈 PRODUCT GRAPH": page_product_graph,
+        "📈 YEARLY P&L": page_yearly_pnl,
+        "📅 MONTHLY P&L": page_monthly_pnl,
+        "💰 COMMISSION": page_commission,
+        "🔧 MASTER_ITEM": page_master_item,
+    }
+    PAGES[selected_page]()
+
+    # แสดงหลังหน้าถูก render แล้ว ตัวเลขจึงรวมรอบปัจจุบันด้วย
+    with st.sidebar:
+        st.caption(f"⚡ แคชผลลัพธ์หน้า: ใช้ซ้ำ {page_cache.hits} ครั้ง · คำนวณใหม่ {page_cache.misses} ครั้ง · เก็บอยู่ {len(page_cache.items)}/{page_cache.max_items} รายการ ({page_cache.total_bytes / 1024 / 1024:,.1f}/{page_cache.max_bytes / 1024 / 1024:,.0f} MB)")
+
 except Exception as e:
     st.error(f"Application Error: {e}")
\ No newline at end of file
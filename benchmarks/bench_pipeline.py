@@ -0,0 +1,228 @@
+# ==========================================
+# BENCHMARK: เวลา / หน่วยความจำสูงสุดของแต่ละขั้นใน pipeline และการคำนวณของแต่ละหน้า
+# ==========================================
+# ใช้: python benchmarks/bench_pipeline.py [--lines 10000 100000 1000000] [--months 12] [--skus 300]
+#                                        [--data-root DIR] [--json ผลลัพธ์.json]
+# สร้างข้อมูลจำลองด้วย synth_data.py ตามจำนวนแถวที่กำหนด (ถ้ามีอยู่แล้วใน --data-root จะใช้ของเดิม)
+# แล้วเรียกฟังก์ชันจริงใน pipeline.py ทีละขั้นตามลำดับเดียวกับ process_data:
+#   ingest         อ่าน CSV ดิบ (เฉพาะคอลัมน์ใน READ_SPECS)
+#   date_parse     safe_date_series ของ เวลาสั่งซื้อ / วัน
+#   numeric_clean  safe_float_series ของคอลัมน์ตัวเลข
+#   load_files     load_export_files แบบที่แอปใช้จริง (= 3 ขั้นบนรวมกัน หลาย thread ไม่ใช้แคช)
+#   read_master    อ่านชีท MASTER_ITEM / FIX_COST (openpyxl)
+#   master         prepare_master
+#   prepare_sales  ตัดออเดอร์ยกเลิก + ads_agg
+#   ads_agg        aggregate_ads อย่างเดียว (วัดซ้ำแยกจาก prepare_sales)
+#   sku_merge / costing / order_agg / daily_agg / sku_maps / outputs   ขั้นย่อยของ cost_orders
+#   snapshot_save / snapshot_load   DiskSnapshot
+# หน้า (page_*) วัดเฉพาะส่วนคำนวณก่อนสร้าง HTML ของเดือนล่าสุด โดยเลือก SKU ทั้งหมด
+# หน่วยความจำ (รันขั้นเดิมซ้ำอีกรอบหลังจับเวลา เพราะการวัดทำให้ช้าลงมาก; --no-memory = ไม่วัด):
+#   py MB   peak ของ tracemalloc (object ของ Python + buffer ของ numpy) ไม่นับคอลัมน์ str ของ pandas ที่อยู่ใน Arrow
+#   rss MB  RSS สูงสุดของ process ระหว่างขั้น ลบด้วย RSS ตอนเริ่มขั้น (อ่าน /proc/self/statm เฉพาะ Linux ไม่มีจะเป็น -)
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import tracemalloc
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from pipeline import (READ_SPECS, LocalFolderSource, list_export_files, load_export_files, safe_date_series,
+                      safe_float_series, prepare_master, prepare_sales, aggregate_ads, merge_master, apply_costs,
+                      aggregate_orders, aggregate_daily, build_sku_maps, finish_outputs, process_data,
+                      DiskSnapshot, slice_dates, slice_month, build_day_matrix)
+from synth_data import make_dataset, orders_per_day_for
+
+DEFAULT_LINES = [10000, 100000, 1000000]
+TRACE_MEMORY = True
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as fp: return int(fp.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError): return None
+
+class RssSampler:
+    # อ่าน RSS ทุก interval วินาทีใน thread แยก เก็บค่าสูงสุดไว้
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.base = self.peak = rss_mb()
+        if self.base is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.base is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, rss_mb())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def delta(self):
+        return self.peak - self.base if self.base is not None else None
+
+def measure(results, stage, fn):
+    # fn ต้องเรียกซ้ำได้ (ไม่แก้ input จนรอบที่สองได้ผลต่างไป)
+    t0 = time.perf_counter()
+    value = fn()
+    seconds = time.perf_counter() - t0
+    py_mb = rss_delta = None
+    if TRACE_MEMORY:
+        tracemalloc.start()
+        with RssSampler() as rss: fn()
+        py_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        rss_delta = rss.delta()
+    results.append({'stage': stage, 'seconds': seconds, 'py_mb': py_mb, 'rss_mb': rss_delta})
+    return value
+
+def read_raw(files, kind):
+    spec = READ_SPECS[kind]
+    wanted = {h for _, headers, _ in spec for h in headers}
+    id_cols = {h: str for _, headers, col_type in spec if col_type == 'id' for h in headers}
+    return pd.concat([pd.read_csv(f['path'], usecols=lambda c: c in wanted, dtype=id_cols) for f in files], ignore_index=True)
+
+def columns_of_type(kind, col_type):
+    return [name for name, _, t in READ_SPECS[kind] if t == col_type]
+
+def bench_stages(data_dir, results):
+    source = LocalFolderSource(data_dir)
+    files_data, files_ads = list_export_files(source)
+
+    raw_data = measure(results, 'ingest', lambda: (read_raw(files_data, 'data'), read_raw(files_ads, 'ads')))
+    measure(results, 'date_parse', lambda: [safe_date_series(raw[col]) for raw, kind in zip(raw_data, ('data', 'ads'))
+                                            for col in columns_of_type(kind, 'date')])
+    measure(results, 'numeric_clean', lambda: [safe_float_series(raw[col]) for raw, kind in zip(raw_data, ('data', 'ads'))
+                                               for col in columns_of_type(kind, 'num')])
+    del raw_data
+
+    df_data, df_ads_raw = measure(results, 'load_files', lambda: load_export_files(source, files_data, files_ads, cache_dir=None))
+    df_master, df_fix_cost = measure(results, 'read_master', source.read_master)
+    df_master = measure(results, 'master', lambda: prepare_master(df_master))
+    sales = measure(results, 'prepare_sales', lambda: prepare_sales(df_data, df_ads_raw.copy()))
+    measure(results, 'ads_agg', lambda: aggregate_ads(df_ads_raw.copy()))
+
+    df_merged, sku_report = measure(results, 'sku_merge', lambda: merge_master(sales['orders'], df_master))
+    df_merged = measure(results, 'costing', lambda: apply_costs(df_merged))
+    df_order = measure(results, 'order_agg', lambda: aggregate_orders(df_merged))
+    del df_merged
+    df_daily = measure(results, 'daily_agg', lambda: aggregate_daily(df_order, sales['ads']))
+    sku_map, sku_list, sku_type_map = measure(results, 'sku_maps', lambda: build_sku_maps(df_daily, df_master))
+    data = measure(results, 'outputs', lambda: finish_outputs(df_daily, df_fix_cost, sku_map, sku_list, sku_type_map, sku_report))
+
+    # ขั้นย่อยข้างบนต้องได้ผลเดียวกับ process_data ทั้งชุด
+    full = measure(results, 'process_data', lambda: process_data(source, cache_dir=None))
+    if not full['df_daily'].equals(data['df_daily']): raise SystemExit("df_daily จากขั้นย่อยไม่ตรงกับ process_data")
+
+    snap_dir = tempfile.mkdtemp(prefix="bench_snapshot_")
+    try:
+        measure(results, 'snapshot_save', lambda: DiskSnapshot(snap_dir, data_dir).save(data, ('bench', data_dir)))
+        measure(results, 'snapshot_load', lambda: DiskSnapshot(snap_dir, data_dir).load())
+    finally:
+        shutil.rmtree(snap_dir, ignore_errors=True)
+    return data
+
+def bench_pages(data, results):
+    # ทำซ้ำขั้นคำนวณของแต่ละหน้าใน app.py (ไม่รวมการสร้าง HTML / ส่งไป browser)
+    df_daily, range_sums, rollups = data['df_daily'], data['range_sums'], data['rollups']
+    last = df_daily['Date'].max()
+    start, end = last.replace(day=1).date(), last.date()
+    skus = data['sku_list']
+    dates = pd.date_range(start, end)
+
+    def report_month():
+        range_sums.by_sku(start, end)
+        range_sums.totals(start, end, skus)
+        df_view = slice_dates(df_daily, start, end)
+        df_view = df_view[df_view['SKU_Main'].isin(skus)]
+        build_day_matrix(df_view, dates, skus, 'Net_Profit', ['รายละเอียดยอดที่ชำระแล้ว', 'จำนวนออเดอร์', 'Net_Profit', 'Ads_Amount'])
+        range_sums.by_sku(start, end, present_only=False).reindex(skus, fill_value=0)
+
+    def report_ads():
+        range_sums.by_sku(start, end)
+        range_sums.totals(start, end, skus)
+        df_view = slice_dates(df_daily, start, end)
+        build_day_matrix(df_view[df_view['SKU_Main'].isin(skus)], dates, skus, 'Ads_Amount', ['Ads_Amount'])
+
+    def report_daily():
+        range_sums.by_sku(start, end)
+        range_sums.totals(start, end, skus)
+
+    def product_graph():
+        range_sums.by_sku(start, end)
+        df_graph = slice_dates(df_daily, start, end)
+        df_graph = df_graph[df_graph['SKU_Main'].isin(skus)]
+        range_sums.totals(start, end, skus)
+        df_graph.groupby(['Date', 'SKU_Main'], observed=True).agg({'รายละเอียดยอดที่ชำระแล้ว': 'sum', 'จำนวน': 'sum'}).reset_index()
+
+    def yearly_pnl():
+        rollups['month'].loc[last.year].reset_index()
+
+    def monthly_pnl():
+        slice_month(rollups['day'], last.year, last.month)
+        rollups['month_sku'].loc[(last.year, last.month), 'รายละเอียดยอดที่ชำระแล้ว'].nlargest(12)
+
+    def commission():
+        slice_month(rollups['day'], last.year, last.month)
+        rollups['month'].loc[last.year, ['CAL_COM_ADMIN', 'CAL_COM_TELESALE']].reset_index()
+
+    for name, fn in [('page_report_month', report_month), ('page_report_ads', report_ads), ('page_report_daily', report_daily),
+                     ('page_product_graph', product_graph), ('page_yearly_pnl', yearly_pnl),
+                     ('page_monthly_pnl', monthly_pnl), ('page_commission', commission)]:
+        measure(results, name, fn)
+
+def print_table(lines, n_rows, results):
+    print(f"\n=== {lines:,} แถว (ได้จริง {n_rows:,}) ===")
+    print(f"{'stage':<20}{'seconds':>10}{'py MB':>10}{'rss MB':>10}")
+    for r in results:
+        mem = "".join(f"{r[k]:>10.1f}" if r[k] is not None else f"{'-':>10}" for k in ('py_mb', 'rss_mb'))
+        print(f"{r['stage']:<20}{r['seconds']:>10.3f}{mem}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="วัดเวลา/หน่วยความจำของ pipeline กับข้อมูลจำลองหลายขนาด")
+    parser.add_argument("--lines", type=int, nargs="+", default=DEFAULT_LINES, help="จำนวนแถวในไฟล์ยอดขาย (หลายค่าได้)")
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--skus", type=int, default=300)
+    parser.add_argument("--lines-per-order", type=float, default=1.4)
+    parser.add_argument("--data-root", default=os.path.join(tempfile.gettempdir(), "shop_bench_data"),
+                        help="โฟลเดอร์เก็บข้อมูลจำลอง (ใช้ซ้ำได้ระหว่างรอบ)")
+    parser.add_argument("--json", default=None, help="บันทึกผลเป็น JSON")
+    parser.add_argument("--no-memory", action="store_true", help="จับเวลาอย่างเดียว ไม่รันซ้ำเพื่อวัดหน่วยความจำ")
+    args = parser.parse_args(argv)
+    global TRACE_MEMORY
+    TRACE_MEMORY = not args.no_memory
+
+    report = []
+    for lines in args.lines:
+        data_dir = os.path.join(args.data_root, f"lines_{lines}_m{args.months}_s{args.skus}")
+        if not os.path.isdir(os.path.join(data_dir, 'sales')):
+            t0 = time.perf_counter()
+            make_dataset(data_dir, months=args.months, skus=args.skus, lines_per_order=args.lines_per_order,
+                         orders_per_day=orders_per_day_for(lines, args.months, args.lines_per_order))
+            print(f"สร้างข้อมูล {data_dir} ใช้เวลา {time.perf_counter() - t0:.1f} วินาที")
+        n_rows = sum(len(pd.read_csv(os.path.join(data_dir, 'sales', f), usecols=[0])) for f in os.listdir(os.path.join(data_dir, 'sales')))
+
+        results = []
+        data = bench_stages(data_dir, results)
+        bench_pages(data, results)
+        print_table(lines, n_rows, results)
+        report.append({'lines': lines, 'rows': n_rows, 'months': args.months, 'skus': args.skus, 'results': results})
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fp: json.dump(report, fp, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# ==========================================
+# SYNTHETIC DATA (สร้างไฟล์ export จำลองสำหรับวัดความเร็ว pipeline โดยไม่ต้องใช้ข้อมูลจริงบน Drive)
+# ==========================================
+# โครงสร้างโฟลเดอร์เดียวกับ LocalFolderSource จึงรันแอปหรือ pipeline กับข้อมูลนี้ได้เลย:
+#   <out>/sales/JST_YYYY_MM.csv   ไฟล์ยอดขาย JST เดือนละไฟล์ (1 แถว = 1 รายการสินค้าในออเดอร์)
+#   <out>/ads/ADS_YYYY_MM.csv     ไฟล์ค่า ADS เดือนละไฟล์ (ชื่อแคมเปญมี [SKU])
+#   <out>/MASTER_ITEM.xlsx        ชีท MASTER_ITEM และ FIX_COST
+#
+# ใช้: python benchmarks/synth_data.py OUT [--months 12] [--orders-per-day 300] [--lines-per-order 1.4] [--skus 150]
+#      SHOP_DATA_DIR=OUT streamlit run app.py
+# ค่าทั้งหมดสุ่มจาก seed เดียว (ได้ไฟล์เดิมทุกครั้ง)
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import date
+
+# ชื่อขนส่งตามที่พบในไฟล์ JST (ค่าว่าง = Standard Delivery, ชื่อที่ไม่อยู่ใน MASTER ก็ใช้เรท Standard Delivery)
+DEFAULT_COURIERS = ["J&T Express", "Flash Express", "Kerry Express", "Thailand Post", "Shopee Express",
+                    "Lazada Express", "DHL Domestic", "Best Express", ""]
+COURIER_RATE_COLS = ['J&T Express', 'Flash Express', 'ThailandPost', 'DHL_1', 'LEX TH', 'SPX Express',
+                     'Express Delivery - ส่งด่วน', 'Standard Delivery - ส่งธรรมดาในประเทศ']
+SKU_TYPES = ['กลุ่ม DKUB', 'กลุ่ม SMASH', 'กลุ่ม อาหารเสริม', 'กลุ่ม ปกติ']
+VARIANTS = ['-RED', '-BLUE', '-L', '-XL']  # รูปแบบสินค้าที่ไม่มีใน MASTER (resolve_skus ใช้ค่าของ SKU หลักแทน)
+
+def month_starts(start, months):
+    return [pd.Timestamp(start) + pd.DateOffset(months=i) for i in range(months)]
+
+def make_master(skus, rng):
+    n = len(skus)
+    cost = rng.uniform(40, 400, n).round(0)
+    master = pd.DataFrame({
+        'SKU': skus,
+        'ชื่อสินค้า': [f"สินค้า {sku}" for sku in skus],
+        'Type': rng.choice(SKU_TYPES, n),
+        'ทุน': cost,
+        'ราคากล่อง': rng.choice([4, 5, 6.5, 8], n),
+        'ค่าส่งเฉลี่ย': rng.choice([25, 30, 35, 45], n),
+        'ค่าคอมมิชชั่น Admin': rng.choice(['2%', '3%', '5%'], n),
+        'ค่าคอมมิชชั่น Telesale': rng.choice(['4%', '5%', '7%'], n),
+    })
+    for col in COURIER_RATE_COLS:
+        master[col] = rng.choice(['2%', '2.5%', '3%', '3.2%'], n)
+    fix_cost = pd.DataFrame({'รายการ': ['ค่าเช่า', 'เงินเดือน', 'ค่าน้ำค่าไฟ'], 'จำนวน': [15000, 120000, 4000]})
+    return master, fix_cost, cost
+
+def make_sales_month(month_start, order_id0, skus, price, popularity, rng, orders_per_day, lines_per_order,
+                     couriers, cod_share, admin_share, cancel_share, variant_share, unknown_share):
+    days = month_start.days_in_month
+    orders_by_day = rng.poisson(orders_per_day, days)
+    n_orders = int(orders_by_day.sum())
+    if n_orders == 0: return None, order_id0
+
+    # --- ค่าระดับออเดอร์ ---
+    day_of_order = np.repeat(np.arange(days), orders_by_day)
+    seconds = rng.integers(0, 86400, n_orders)
+    ts = np.datetime64(month_start.date()) + day_of_order.astype('timedelta64[D]') + seconds.astype('timedelta64[s]')
+    order_time = np.char.replace(np.datetime_as_string(ts, unit='s'), 'T', ' ')
+    order_ids = (order_id0 + np.arange(n_orders)).astype(str)
+    status = np.where(rng.random(n_orders) < cancel_share, 'ยกเลิก', 'สำเร็จ')
+    courier = rng.choice(couriers, n_orders)
+    is_cod = rng.random(n_orders) < cod_share
+    payment = np.where(is_cod, rng.choice(['COD', 'ชำระเงินปลายทาง'], n_orders), rng.choice(['โอนเงิน', 'บัตรเครดิต'], n_orders))
+    is_admin = rng.random(n_orders) < admin_share
+    work_type = np.where(is_admin, 'แอดมิน', 'เทเลเซลล์')
+    creator = np.where(is_admin, 'admin', 'tele').astype(object) + rng.integers(1, 6, n_orders).astype(str).astype(object)
+
+    # --- ขยายเป็นรายการสินค้า (lines_per_order = ค่าเฉลี่ย อย่างน้อย 1 รายการต่อออเดอร์) ---
+    lines = 1 + rng.poisson(max(lines_per_order - 1, 0), n_orders)
+    idx = np.repeat(np.arange(n_orders), lines)
+    n_lines = len(idx)
+    sku_idx = rng.choice(len(skus), n_lines, p=popularity)
+    sku_text = np.array(skus, dtype=object)[sku_idx]
+    has_variant = rng.random(n_lines) < variant_share
+    sku_text[has_variant] = sku_text[has_variant] + rng.choice(VARIANTS, int(has_variant.sum())).astype(object)
+    unknown = rng.random(n_lines) < unknown_share
+    sku_text[unknown] = 'ZZ' + rng.integers(0, 5, int(unknown.sum())).astype(str).astype(object)
+    qty = 1 + rng.poisson(0.3, n_lines)
+    paid = (price[sku_idx] * qty * rng.choice([1.0, 0.95, 0.9], n_lines)).round(2)
+
+    df = pd.DataFrame({
+        'หมายเลขคำสั่งซื้อออนไลน์': order_ids[idx],
+        'ร้านค้า': 'Shop A',
+        'สถานะคำสั่งซื้อ': status[idx],
+        'บริษัทขนส่ง': courier[idx],
+        'เวลาสั่งซื้อ': order_time[idx],
+        'รูปแบบสินค้า': sku_text,
+        'ชื่อสินค้า': np.array([f"สินค้า {sku}" for sku in skus], dtype=object)[sku_idx],
+        'จำนวน': qty,
+        'รายละเอียดยอดที่ชำระแล้ว': pd.Series(paid).map('{:,.2f}'.format),  # ไฟล์ JST มีคอมมาคั่นหลักพัน
+        'ผู้สร้างคำสั่งซื้อ': creator[idx],
+        'วิธีการชำระเงิน': payment[idx],
+        'ประเภทการทำงาน': work_type[idx],
+        'หมายเหตุ': '',
+    })
+    return df, order_id0 + n_orders
+
+def make_ads_month(month_start, skus, rng, ads_share):
+    days = pd.date_range(month_start, periods=month_start.days_in_month)
+    n_ads = max(1, int(len(skus) * ads_share))
+    day_idx = np.repeat(np.arange(len(days)), n_ads)
+    sku_idx = np.concatenate([rng.choice(len(skus), n_ads, replace=False) for _ in days])
+    return pd.DataFrame({
+        'วัน': days.strftime('%Y-%m-%d')[day_idx],
+        'ชื่อแคมเปญ': [f"โฆษณา [{skus[i]}] แคมเปญหลัก" for i in sku_idx],
+        'จำนวนเงินที่ใช้จ่ายไป (THB)': rng.gamma(2.0, 150.0, len(sku_idx)).round(2),
+    })
+
+def make_dataset(out_dir, months=3, orders_per_day=200, lines_per_order=1.4, skus=100, couriers=None,
+                 cod_share=0.6, admin_share=0.5, cancel_share=0.05, variant_share=0.2, unknown_share=0.005,
+                 ads_share=0.3, start=date(2025, 1, 1), seed=0):
+    # คืนจำนวนแถวในไฟล์ยอดขายทั้งหมด
+    rng = np.random.default_rng(seed)
+    couriers = DEFAULT_COURIERS if couriers is None else couriers
+    sku_names = [f"SKU{i:04d}" for i in range(skus)]
+    popularity = 1.0 / np.arange(1, skus + 1) ** 0.8  # สินค้าขายดีไม่กี่ตัว ที่เหลือขายน้อย
+    popularity /= popularity.sum()
+
+    os.makedirs(os.path.join(out_dir, 'sales'), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, 'ads'), exist_ok=True)
+    master, fix_cost, cost = make_master(sku_names, rng)
+    price = (cost * rng.uniform(1.6, 3.0, skus)).round(0)
+    with pd.ExcelWriter(os.path.join(out_dir, 'MASTER_ITEM.xlsx')) as writer:
+        master.to_excel(writer, sheet_name='MASTER_ITEM', index=False)
+        fix_cost.to_excel(writer, sheet_name='FIX_COST', index=False)
+
+    total_lines = 0
+    order_id = 5800000000
+    for month_start in month_starts(start, months):
+        tag = month_start.strftime('%Y_%m')
+        df, order_id = make_sales_month(month_start, order_id, sku_names, price, popularity, rng, orders_per_day,
+                                        lines_per_order, couriers, cod_share, admin_share, cancel_share,
+                                        variant_share, unknown_share)
+        if df is not None:
+            df.to_csv(os.path.join(out_dir, 'sales', f"JST_{tag}.csv"), index=False)
+            total_lines += len(df)
+        make_ads_month(month_start, sku_names, rng, ads_share).to_csv(os.path.join(out_dir, 'ads', f"ADS_{tag}.csv"), index=False)
+    return total_lines
+
+def orders_per_day_for(lines, months, lines_per_order):
+    # จำนวนออเดอร์ต่อวันที่ให้ได้ประมาณ lines แถวในช่วง months เดือน
+    return max(1.0, lines / (months * 30.4 * lines_per_order))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="สร้างไฟล์ JST / ADS / MASTER_ITEM จำลอง")
+    parser.add_argument("out", help="โฟลเดอร์ปลายทาง (โครงสร้างแบบ SHOP_DATA_DIR)")
+    parser.add_argument("--months", type=int, default=3, help="จำนวนเดือนย้อนหลัง")
+    parser.add_argument("--orders-per-day", type=float, default=200)
+    parser.add_argument("--lines", type=int, default=None, help="กำหนดจำนวนแถวโดยประมาณแทน --orders-per-day")
+    parser.add_argument("--lines-per-order", type=float, default=1.4, help="จำนวนรายการสินค้าเฉลี่ยต่อออเดอร์")
+    parser.add_argument("--skus", type=int, default=100)
+    parser.add_argument("--couriers", default=None, help="รายชื่อขนส่งคั่นด้วย , (ค่าเริ่มต้น: DEFAULT_COURIERS)")
+    parser.add_argument("--cod-share", type=float, default=0.6, help="สัดส่วนออเดอร์เก็บเงินปลายทาง")
+    parser.add_argument("--admin-share", type=float, default=0.5, help="สัดส่วนออเดอร์จาก Admin (ที่เหลือเป็น Telesale)")
+    parser.add_argument("--start", default="2025-01-01")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    orders_per_day = args.orders_per_day
+    if args.lines: orders_per_day = orders_per_day_for(args.lines, args.months, args.lines_per_order)
+    couriers = args.couriers.split(',') if args.couriers is not None else None
+    n = make_dataset(args.out, months=args.months, orders_per_day=orders_per_day, lines_per_order=args.lines_per_order,
+                     skus=args.skus, couriers=couriers, cod_share=args.cod_share, admin_share=args.admin_share,
+                     start=date.fromisoformat(args.start), seed=args.seed)
+    print(f"{n} แถว -> {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1261 @@
+# ==========================================
+# DATA PIPELINE (โหลดไฟล์ + คำนวณต้นทุน/กำไร ไม่ขึ้นกับ Streamlit)
+# ==========================================
+# app.py import ส่วนนี้ไปใช้ และรันเดี่ยวจาก command line ได้ (ดู main ท้ายไฟล์)
+# ห้าม import streamlit / altair ในไฟล์นี้
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import io
+import os
+import sys
+import json
+import hashlib
+import threading
+import time
+import calendar
+import argparse
+import tempfile
+import tomllib
+from contextlib import contextmanager
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+import gspread
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseDownload
+if os.name == "nt": import msvcrt
+else: import fcntl
+
+# ------------------------------
+# SETTINGS & HELPERS
+# ------------------------------
+thai_months = ["มกราคม", "กุมภาพันธ์", "มีนาคม", "เมษายน", "พฤษภาคม", "มิถุนายน",
+               "กรกฎาคม", "สิงหาคม", "กันยายน", "ตุลาคม", "พฤศจิกายน", "ธันวาคม"]
+
+FOLDER_ID_DATA = "1ciI_X2m8pVcsjRsPuUf5sg--6uPSPPDp"  # ไฟล์ยอดขาย JST
+FOLDER_ID_ADS = "1ZE76TXNA_vNeXjhAZfLgBQQGIV0GY7w8"   # ไฟล์ค่า ADS
+SHEET_MASTER_URL = "https://docs.google.com/spreadsheets/d/1Q3akHm1GKkDI2eilGfujsd9pO7aOjJvyYJNuXd98lzo/edit?gid=0#gid=0" # ชีทตั้งค่าทุน
+DOWNLOAD_WORKERS = 8  # จำนวน thread สูงสุดที่ใช้ดาวน์โหลดไฟล์จาก Drive พร้อมกัน
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(APP_DIR, ".cache")  # แคชไฟล์ที่ parse แล้วบนดิสก์
+SECRETS_PATH = os.path.join(APP_DIR, ".streamlit", "secrets.toml")  # ไฟล์เดียวกับ st.secrets (ส่วน [gcp_service_account])
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive.readonly', 'https://www.googleapis.com/auth/spreadsheets']
+
+def safe_float(val):
+    if pd.isna(val) or val == "" or val is None: return 0.0
+    s = str(val).strip().replace(',', '').replace('฿', '').replace(' ', '')
+    if s in ['-', 'nan', 'NaN', 'None']: return 0.0
+    try:
+        if '%' in s: return float(s.replace('%', '')) / 100
+        return float(s)
+    except: return 0.0
+
+def safe_float_series(series):
+    # แบบเดียวกับ safe_float แต่แปลงทั้งคอลัมน์ในครั้งเดียว (ไม่วนทีละแถว)
+    # ตัด , ฿ ช่องว่าง / ค่าว่าง - nan = 0 / ค่าที่ลงท้าย % หาร 100
+    s = pd.Series(series)
+    if pd.api.types.is_bool_dtype(s.dtype):
+        return pd.Series(0.0, index=s.index)
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        return s.astype(float).fillna(0.0)
+
+    # ยอดเงิน/เรทมีค่าซ้ำกันมาก จึงแปลงเฉพาะค่าที่ไม่ซ้ำแล้วกระจายกลับด้วย codes
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    if len(uniques) == 0: return pd.Series(0.0, index=s.index)
+    raw = pd.Series(uniques, dtype=object)
+    txt = raw.astype(str).str.strip().str.replace(',', '', regex=False).str.replace('฿', '', regex=False).str.replace(' ', '', regex=False)
+    is_pct = txt.str.contains('%', regex=False).to_numpy(dtype=bool)
+    num = pd.to_numeric(txt.str.replace('%', '', regex=False), errors='coerce').astype(float).to_numpy()
+    num = np.where(is_pct, num / 100, num)
+
+    # ค่าที่ pandas แปลงไม่ได้แต่ float() ของ Python อ่านได้ (เช่น 1_000, เลขไทย) ส่งให้ safe_float ตัดสินทีละค่าที่ไม่ซ้ำ
+    failed = np.isnan(num) & ~txt.isin(['', '-', 'nan', 'NaN', 'None']).to_numpy(dtype=bool)
+    if failed.any():
+        num[failed] = [safe_float(v) for v in raw[failed]]
+    num = np.where(np.isnan(num) & ~failed, 0.0, num)
+    return pd.Series(np.where(codes >= 0, num[codes], 0.0), index=s.index)
+
+def safe_date(val):
+    try: return pd.to_datetime(val).date()
+    except: return None
+
+# รูปแบบเวลาที่พบในไฟล์ JST / ADS (ขึ้นต้นด้วยปีทั้งหมด จึงไม่กำกวมเรื่องวัน/เดือน)
+DATE_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d',
+                '%Y/%m/%d %H:%M:%S', '%Y/%m/%d %H:%M', '%Y/%m/%d']
+
+def safe_date_series(series):
+    # แบบเดียวกับ safe_date แต่แปลงทั้งคอลัมน์: ได้ datetime64 (ตัดเวลาออก) และค่าที่อ่านไม่ได้เป็น NaT
+    # เวลาสั่งซื้อซ้ำกันมาก จึง parse เฉพาะค่าที่ไม่ซ้ำ ลองรูปแบบใน DATE_FORMATS ก่อน ที่เหลือค่อยให้ safe_date ตัดสิน
+    s = pd.Series(series)
+    if isinstance(s.dtype, pd.DatetimeTZDtype):
+        s = s.dt.tz_localize(None)
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return s.dt.normalize().astype('datetime64[ns]')
+
+    def to_ns(values):
+        # วันที่ที่อยู่นอกช่วง datetime64[ns] (เช่น ปี 0001) ถือว่าอ่านไม่ได้
+        ok = (values.notna() & (values >= pd.Timestamp.min) & (values <= pd.Timestamp.max)).to_numpy(dtype=bool)
+        out = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[ns]')
+        out[ok] = values[ok].dt.normalize().to_numpy(dtype='datetime64[ns]')
+        return out
+
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    if len(uniques) == 0:  # ทั้งคอลัมน์ว่าง (เช่น CSV ที่ไม่มีวันที่เลย) = NaT ทุกแถว
+        return pd.Series(np.datetime64('NaT'), index=s.index, dtype='datetime64[ns]')
+    uniques = pd.Series(uniques, dtype=object)
+    parsed = np.full(len(uniques), np.datetime64('NaT'), dtype='datetime64[ns]')
+    is_str = uniques.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    todo = is_str.copy()
+    for fmt in DATE_FORMATS:
+        if not todo.any(): break
+        idx = np.flatnonzero(todo)
+        hit = to_ns(pd.to_datetime(uniques.iloc[idx], format=fmt, errors='coerce'))
+        ok = ~np.isnat(hit)
+        parsed[idx[ok]] = hit[ok]
+        todo[idx[ok]] = False
+    leftover = todo | ~is_str
+    if leftover.any():
+        parsed[leftover] = to_ns(pd.to_datetime(pd.Series([safe_date(v) for v in uniques[leftover]], dtype=object),
+                                                errors='coerce'))
+    result = np.where(codes >= 0, parsed[np.maximum(codes, 0)], np.datetime64('NaT'))
+    return pd.Series(result, index=s.index, dtype='datetime64[ns]')
+
+# ฟังก์ชันจัดกึ่งกลางชื่อขนส่งให้ตรงกับคอลัมน์ใน Master
+DEFAULT_COURIER = "Standard Delivery - ส่งธรรมดาในประเทศ"
+COURIER_NAME_MAP = {
+    "J&T Express": "J&T Express", "J&T": "J&T Express",
+    "Flash Express": "Flash Express", "Flash": "Flash Express",
+    "Kerry Express": "Kerry Express", "Kerry": "Kerry Express",
+    "Thailand Post": "ThailandPost", "ThailandPost": "ThailandPost",
+    "DHL Domestic": "DHL_1", "DHL": "DHL_1",
+    "Shopee Express": "SPX Express", "SPX Express": "SPX Express",
+    "Lazada Express": "LEX TH", "LEX": "LEX TH"
+}
+
+def normalize_courier_name(courier):
+    if pd.isna(courier) or courier == "":
+        return DEFAULT_COURIER
+    
+    courier = str(courier).strip()
+    return COURIER_NAME_MAP.get(courier, courier)
+
+def normalize_courier_series(couriers):
+    # แบบเดียวกับ normalize_courier_name ทั้งคอลัมน์ -> Categorical (แปลงเฉพาะชื่อที่ไม่ซ้ำ)
+    codes, uniques = pd.factorize(pd.Series(couriers), use_na_sentinel=True)
+    # ต่อค่าของช่องว่าง (NaN) ไว้ท้ายสุด เพื่อให้ code -1 ชี้ไปที่ค่านั้นพอดี
+    names = [normalize_courier_name(c) for c in uniques] + [normalize_courier_name(None)]
+    categories = pd.Index(pd.unique(pd.Series(names, dtype=object)))
+    return pd.Categorical.from_codes(categories.get_indexer(names)[codes], categories=categories)
+
+# ------------------------------
+# แคชไฟล์ที่ parse แล้ว (ไม่ต้องโหลดไฟล์ JST เก่าซ้ำทุกครั้งที่รีเฟรช)
+# ------------------------------
+class ParsedFileCache:
+    # เก็บ DataFrame ของแต่ละไฟล์ไว้บนดิสก์ โดยผูกกับ md5Checksum / modifiedTime ของไฟล์บน Drive
+    # ถ้าไฟล์ไม่เปลี่ยนก็ใช้ของเดิม ไฟล์ที่ถูกลบออกจากโฟลเดอร์จะถูกลบออกจากแคชด้วย
+    def __init__(self, cache_dir, version=""):
+        self.cache_dir = cache_dir
+        self.version = version
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self._lock = threading.Lock()
+        self.manifest = {}
+        try:
+            with open(self.manifest_path, encoding="utf-8") as fp: self.manifest = json.load(fp)
+        except: pass
+
+    def signature(self, f):
+        # รวมเวอร์ชันรูปแบบการ parse ไว้ด้วย เมื่อเปลี่ยน READ_SPECS แคชเก่าจะถูกอ่านใหม่อัตโนมัติ
+        sig = f.get('md5Checksum') or f.get('modifiedTime') or ""
+        return f"{self.version}:{sig}" if sig else ""
+
+    def _path(self, file_id):
+        return os.path.join(self.cache_dir, hashlib.sha1(file_id.encode("utf-8")).hexdigest() + ".pkl")
+
+    def get(self, f):
+        entry = self.manifest.get(f['id'])
+        sig = self.signature(f)
+        if not entry or not sig or entry.get('sig') != sig: return None
+        try: return pd.read_pickle(self._path(f['id']))
+        except: return None
+
+    def put(self, f, df):
+        sig = self.signature(f)
+        if not sig: return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            df.to_pickle(self._path(f['id']))
+        except: return
+        with self._lock:
+            self.manifest[f['id']] = {'name': f.get('name', ''), 'sig': sig}
+
+    def prune(self, keep_ids):
+        with self._lock:
+            for file_id in [k for k in self.manifest if k not in keep_ids]:
+                del self.manifest[file_id]
+                try: os.remove(self._path(file_id))
+                except: pass
+
+    def save(self):
+        with self._lock:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = self.manifest_path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as fp: json.dump(self.manifest, fp, ensure_ascii=False)
+                os.replace(tmp_path, self.manifest_path)
+            except: pass
+
+# ------------------------------
+# DATA SOURCES (Drive/Sheets หรือโฟลเดอร์บนเครื่อง)
+# ------------------------------
+# ทุก source มีเมธอดเหมือนกัน:
+#   list_files(kind)  -> รายการไฟล์ [{'id', 'name', 'modifiedTime', 'md5Checksum'}] ของ kind 'data' (JST) หรือ 'ads'
+#   open_file(f)      -> path หรือ file-like ที่ส่งต่อให้ pandas อ่านได้
+#   read_master()     -> (df_master, df_fix) จาก MASTER_ITEM / FIX_COST
+
+# คอลัมน์ที่ใช้จากไฟล์แต่ละประเภท: (ชื่อมาตรฐาน, [หัวคอลัมน์ที่อาจพบในไฟล์ เรียงตามลำดับความสำคัญ], ชนิด)
+# ชนิด: 'id' = รหัสข้อความ, 'text' = ให้ pandas เดาชนิดเหมือนเดิม, 'num' = ตัวเลข, 'date' = วันที่
+# คอลัมน์อื่นในไฟล์จะไม่ถูกอ่านเข้ามาเลย
+READ_SPECS = {
+    'data': [
+        ('หมายเลขคำสั่งซื้อออนไลน์', ['หมายเลขคำสั่งซื้อออนไลน์'], 'id'),
+        ('สถานะคำสั่งซื้อ', ['สถานะคำสั่งซื้อ'], 'text'),
+        ('บริษัทขนส่ง', ['บริษัทขนส่ง'], 'text'),
+        ('เวลาสั่งซื้อ', ['เวลาสั่งซื้อ'], 'date'),
+        ('รูปแบบสินค้า', ['รูปแบบสินค้า'], 'text'),
+        ('จำนวน', ['จำนวน'], 'num'),
+        ('รายละเอียดยอดที่ชำระแล้ว', ['รายละเอียดยอดที่ชำระแล้ว'], 'num'),
+        ('ผู้สร้างคำสั่งซื้อ', ['ผู้สร้างคำสั่งซื้อ'], 'text'),
+        ('วิธีการชำระเงิน', ['วิธีการชำระเงิน'], 'text'),
+        ('ชื่อสินค้า', ['ชื่อสินค้า'], 'text'),
+        ('ประเภทการทำงาน', ['ประเภทการทำงาน'], 'text'),
+    ],
+    'ads': [
+        ('จำนวนเงินที่ใช้จ่ายไป (THB)', ['จำนวนเงินที่ใช้จ่ายไป (THB)', 'Cost', 'Amount'], 'num'),
+        ('วัน', ['วัน', 'Date'], 'date'),
+        ('ชื่อแคมเปญ', ['ชื่อแคมเปญ', 'Campaign'], 'text'),
+    ],
+}
+READ_SPEC_VERSION = "3"  # เปลี่ยนค่านี้ทุกครั้งที่แก้ READ_SPECS หรือวิธีแปลงค่า เพื่อล้างแคชไฟล์
+
+def read_export_file(src, filename, kind):
+    spec = READ_SPECS[kind]
+    wanted = {h for _, headers, _ in spec for h in headers}
+    id_cols = {h: str for _, headers, col_type in spec if col_type == 'id' for h in headers}
+    try:
+        if filename.lower().endswith('.csv'): df = pd.read_csv(src, usecols=lambda c: c in wanted, dtype=id_cols)
+        elif filename.lower().endswith(('.xlsx', '.xls')): df = pd.read_excel(src, usecols=lambda c: c in wanted)
+        else: return None
+    except: return None
+
+    # เลือกหัวคอลัมน์ที่เจอก่อนตามลำดับ แล้วเปลี่ยนเป็นชื่อมาตรฐาน (เช่น Cost / Amount -> จำนวนเงินที่ใช้จ่ายไป (THB))
+    out = {}
+    for name, headers, col_type in spec:
+        found = next((h for h in headers if h in df.columns), None)
+        if found is None: continue
+        col = df[found]
+        if col_type == 'id': col = col.astype(str).str.replace(r'\.0$', '', regex=True)
+        elif col_type == 'num': col = safe_float_series(col)
+        elif col_type == 'date': col = safe_date_series(col)
+        out[name] = col
+    return pd.DataFrame(out, index=df.index)
+
+class DriveSource:
+    name = "drive"
+
+    def __init__(self, creds=None, service_factory=None, gc=None,
+                 folder_data=FOLDER_ID_DATA, folder_ads=FOLDER_ID_ADS, sheet_url=SHEET_MASTER_URL):
+        # service_factory / gc เปิดให้ส่ง service ปลอมเข้ามาทดสอบได้
+        self.folders = {'data': folder_data, 'ads': folder_ads}
+        self.sheet_url = sheet_url
+        if service_factory is None:
+            # googleapiclient ใช้ httplib2 ซึ่งไม่ thread-safe จึงสร้าง service แยกต่อ thread
+            local = threading.local()
+            def service_factory():
+                if getattr(local, 'service', None) is None:
+                    local.service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+                return local.service
+        self.service_factory = service_factory
+        self.gc = gc if gc is not None else gspread.authorize(creds)
+
+    def list_files(self, kind):
+        try:
+            service = self.service_factory()
+            files, page_token = [], None
+            while True:
+                results = service.files().list(q=f"'{self.folders[kind]}' in parents and trashed=false",
+                                               fields="nextPageToken, files(id, name, modifiedTime, md5Checksum)",
+                                               pageSize=1000, pageToken=page_token).execute()
+                files.extend(results.get('files', []))
+                page_token = results.get('nextPageToken')
+                if not page_token: return files
+        except: return []
+
+    def open_file(self, f):
+        service = self.service_factory()
+        request = service.files().get_media(fileId=f['id'])
+        fh = io.BytesIO()
+        downloader = MediaIoBaseDownload(fh, request)
+        done = False
+        while done is False: status, done = downloader.next_chunk()
+        fh.seek(0)
+        return fh
+
+    def read_master(self):
+        df_master = pd.DataFrame()
+        df_fix = pd.DataFrame()
+        try:
+            sh = self.gc.open_by_url(self.sheet_url)
+            df_master = pd.DataFrame(sh.worksheet("MASTER_ITEM").get_all_records())
+            try: df_fix = pd.DataFrame(sh.worksheet("FIX_COST").get_all_records())
+            except: 
+                try: df_fix = pd.DataFrame(sh.worksheet("FIXED_COST").get_all_records())
+                except: pass
+        except: pass
+        return df_master, df_fix
+
+class LocalFolderSource:
+    # อ่านไฟล์ export ชุดเดียวกับบน Drive จากดิสก์ โครงสร้างโฟลเดอร์:
+    #   <root>/sales/*.csv|xlsx   ไฟล์ยอดขาย JST
+    #   <root>/ads/*.csv|xlsx     ไฟล์ค่า ADS
+    #   <root>/MASTER_ITEM.xlsx   ชีท MASTER_ITEM และ FIX_COST (หรือ FIXED_COST)
+    name = "local"
+
+    def __init__(self, root, data_dir="sales", ads_dir="ads", master_file="MASTER_ITEM.xlsx"):
+        self.root = root
+        self.dirs = {'data': os.path.join(root, data_dir), 'ads': os.path.join(root, ads_dir)}
+        self.master_path = os.path.join(root, master_file)
+
+    def list_files(self, kind):
+        try:
+            entries = sorted(os.scandir(self.dirs[kind]), key=lambda e: e.name)
+        except OSError: return []
+        files = []
+        for e in entries:
+            if not e.is_file() or not e.name.lower().endswith(('.csv', '.xlsx', '.xls')): continue
+            stat = e.stat()
+            # ไม่มี md5 จาก Drive จึงใช้เวลาแก้ไข + ขนาดไฟล์เป็นตัวตรวจการเปลี่ยนแปลง
+            files.append({'id': f"{kind}/{e.name}", 'name': e.name, 'path': e.path,
+                          'modifiedTime': f"{stat.st_mtime_ns}:{stat.st_size}"})
+        return files
+
+    def open_file(self, f):
+        return f['path']
+
+    def read_master(self):
+        df_master = pd.DataFrame()
+        df_fix = pd.DataFrame()
+        try:
+            sheets = pd.read_excel(self.master_path, sheet_name=None)
+            df_master = sheets.get("MASTER_ITEM", df_master)
+            df_fix = sheets.get("FIX_COST", sheets.get("FIXED_COST", df_fix))
+        except: pass
+        return df_master, df_fix
+
+def credentials_from_info(info):
+    return service_account.Credentials.from_service_account_info(dict(info), scopes=DRIVE_SCOPES)
+
+def load_credentials(path=SECRETS_PATH):
+    # path: secrets.toml ของ Streamlit (อ่านส่วน [gcp_service_account]) หรือไฟล์ JSON ของ service account
+    if path.lower().endswith('.toml'):
+        with open(path, 'rb') as fp: return credentials_from_info(tomllib.load(fp)['gcp_service_account'])
+    return service_account.Credentials.from_service_account_file(path, scopes=DRIVE_SCOPES)
+
+def get_data_source(get_creds=load_credentials, local_dir=None):
+    # ตั้ง SHOP_DATA_DIR (หรือส่ง local_dir) เพื่ออ่านไฟล์จากโฟลเดอร์บนเครื่องแทน Google Drive
+    # get_creds: ฟังก์ชันคืน credentials ของ Drive เรียกเฉพาะตอนใช้ Drive (ในแอปส่ง get_drive_service ที่อ่าน st.secrets)
+    local_dir = local_dir or os.environ.get("SHOP_DATA_DIR")
+    if local_dir: return LocalFolderSource(local_dir)
+    return DriveSource(get_creds())
+
+def data_source_id(local_dir=None):
+    # ใช้แยก snapshot บนดิสก์ตามแหล่งข้อมูล (เงื่อนไขเดียวกับ get_data_source)
+    local_dir = local_dir or os.environ.get("SHOP_DATA_DIR")
+    return os.path.abspath(local_dir) if local_dir else "drive"
+
+def list_export_files(source):
+    # ดึงรายการไฟล์ JST และ ADS พร้อมกัน
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        fut_files_data = pool.submit(source.list_files, 'data')
+        fut_files_ads = pool.submit(source.list_files, 'ads')
+        return fut_files_data.result(), fut_files_ads.result()
+
+def load_export_files(source, files_data, files_ads, max_workers=DOWNLOAD_WORKERS, cache_dir=CACHE_DIR):
+    # โหลดไฟล์ JST + ADS ตามรายการที่ได้จาก list_export_files พร้อมกันหลาย thread
+    # โหลดเฉพาะไฟล์ใหม่/ไฟล์ที่ถูกแก้ไข ส่วนไฟล์เดิมอ่านจากแคชบนดิสก์ (cache_dir=None = ไม่ใช้แคช)
+    # ดาวน์โหลดไฟล์ใดไม่สำเร็จจะ raise (ยกเลิกไฟล์ที่ยังไม่เริ่ม) แทนที่จะได้ข้อมูลที่ขาดไฟล์นั้นไปเงียบๆ
+    #   DataRefresher จึงใช้ชุดเดิมต่อและเก็บ error ไว้ / ไฟล์ที่อ่านได้แต่ parse ไม่ได้ยังข้ามไปเหมือนเดิม
+    cache_data = ParsedFileCache(os.path.join(cache_dir, f"{source.name}_data"), READ_SPEC_VERSION) if cache_dir else None
+    cache_ads = ParsedFileCache(os.path.join(cache_dir, f"{source.name}_ads"), READ_SPEC_VERSION) if cache_dir else None
+
+    def read_file_cached(f, kind, cache):
+        df = cache.get(f) if cache else None
+        if df is None:
+            try: src = source.open_file(f)
+            except Exception as e: raise RuntimeError(f"ดาวน์โหลดไฟล์ {f.get('name', f['id'])} ไม่สำเร็จ: {e}") from e
+            try: df = read_export_file(src, f['name'], kind)
+            except: df = None
+            if df is not None and cache: cache.put(f, df)
+        return df
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            # ส่งงานทั้งสองโฟลเดอร์เข้า pool พร้อมกัน แล้วเก็บผลตามลำดับรายการไฟล์เดิม
+            futs_data = [pool.submit(read_file_cached, f, 'data', cache_data) for f in files_data]
+            futs_ads = [pool.submit(read_file_cached, f, 'ads', cache_ads) for f in files_ads]
+            try:
+                df_list = []
+                for fut in futs_data:
+                    df = fut.result()
+                    if df is not None: df_list.append(df)
+                df_data = pd.concat(df_list, ignore_index=True) if df_list else pd.DataFrame()
+
+                df_ads_list = []
+                for fut in futs_ads:
+                    df = fut.result()
+                    if df is not None: df_ads_list.append(df)
+                df_ads_raw = pd.concat(df_ads_list, ignore_index=True) if df_ads_list else pd.DataFrame()
+            except:
+                for fut in futs_data + futs_ads: fut.cancel()
+                raise
+    finally:
+        # ไฟล์ที่ถูกลบออกจากโฟลเดอร์จะไม่อยู่ในรายการ จึงหลุดออกจากข้อมูลรวมและลบออกจากแคช
+        # (ถ้าดึงรายการไฟล์ไม่สำเร็จจะได้รายการว่าง ให้คงแคชเดิมไว้) ไฟล์ที่โหลดเสร็จแล้วเก็บลงแคชแม้รอบนี้ล้ม
+        for cache, files in [(cache_data, files_data), (cache_ads, files_ads)]:
+            if cache and files:
+                cache.prune({f['id'] for f in files})
+                cache.save()
+
+    return df_data, df_ads_raw
+
+def load_raw_files(source=None, max_workers=DOWNLOAD_WORKERS, cache_dir=CACHE_DIR):
+    # โหลดไฟล์ JST + ADS + ชีท MASTER ครบชุดในครั้งเดียว (ชีท MASTER โหลดคู่ขนานไปกับไฟล์)
+    if source is None: source = get_data_source()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        fut_master = pool.submit(source.read_master)
+        files_data, files_ads = list_export_files(source)
+        df_data, df_ads_raw = load_export_files(source, files_data, files_ads, max_workers, cache_dir)
+        df_master, df_fix = fut_master.result()
+    return df_data, df_ads_raw, df_master, df_fix
+
+# ------------------------------
+# SKU RESOLUTION (จับคู่รูปแบบสินค้ากับ MASTER_ITEM)
+# ------------------------------
+# คอลัมน์ที่ถ้าไม่เจอ SKU ตรงตัว จะใช้ค่าจาก SKU หลัก (ตัดส่วนหลัง - ออก) แทน
+SKU_ROOT_FALLBACK_COLS = ['ต้นทุน', 'ราคากล่อง', 'ค่าส่งเฉลี่ย',
+                          'ค่าคอมมิชชั่น Admin', 'ค่าคอมมิชชั่น Telesale', 'Type']
+
+def resolve_skus(sku_raw, df_master_filtered):
+    # จับคู่ "รูปแบบสินค้า" แต่ละค่าที่ไม่ซ้ำกับแถวใน MASTER เพียงครั้งเดียว: ตรงตัวก่อน ไม่เจอค่อยใช้ SKU หลัก
+    # คืนค่า (codes ของแต่ละบรรทัด, ตารางค่าจาก MASTER ต่อ SKU ที่ไม่ซ้ำ, รายงาน SKU ที่ใช้ SKU หลัก/หาไม่เจอ)
+    codes, uniques = pd.factorize(sku_raw, use_na_sentinel=True)
+    uniques = pd.Series(uniques, dtype=object)
+    norm = uniques.str.replace(' ', '', regex=False)
+    root = norm.str.split('-').str[0]
+
+    master = df_master_filtered.reset_index(drop=True)
+    if 'SKU' in master.columns:
+        master_norm = master['SKU'].astype(str).str.strip().str.replace(' ', '', regex=False)
+        keep = master_norm.notna() & ~master_norm.duplicated()
+        master, master_norm = master[keep].reset_index(drop=True), master_norm[keep].reset_index(drop=True)
+    else:
+        master_norm = pd.Series([], dtype=object)
+    master_keys = pd.Index(master_norm)
+    exact_pos = master_keys.get_indexer(norm)
+    root_pos = master_keys.get_indexer(root)
+
+    # reindex ด้วยตำแหน่ง -1 จะได้แถว NaN (= ไม่พบใน MASTER)
+    resolved = master.reindex(exact_pos).reset_index(drop=True)
+    root_rows = master.reindex(root_pos).reset_index(drop=True)
+    for col in SKU_ROOT_FALLBACK_COLS:
+        if col in resolved.columns: resolved[col] = resolved[col].combine_first(root_rows[col])
+    if 'ชื่อสินค้า' in master.columns:
+        resolved['ชื่อสินค้า_Master'] = resolved.pop('ชื่อสินค้า')
+        resolved['Name_Root'] = root_rows['ชื่อสินค้า']
+    if 'SKU' in resolved.columns: resolved.rename(columns={'SKU': 'SKU_Master'}, inplace=True)
+    resolved['SKU_Norm'] = norm
+    resolved['SKU_Norm_Root'] = root
+
+    status = np.select([exact_pos >= 0, root_pos >= 0], ['exact', 'root'], default='unresolved')
+    line_counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    report = pd.DataFrame({'SKU_Raw': uniques, 'SKU_Norm_Root': root, 'Match': status, 'Lines': line_counts})
+    report = report[report['Match'] != 'exact'].sort_values(['Match', 'Lines'], ascending=[True, False]).reset_index(drop=True)
+    return codes, resolved, report
+
+# ------------------------------
+# COMPACT df_daily
+# ------------------------------
+# df_daily ถูกเก็บค้างไว้ในหน่วยความจำและทุก session ใช้ร่วมกัน จึงเก็บให้เล็กที่สุด:
+#   ข้อความ (SKU_Main, ชื่อสินค้า, Type, Month_Thai) -> category
+#   Date -> datetime64[s] (เทียบกับ pd.Timestamp ไม่ใช่ datetime.date)
+#   Year/Month_Num/Day -> int16/int8
+#   เรียงแถวตาม Date
+DAILY_CATEGORY_COLS = ['SKU_Main', 'ชื่อสินค้า', 'Type']
+
+def compact_daily(df_daily):
+    df_daily['Date'] = pd.to_datetime(df_daily['Date']).dt.normalize().astype('datetime64[s]')
+    # เรียงตาม Date ไว้เสมอ (stable: ภายในวันเดียวกันคงลำดับ SKU เดิมจากการ groupby/merge) เพื่อให้ slice_dates ใช้ binary search ได้
+    df_daily = df_daily.sort_values('Date', kind='stable', ignore_index=True)
+    df_daily['Year'] = df_daily['Date'].dt.year.astype('int16')
+    df_daily['Month_Num'] = df_daily['Date'].dt.month.astype('int8')
+    df_daily['Month_Thai'] = pd.Categorical.from_codes(df_daily['Month_Num'] - 1, categories=thai_months)
+    df_daily['Day'] = df_daily['Date'].dt.day.astype('int8')
+    for col in DAILY_CATEGORY_COLS:
+        if col in df_daily.columns: df_daily[col] = df_daily[col].astype('category')
+    return df_daily
+
+# ------------------------------
+# DATE SLICING + DAY x SKU MATRIX (ใช้ร่วมกันในหน้ารายงาน)
+# ------------------------------
+def build_day_matrix(df, dates, skus, value_col, total_cols):
+    # groupby ครั้งเดียวแทนการวนกรองทีละวันและทีละ SKU
+    # คืนค่า (ยอดรวมรายวันของ total_cols, ตาราง value_col แบบ วัน x SKU) index = dates ครบทุกวัน วันที่ไม่มีข้อมูลเป็น 0
+    day_totals = df.groupby('Date')[total_cols].sum().reindex(dates, fill_value=0)
+    sku_grid = df.groupby(['Date', 'SKU_Main'], observed=True)[value_col].sum().unstack(fill_value=0)
+    sku_grid = sku_grid.reindex(index=dates, columns=skus, fill_value=0)
+    sku_grid.columns = list(skus)
+    return day_totals, sku_grid
+
+def slice_dates(df, start, end):
+    # df ต้องเรียงตาม Date แล้ว (df_daily จาก compact_daily): หาขอบช่วงด้วย searchsorted แทนการเทียบทั้งคอลัมน์
+    # คืนเป็นช่วงแถวต่อเนื่องด้วย iloc (ไม่ได้ copy ข้อมูล) ห้ามแก้ค่าในผลลัพธ์โดยตรง
+    lo = df['Date'].searchsorted(pd.Timestamp(start), side='left')
+    hi = df['Date'].searchsorted(pd.Timestamp(end), side='right')
+    return df.iloc[lo:hi]
+
+def slice_month(df, year, month):
+    return slice_dates(df, date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1]))
+
+def slice_year(df, year):
+    return slice_dates(df, date(year, 1, 1), date(year, 12, 31))
+
+def pct_of(part, whole):
+    # part / whole * 100 ทีละแถว (whole = 0 ได้ 0)
+    return (part / whole * 100).where(whole != 0, 0)
+
+# ------------------------------
+# ROLLUPS (ยอดรวมล่วงหน้าสำหรับหน้า P&L / COMMISSION)
+# ------------------------------
+ROLLUP_COLS = ['รายละเอียดยอดที่ชำระแล้ว', 'จำนวนออเดอร์', 'จำนวน', 'CAL_COST', 'BOX_COST', 'DELIV_COST',
+               'CAL_COD_COST', 'CAL_COM_ADMIN', 'CAL_COM_TELESALE', 'Ads_Amount', 'Other_Costs', 'Total_Cost', 'Net_Profit']
+
+def build_rollups(df_daily):
+    # day:       รายวันรวมทุก SKU (คอลัมน์ Date เรียงแล้ว ใช้ slice_dates/slice_month ได้)
+    # month:     index (Year, Month_Num)
+    # month_sku: index (Year, Month_Num, SKU_Main)
+    day = df_daily.groupby('Date')[ROLLUP_COLS].sum().reset_index()
+    day['Year'] = day['Date'].dt.year.astype('int16')
+    day['Month_Num'] = day['Date'].dt.month.astype('int8')
+    day['Day'] = day['Date'].dt.day.astype('int8')
+    month = df_daily.groupby(['Year', 'Month_Num'])[ROLLUP_COLS].sum()
+    month_sku = df_daily.groupby(['Year', 'Month_Num', 'SKU_Main'], observed=True)[ROLLUP_COLS].sum()
+    return {'day': day, 'month': month, 'month_sku': month_sku}
+
+def check_rollups(df_daily, rollups):
+    # ยอดรวมทุกระดับต้องเท่ากับ df_daily (ต่างกันได้แค่เศษสตางค์จากลำดับการบวก) ถ้าไม่ตรงให้ล้มทั้งรอบ จะได้ใช้ข้อมูลชุดเดิมต่อ
+    base = df_daily[ROLLUP_COLS].sum()
+    for name, table in rollups.items():
+        diff = (table[ROLLUP_COLS].sum() - base).abs()
+        bad = diff[diff > 0.01 + 1e-9 * base.abs()]
+        if len(bad): raise ValueError(f"rollup '{name}' ไม่ตรงกับ df_daily: {', '.join(bad.index)}")
+    if len(rollups['day']) != df_daily['Date'].nunique():
+        raise ValueError("rollup 'day' จำนวนวันไม่ตรงกับ df_daily")
+
+# ------------------------------
+# RANGE SUMS (ผลรวมสะสมต่อ SKU บนแกนวัน สำหรับยอดรวมช่วงวันที่ใดๆ)
+# ------------------------------
+RANGE_SUM_COLS = ['รายละเอียดยอดที่ชำระแล้ว', 'จำนวนออเดอร์', 'จำนวน', 'CAL_COST', 'BOX_COST', 'DELIV_COST',
+                  'CAL_COD_COST', 'CAL_COM_ADMIN', 'CAL_COM_TELESALE', 'Ads_Amount']
+
+class RangeSums:
+    # cum[d, sku, col] = ผลรวมตั้งแต่วันแรกจนถึงก่อนวัน d (แกนวันต่อเนื่องทุกวัน ไม่ข้ามวันที่ไม่มีข้อมูล)
+    # ยอดช่วง [start, end] = cum[end+1] - cum[start] -> ใช้แค่ 2 แถวต่อคำถาม ไม่ต้องกรอง df_daily ใหม่
+    # rows นับจำนวนแถวสะสมแบบเดียวกัน ใช้ตัดสินว่า SKU "มีข้อมูล" ในช่วง (เหมือน groupby ของ slice_dates)
+    def __init__(self, df_daily):
+        self.skus = pd.Index(df_daily['SKU_Main'].cat.categories, name='SKU_Main')
+        if df_daily.empty:
+            self.day0, n_days = pd.Timestamp(0), 0
+        else:
+            self.day0 = df_daily['Date'].iloc[0]
+            n_days = (df_daily['Date'].iloc[-1] - self.day0).days + 1
+        codes = df_daily['SKU_Main'].cat.codes.to_numpy()
+        day_idx = (df_daily['Date'] - self.day0).dt.days.to_numpy() + 1
+        ok = codes >= 0
+        self.cum = np.zeros((n_days + 1, len(self.skus), len(RANGE_SUM_COLS)))
+        np.add.at(self.cum, (day_idx[ok], codes[ok]), df_daily[RANGE_SUM_COLS].to_numpy(float)[ok])
+        np.cumsum(self.cum, axis=0, out=self.cum)
+        self.rows = np.zeros((n_days + 1, len(self.skus)), dtype=np.int32)
+        np.add.at(self.rows, (day_idx[ok], codes[ok]), 1)
+        np.cumsum(self.rows, axis=0, out=self.rows)
+
+    def _bounds(self, start, end):
+        n = len(self.cum) - 1
+        lo = min(max((pd.Timestamp(start) - self.day0).days, 0), n)
+        hi = min(max((pd.Timestamp(end) - self.day0).days + 1, 0), n)
+        return lo, max(hi, lo)
+
+    @staticmethod
+    def _with_totals(df):
+        # ปัดเศษทิ้งความคลาดเคลื่อนจากการลบผลรวมสะสม (ยอดที่ควรเป็น 0 พอดีต้องออกมาเป็น 0 ไม่ใช่ 1e-10)
+        df = df.round(6)
+        df['Other_Costs'] = df['BOX_COST'] + df['DELIV_COST'] + df['CAL_COD_COST'] + df['CAL_COM_ADMIN'] + df['CAL_COM_TELESALE']
+        df['Total_Cost'] = df['CAL_COST'] + df['Other_Costs'] + df['Ads_Amount']
+        df['Net_Profit'] = df['รายละเอียดยอดที่ชำระแล้ว'] - df['Total_Cost']
+        return df.round(6)
+
+    def by_sku(self, start, end, present_only=True):
+        # present_only=False: คืนทุก SKU (ที่ไม่มีข้อมูลในช่วงเป็น 0) ใช้ reindex ตาม SKU ที่เลือกได้เลย
+        lo, hi = self._bounds(start, end)
+        df = self._with_totals(pd.DataFrame(self.cum[hi] - self.cum[lo], index=self.skus, columns=RANGE_SUM_COLS))
+        if present_only: df = df[self.rows[hi] - self.rows[lo] > 0]
+        return df
+
+    def totals(self, start, end, skus=None):
+        lo, hi = self._bounds(start, end)
+        diff = self.cum[hi] - self.cum[lo]
+        if skus is not None:
+            idx = self.skus.get_indexer(pd.Index(skus).unique())
+            diff = diff[idx[idx >= 0]]
+        return self._with_totals(pd.DataFrame([diff.sum(axis=0)], columns=RANGE_SUM_COLS)).iloc[0]
+
+# ------------------------------
+# SKU DIMENSION (รหัส / ชื่อ / หมวดหมู่ / label ของทุก SKU สร้างครั้งเดียวต่อชุดข้อมูล)
+# ------------------------------
+DEFAULT_SKU_TYPE = 'กลุ่ม ปกติ'
+
+def build_sku_dim(sku_list, sku_map, sku_type_map):
+    # table:        index = SKU (ลำดับเดียวกับ sku_list), คอลัมน์ id / ชื่อสินค้า / Type / label
+    # labels:       "SKU : ชื่อ" สำหรับ multiselect, label_to_sku ใช้แปลงกลับ
+    # by_type:      Type -> frozenset ของ SKU (SKU ที่ไม่มี Type นับเป็น DEFAULT_SKU_TYPE)
+    labels, types = [], []
+    for sku in sku_list:
+        name = str(sku_map.get(sku, "")); name = "" if name in ['nan','0','0.0'] else name
+        labels.append(f"{sku} : {name}")
+        types.append(sku_type_map.get(sku, DEFAULT_SKU_TYPE))
+    table = pd.DataFrame({'id': np.arange(len(sku_list), dtype='int32'),
+                          'ชื่อสินค้า': [sku_map.get(sku, "") for sku in sku_list],
+                          'Type': types, 'label': labels},
+                         index=pd.Index(sku_list, name='SKU', dtype=object))
+    by_type = {}
+    for sku, sku_type in zip(sku_list, types):
+        by_type.setdefault(sku_type, set()).add(sku)
+    return {'table': table, 'names': sku_map, 'skus': sku_list, 'labels': labels,
+            'label_to_sku': dict(zip(labels, sku_list)),
+            'by_type': {k: frozenset(v) for k, v in by_type.items()}}
+
+# ------------------------------
+# PROCESS DATA (แบ่งเป็นขั้น: ไฟล์ยอดขาย/ADS -> MASTER/FIX_COST -> คำนวณต้นทุน)
+# ------------------------------
+class StageCache:
+    # เก็บผลล่าสุดของแต่ละขั้นพร้อม key ของ input ที่ใช้สร้าง ถ้า key ไม่เปลี่ยนก็คืนผลเดิมโดยไม่คำนวณใหม่
+    # เช่น แก้ MASTER_ITEM แล้ว key ของขั้นไฟล์ยอดขายยังเหมือนเดิม จึงคำนวณใหม่แค่ขั้นต้นทุน
+    # timings: เวลาที่ใช้ (วินาที) ของขั้นที่คำนวณใหม่ในรอบล่าสุดที่ถึงขั้นนั้น
+    def __init__(self):
+        self.entries = {}
+        self.timings = {}
+
+    def get(self, stage, key, compute):
+        entry = self.entries.get(stage)
+        if entry is not None and entry[0] == key:
+            self.timings[stage] = 0.0
+            return entry[1]
+        t0 = time.perf_counter()
+        value = compute()
+        self.timings[stage] = time.perf_counter() - t0
+        self.entries[stage] = (key, value)
+        return value
+
+    def key(self, stage):
+        entry = self.entries.get(stage)
+        return entry[0] if entry is not None else None
+
+def content_version(key):
+    # ตัวแทนสั้นๆ ของ key ขั้น 'costing' (ได้ค่าเดิมข้าม process) ใช้เป็นเวอร์ชันของชุดข้อมูล
+    # เปลี่ยนเฉพาะเมื่อ input ของการคำนวณเปลี่ยน รีเฟรชที่ได้ผลเดิมจึงได้เวอร์ชันเดิม
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest() if key is not None else None
+
+def files_key(files):
+    return (READ_SPEC_VERSION,) + tuple((f['id'], f.get('md5Checksum') or f.get('modifiedTime') or "") for f in files)
+
+def frame_key(df):
+    h = hashlib.md5("|".join(map(str, df.columns)).encode("utf-8"))
+    if len(df): h.update(pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def prepare_master(df_master):
+    # --- 1. PREPARE MASTER ITEM ---
+    if not df_master.empty:
+        df_master.columns = df_master.columns.astype(str).str.strip()
+        
+        # [แก้ไข] เพิ่มการเปลี่ยนชื่อคอลัมน์จาก 'ทุน' เป็น 'ต้นทุน' อัตโนมัติ
+        if 'ทุน' in df_master.columns:
+            df_master.rename(columns={'ทุน': 'ต้นทุน'}, inplace=True)
+            
+        if 'ชื่อสินค้า' not in df_master.columns:
+            if len(df_master.columns) >= 2:
+                col_b = df_master.columns[1]
+                df_master.rename(columns={col_b: 'ชื่อสินค้า'}, inplace=True)
+            else:
+                df_master['ชื่อสินค้า'] = df_master['SKU'] if 'SKU' in df_master.columns else "Unknown"
+        
+        if 'Type' not in df_master.columns:
+            df_master['Type'] = 'กลุ่ม ปกติ'
+        df_master['Type'] = df_master['Type'].fillna('กลุ่ม ปกติ').astype(str).str.strip()
+
+    return df_master
+
+def prepare_sales(df_data, df_ads_raw):
+    # ขั้นไฟล์ยอดขาย/ADS: ไม่ขึ้นกับ MASTER จึงใช้ซ้ำได้จนกว่าไฟล์บน Drive จะเปลี่ยน
+    if df_data.empty: return None
+
+    # --- 2. PREPARE DATA ---
+    cols = [c for c in ['หมายเลขคำสั่งซื้อออนไลน์', 'สถานะคำสั่งซื้อ', 
+            'บริษัทขนส่ง', 'เวลาสั่งซื้อ', 'รูปแบบสินค้า', 'จำนวน', 
+            'รายละเอียดยอดที่ชำระแล้ว', 'ผู้สร้างคำสั่งซื้อ', 
+            'วิธีการชำระเงิน', 'ชื่อสินค้า', 'ประเภทการทำงาน'] 
+            if c in df_data.columns]
+    
+    df = df_data[cols].copy()
+
+    if 'สถานะคำสั่งซื้อ' in df.columns:
+        df = df[~df['สถานะคำสั่งซื้อ'].isin(['ยกเลิก'])]
+
+    df['Date'] = df['เวลาสั่งซื้อ']  # แปลงเป็นวันที่ไว้แล้วตอนอ่านไฟล์ (READ_SPECS)
+    df = df.dropna(subset=['Date'])
+
+    # --- ADS ---
+    return {'orders': df, 'ads': aggregate_ads(df_ads_raw)}
+
+def aggregate_ads(df_ads_raw):
+    # ค่า ADS รวมต่อ (วัน, SKU) โดย SKU มาจาก [..] ในชื่อแคมเปญ
+    df_ads_agg = pd.DataFrame(columns=['Date', 'SKU_Main', 'Ads_Amount'])
+    if not df_ads_raw.empty:
+        col_cost = next((c for c in ['จำนวนเงินที่ใช้จ่ายไป (THB)', 'Cost', 'Amount'] if c in df_ads_raw.columns), None)
+        col_date = next((c for c in ['วัน', 'Date'] if c in df_ads_raw.columns), None)
+        col_camp = next((c for c in ['ชื่อแคมเปญ', 'Campaign'] if c in df_ads_raw.columns), None)
+
+        if col_cost and col_date and col_camp:
+            df_ads_raw['Date'] = df_ads_raw[col_date]
+            df_ads_raw = df_ads_raw.dropna(subset=['Date'])
+            df_ads_raw[col_cost] = df_ads_raw[col_cost].fillna(0)
+            df_ads_raw['SKU_Extracted'] = df_ads_raw[col_camp].astype(str).str.extract(r'\[(.*?)\]')
+            df_ads_raw['SKU_Main'] = df_ads_raw['SKU_Extracted'].str.replace(' ', '', regex=False)
+            
+            df_ads_agg = df_ads_raw.groupby(['Date', 'SKU_Main'])[col_cost].sum().reset_index(name='Ads_Amount')
+
+    return df_ads_agg
+
+def cost_orders(sales, df_master, df_fix_cost):
+    # ขั้นคำนวณต้นทุน/รวมยอดรายวัน จากผลของ prepare_sales + MASTER ที่เตรียมแล้ว
+    # แต่ละขั้นย่อยแยกเป็นฟังก์ชันเพื่อวัดเวลาแยกกันได้ (benchmarks/bench_pipeline.py)
+    df_merged, sku_report = merge_master(sales['orders'], df_master)
+    df_daily = aggregate_daily(aggregate_orders(apply_costs(df_merged)), sales['ads'])
+    sku_map, sku_list, sku_type_map = build_sku_maps(df_daily, df_master)
+    return finish_outputs(df_daily, df_fix_cost, sku_map, sku_list, sku_type_map, sku_report)
+
+def merge_master(df, df_master):
+    # --- 3. MERGE WITH MASTER ITEM ---
+    master_cols = ['SKU', 'ชื่อสินค้า', 'Type', 'ต้นทุน', 'ราคากล่อง', 'ค่าส่งเฉลี่ย',
+                   'ค่าคอมมิชชั่น Admin', 'ค่าคอมมิชชั่น Telesale',
+                   'J&T Express', 'Flash Express', 'ThailandPost', 
+                   'DHL_1', 'LEX TH', 'SPX Express',
+                   'Express Delivery - ส่งด่วน', 'Standard Delivery - ส่งธรรมดาในประเทศ']
+    
+    master_cols = [c for c in master_cols if c in df_master.columns]
+    df_master_filtered = df_master[master_cols]
+
+    # จับคู่ SKU ครั้งเดียวต่อค่าที่ไม่ซ้ำ แล้วดึงค่าจาก MASTER มาทุกบรรทัดด้วย index เดียว (แทนการ merge 2 รอบ)
+    sku_codes, sku_resolved, sku_report = resolve_skus(df['รูปแบบสินค้า'].astype(str).str.strip(), df_master_filtered)
+    df_merged = df.reset_index(drop=True)
+    df_merged = pd.concat([df_merged, sku_resolved.reindex(sku_codes).reset_index(drop=True)], axis=1)
+
+    if 'ชื่อสินค้า_Master' in df_merged.columns:
+        if 'ชื่อสินค้า' in df.columns:
+            df_merged['ชื่อสินค้า'] = df_merged['ชื่อสินค้า_Master'].combine_first(df_merged['Name_Root']).combine_first(df_merged['ชื่อสินค้า'])
+        else:
+            df_merged['ชื่อสินค้า'] = df_merged['Name_Root'].combine_first(df_merged['ชื่อสินค้า_Master'])
+
+    return df_merged, sku_report
+
+def apply_costs(df_merged):
+    # --- 4. CALCULATE COST ---
+    numeric_cols = ['จำนวน', 'รายละเอียดยอดที่ชำระแล้ว', 'ต้นทุน', 'ราคากล่อง', 'ค่าส่งเฉลี่ย']
+    for col in numeric_cols:
+        if col in df_merged.columns:
+            df_merged[col] = safe_float_series(df_merged[col])
+    
+    df_merged['CAL_COST'] = df_merged['จำนวน'] * df_merged['ต้นทุน']
+    df_merged['BOX_COST_PER_LINE'] = df_merged['ราคากล่อง'].fillna(0)
+    df_merged['DELIV_COST_PER_LINE'] = df_merged['ค่าส่งเฉลี่ย'].fillna(0)
+
+    def text_col(col):
+        if col not in df_merged.columns: return pd.Series('', index=df_merged.index)
+        return df_merged[col].astype(str)
+
+    def contains_any(texts, terms):
+        hit = np.zeros(len(texts), dtype=bool)
+        for term in terms: hit |= texts.str.contains(term, regex=False, na=False).to_numpy(dtype=bool)
+        return hit
+
+    # เรท % ขนส่ง: ชื่อขนส่งที่ตรงกับคอลัมน์ใน Master ใช้คอลัมน์นั้น ไม่ตรงใช้ Standard Delivery
+    couriers = normalize_courier_series(text_col('บริษัทขนส่ง').str.strip())
+    rate_source = [c if c in df_merged.columns else DEFAULT_COURIER for c in couriers.categories]
+    rate_cols = list(dict.fromkeys(rate_source))
+    if len(df_merged) and rate_cols:
+        rates = np.column_stack([safe_float_series(df_merged[c]).to_numpy() if c in df_merged.columns
+                                 else np.zeros(len(df_merged)) for c in rate_cols])
+        rate_idx = np.array([rate_cols.index(c) for c in rate_source])
+        df_merged['SHIP_PERCENT'] = rates[np.arange(len(df_merged)), rate_idx[couriers.codes]]
+    else:
+        df_merged['SHIP_PERCENT'] = 0.0
+
+    is_cod = contains_any(text_col('วิธีการชำระเงิน').str.lower(), ['cod', 'ปลายทาง'])
+    df_merged['CAL_COD_COST'] = np.where(is_cod & (df_merged['SHIP_PERCENT'] > 0),
+                                         df_merged['รายละเอียดยอดที่ชำระแล้ว'] * df_merged['SHIP_PERCENT'] * 1.07, 0)
+
+    work_type = text_col('ประเภทการทำงาน').str.lower()
+    creator = text_col('ผู้สร้างคำสั่งซื้อ').str.lower()
+    is_admin = contains_any(work_type, ['admin', 'แอดมิน']) | contains_any(creator, ['admin'])
+    is_tele = contains_any(work_type, ['tele', 'เทเล']) | contains_any(creator, ['tele'])
+    df_merged['Calculated_Role'] = np.select([is_admin, is_tele], ['Admin', 'Telesale'], default='Unknown')
+
+    com_admin = safe_float_series(df_merged['ค่าคอมมิชชั่น Admin']) if 'ค่าคอมมิชชั่น Admin' in df_merged.columns else 0
+    com_tele = safe_float_series(df_merged['ค่าคอมมิชชั่น Telesale']) if 'ค่าคอมมิชชั่น Telesale' in df_merged.columns else 0
+
+    df_merged['CAL_COM_ADMIN'] = np.where((df_merged['Calculated_Role'] == 'Admin'), 
+                                          df_merged['รายละเอียดยอดที่ชำระแล้ว'] * com_admin, 0)
+    df_merged['CAL_COM_TELESALE'] = np.where((df_merged['Calculated_Role'] == 'Telesale'), 
+                                             df_merged['รายละเอียดยอดที่ชำระแล้ว'] * com_tele, 0)
+
+    df_merged['SKU_Main'] = df_merged['SKU_Norm_Root']
+    df_merged['Display_Name'] = df_merged['ชื่อสินค้า']
+
+    return df_merged
+
+def aggregate_orders(df_merged):
+    # --- AGGREGATE ---
+    order_agg = {
+        'Date': 'first',
+        'SKU_Main': 'first',
+        'ชื่อสินค้า': 'first',
+        'จำนวน': 'sum',
+        'รายละเอียดยอดที่ชำระแล้ว': 'sum',
+        'CAL_COST': 'sum', 
+        'BOX_COST_PER_LINE': 'max', 
+        'DELIV_COST_PER_LINE': 'max',
+        'CAL_COD_COST': 'sum',
+        'CAL_COM_ADMIN': 'sum',
+        'CAL_COM_TELESALE': 'sum',
+        'Type': 'first'
+    }
+
+    df_order = df_merged.groupby('หมายเลขคำสั่งซื้อออนไลน์').agg(order_agg).reset_index()
+    df_order.rename(columns={'BOX_COST_PER_LINE': 'BOX_COST', 'DELIV_COST_PER_LINE': 'DELIV_COST'}, inplace=True)
+
+    return df_order
+
+def aggregate_daily(df_order, df_ads_agg):
+    # --- FINAL DAILY AGG ---
+    daily_agg = {
+        'ชื่อสินค้า': 'first',
+        'จำนวนออเดอร์': 'count',
+        'จำนวน': 'sum',
+        'รายละเอียดยอดที่ชำระแล้ว': 'sum',
+        'CAL_COST': 'sum',
+        'BOX_COST': 'sum',
+        'DELIV_COST': 'sum',
+        'CAL_COD_COST': 'sum',
+        'CAL_COM_ADMIN': 'sum',
+        'CAL_COM_TELESALE': 'sum',
+        'Type': 'first'
+    }
+
+    df_order_renamed = df_order.rename(columns={'หมายเลขคำสั่งซื้อออนไลน์': 'จำนวนออเดอร์'})
+    df_daily = df_order_renamed.groupby(['Date', 'SKU_Main']).agg(daily_agg).reset_index()
+
+    if not df_ads_agg.empty:
+        df_daily = pd.merge(df_daily, df_ads_agg, on=['Date', 'SKU_Main'], how='outer')
+    else: df_daily['Ads_Amount'] = 0
+
+    df_daily = df_daily.fillna(0)
+    df_daily['Other_Costs'] = df_daily['BOX_COST'] + df_daily['DELIV_COST'] + df_daily['CAL_COD_COST'] + df_daily['CAL_COM_ADMIN'] + df_daily['CAL_COM_TELESALE']
+    df_daily['Total_Cost'] = df_daily['CAL_COST'] + df_daily['Other_Costs'] + df_daily['Ads_Amount']
+    df_daily['Net_Profit'] = df_daily['รายละเอียดยอดที่ชำระแล้ว'] - df_daily['Total_Cost']
+
+    df_daily = compact_daily(df_daily)
+
+    return df_daily
+
+def build_sku_maps(df_daily, df_master):
+    # --- MAPPING ---
+    sku_map = df_daily.groupby('SKU_Main', observed=True)['ชื่อสินค้า'].last().to_dict()
+    master_skus_set = set()
+    if not df_master.empty and 'SKU' in df_master.columns:
+        master_skus_set = set(df_master['SKU'].astype(str).str.strip().str.replace(' ', '', regex=False))
+        if 'ชื่อสินค้า' in df_master.columns:
+            temp_master = df_master.copy()
+            temp_master['SKU_Norm'] = temp_master['SKU'].astype(str).str.strip().str.replace(' ', '', regex=False)
+            sku_map.update(temp_master.set_index('SKU_Norm')['ชื่อสินค้า'].to_dict())
+    
+    daily_skus_set = set(df_daily['SKU_Main'].unique())
+    sku_list = sorted(list(daily_skus_set.union(master_skus_set)))
+
+    sku_type_map = {}
+    if not df_master.empty and 'SKU' in df_master.columns and 'Type' in df_master.columns:
+        temp_master = df_master.copy()
+        temp_master['SKU_Norm'] = temp_master['SKU'].astype(str).str.strip().str.replace(' ', '', regex=False)
+        sku_type_map = temp_master.set_index('SKU_Norm')['Type'].to_dict()
+    
+    if 'Type' in df_daily.columns:
+        daily_type_map = df_daily.groupby('SKU_Main', observed=True)['Type'].first().to_dict()
+        for k, v in daily_type_map.items():
+            if k not in sku_type_map:
+                sku_type_map[k] = v
+            elif pd.isna(sku_type_map[k]) or sku_type_map[k] == '':
+                sku_type_map[k] = v
+
+    return sku_map, sku_list, sku_type_map
+
+def finish_outputs(df_daily, df_fix_cost, sku_map, sku_list, sku_type_map, sku_report):
+    # ส่วนที่สร้างจาก df_daily + SKU maps ได้เสมอ (ใช้ทั้งหลังคำนวณต้นทุนและตอนเปิด snapshot จากดิสก์)
+    rollups = build_rollups(df_daily)
+    check_rollups(df_daily, rollups)
+    return {'df_daily': df_daily, 'df_fix_cost': df_fix_cost, 'sku_map': sku_map, 'sku_list': sku_list,
+            'sku_type_map': sku_type_map, 'sku_dim': build_sku_dim(sku_list, sku_map, sku_type_map),
+            'sku_report': sku_report, 'rollups': rollups, 'range_sums': RangeSums(df_daily)}
+
+def process_data(source=None, stages=None, cache_dir=CACHE_DIR):
+    # stages: StageCache ที่ใช้ข้ามรอบ เพื่อข้ามขั้นที่ input ไม่เปลี่ยน (None = คำนวณใหม่ทุกขั้น)
+    # cache_dir: แคชไฟล์ที่ parse แล้ว (None = ไม่ใช้แคช)
+    if source is None: source = get_data_source()
+    if stages is None: stages = StageCache()
+
+    def read_master():
+        # รันคู่ขนานกับขั้น sales นอก StageCache (ต้องอ่านใหม่ทุกรอบเพื่อดูว่า MASTER เปลี่ยนไหม) จึงจับเวลาแยกไว้เอง
+        t0 = time.perf_counter()
+        try: return source.read_master()
+        finally: stages.timings['read_master'] = time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        fut_master = pool.submit(read_master)
+        files_data, files_ads = list_export_files(source)
+        sales_key = (source.name, files_key(files_data), files_key(files_ads))
+        sales = stages.get('sales', sales_key, lambda: prepare_sales(*load_export_files(source, files_data, files_ads, cache_dir=cache_dir)))
+        df_master, df_fix_cost = fut_master.result()
+
+    if sales is None:
+        return {'df_daily': pd.DataFrame(), 'df_fix_cost': pd.DataFrame(), 'sku_map': {}, 'sku_list': [],
+                'sku_type_map': {}, 'sku_dim': build_sku_dim([], {}, {}),
+                'sku_report': pd.DataFrame(), 'rollups': {}, 'range_sums': None, 'version': None}
+
+    master_key = (frame_key(df_master), frame_key(df_fix_cost))
+    df_master = stages.get('master', master_key, lambda: prepare_master(df_master))
+    costing_key = (sales_key, master_key)
+    data = stages.get('costing', costing_key, lambda: cost_orders(sales, df_master, df_fix_cost))
+    return dict(data, version=content_version(costing_key))
+
+# ------------------------------
+# DISK SNAPSHOT (ผลของ process_data ชุดล่าสุดบนดิสก์ รีสตาร์ทแล้วเปิดหน้าได้ทันทีไม่ต้องรอโหลดจาก Drive)
+# ------------------------------
+# df_daily เก็บเป็น Arrow IPC ไม่บีบอัด เปิดด้วย memory-map แล้วแปลงแบบ split_blocks (ไม่รวมคอลัมน์เป็น block ใหญ่)
+#   คอลัมน์ตัวเลข/วันที่จึงเป็น view บนไฟล์ที่ map ไว้ ไม่ต้อง copy ทั้งตารางเข้าหน่วยความจำตอนรีสตาร์ท
+#   (ไฟล์ที่ถูก prune ขณะยัง map อยู่: Linux/macOS ยังอ่านได้จนเลิกใช้ / Windows ลบไม่ได้ จะถูกลบตอน prune รอบถัดไป)
+#   คอลัมน์ category เก็บเป็นรหัส (codes) เพราะบางคอลัมน์มีทั้ง 0 และข้อความปนกัน ซึ่ง Arrow เก็บตรงๆ ไม่ได้
+# ส่วนที่เล็ก (df_fix_cost, sku_report, SKU maps, dtype ของ category) เก็บเป็น pickle แบบเดียวกับ ParsedFileCache
+# snapshot.json ชี้ไปที่ไฟล์ชุดล่าสุด เขียนหลังไฟล์ข้อมูลเสร็จแล้วเสมอ (os.replace) ชุดที่เขียนไม่จบจึงไม่ถูกอ่าน
+# ชุดที่ SNAPSHOT_VERSION / READ_SPEC_VERSION / แหล่งข้อมูลไม่ตรงกับตอนนี้จะไม่ถูกใช้
+# แอปและ `python pipeline.py` (cron) เขียน/อ่านโฟลเดอร์เดียวกันได้พร้อมกัน:
+#   เขียนข้อมูลลงไฟล์ชั่วคราวชื่อไม่ซ้ำ (mkstemp) นอก lock แล้วค่อยถือ snapshot.lock ตอนสลับไฟล์เข้าที่ + ลบชุดเก่า
+#   ฝั่งอ่านถือ lock เดียวกันตอนเปิดไฟล์ จึงไม่เจอ manifest ที่ชี้ไปยังไฟล์ที่ถูกลบไปแล้ว
+SNAPSHOT_VERSION = "1"  # เปลี่ยนค่านี้เมื่อเปลี่ยนรูปแบบไฟล์ snapshot หรือคอลัมน์ของ df_daily
+STALE_TMP_SECONDS = 3600  # ไฟล์ชั่วคราวที่เก่ากว่านี้ (ผู้เขียนตายกลางทาง) ลบทิ้งตอน prune
+
+@contextmanager
+def file_lock(path):
+    # lock ข้าม process ด้วยไฟล์ (fcntl บน Linux/macOS, msvcrt บน Windows) ใช้ได้ข้าม thread ด้วย
+    with open(path, "a+b") as fp:
+        if os.name == "nt":
+            fp.seek(0)
+            msvcrt.locking(fp.fileno(), msvcrt.LK_LOCK, 1)
+        else: fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+        try: yield
+        finally:
+            if os.name == "nt":
+                fp.seek(0)
+                msvcrt.locking(fp.fileno(), msvcrt.LK_UNLCK, 1)
+            else: fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+class DiskSnapshot:
+    def __init__(self, snap_dir, source_id):
+        self.snap_dir = snap_dir
+        self.source_id = source_id
+        self.manifest_path = os.path.join(snap_dir, "snapshot.json")
+        self.lock_path = os.path.join(snap_dir, "snapshot.lock")
+        self.version = f"{SNAPSHOT_VERSION}:{READ_SPEC_VERSION}"
+        self.saved_key = None
+        self.last_error = None # exception ของการเขียนครั้งล่าสุด (save ไม่ raise เพื่อไม่ให้การรีเฟรชล้มเพราะดิสก์)
+
+    def load(self):
+        # คืน (data แบบเดียวกับ process_data, built_at) ของชุดล่าสุด หรือ None ถ้าไม่มี/ใช้ไม่ได้
+        if not os.path.exists(self.manifest_path): return None
+        try:
+            with file_lock(self.lock_path):
+                with open(self.manifest_path, encoding="utf-8") as fp: manifest = json.load(fp)
+                if manifest.get('version') != self.version or manifest.get('source') != self.source_id: return None
+                meta = pd.read_pickle(os.path.join(self.snap_dir, manifest['meta']))
+                table = pa.ipc.open_file(pa.memory_map(os.path.join(self.snap_dir, manifest['daily']))).read_all()
+            df_daily = table.to_pandas(split_blocks=True)
+            for col, dtype in meta.pop('category_dtypes').items():
+                df_daily[col] = pd.Categorical.from_codes(df_daily[col], dtype=dtype)
+            data = finish_outputs(df_daily, **meta)
+            data['version'] = manifest['key']
+        except: return None
+        self.saved_key = manifest.get('key')
+        return data, manifest['built_at']
+
+    def load_newer(self, snapshot):
+        # ใช้เป็น poll ของ DataRefresher: คืน (data, built_at) ถ้าชุดบนดิสก์เป็นคนละชุดและใหม่กว่า snapshot ที่ใช้อยู่ ไม่งั้น None
+        # อ่านแค่ snapshot.json ก่อน ชุดเดิม (รวมชุดที่ process นี้เพิ่งเขียนเอง) จึงไม่ต้องเปิดไฟล์ข้อมูลซ้ำ
+        try:
+            with open(self.manifest_path, encoding="utf-8") as fp: manifest = json.load(fp)
+        except: return None
+        if snapshot is not None:
+            if manifest.get('key') == snapshot['data'].get('version'): return None
+            if manifest.get('built_at', 0) <= snapshot['built_at']: return None
+        return self.load()
+
+    def save(self, data, key):
+        # key: key ของขั้น 'costing' ถ้าเท่ากับชุดที่เก็บไว้แล้วไม่ต้องเขียนซ้ำ
+        # คืน True เมื่อเขียนชุดใหม่ False เมื่อข้าม (ไม่มีข้อมูล / ชุดเดิม) หรือเขียนไม่สำเร็จ (ดู last_error)
+        self.last_error = None
+        if key is None or data['df_daily'].empty: return False
+        key = content_version(key)
+        if key == self.saved_key: return False
+        built_at = time.time()
+        files = {'daily': f"daily-{key[:12]}.arrow", 'meta': f"meta-{key[:12]}.pkl"}
+        df_daily = data['df_daily']
+        category_dtypes = {col: df_daily[col].dtype for col in df_daily.columns if isinstance(df_daily[col].dtype, pd.CategoricalDtype)}
+        tmp = {}
+        try:
+            os.makedirs(self.snap_dir, exist_ok=True)
+            for name in ('daily', 'meta', 'manifest'): tmp[name] = self._mkstemp()
+            table = pa.Table.from_pandas(df_daily.assign(**{col: df_daily[col].cat.codes for col in category_dtypes}), preserve_index=False)
+            # เขียนไฟล์ชั่วคราวแล้ว os.replace: process อื่นที่ memory-map ไฟล์ชื่อเดิมอยู่ยังอ่านของเดิมได้ (ไม่ถูกเขียนทับกลางทาง)
+            with pa.OSFile(tmp['daily'], 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer: writer.write_table(table)
+            meta = {name: data[name] for name in ('df_fix_cost', 'sku_map', 'sku_list', 'sku_type_map', 'sku_report')}
+            pd.to_pickle(dict(meta, category_dtypes=category_dtypes), tmp['meta'])
+            with open(tmp['manifest'], "w", encoding="utf-8") as fp:
+                json.dump(dict(files, version=self.version, source=self.source_id, key=key, built_at=built_at), fp)
+            with file_lock(self.lock_path):
+                for name in files: os.replace(tmp[name], os.path.join(self.snap_dir, files[name]))
+                os.replace(tmp['manifest'], self.manifest_path)
+                self._prune()
+        except Exception as e:
+            self.last_error = e
+            for path in tmp.values():
+                try: os.remove(path)
+                except: pass
+            return False
+        self.saved_key = key
+        return True
+
+    def _mkstemp(self):
+        fd, path = tempfile.mkstemp(dir=self.snap_dir, suffix=".tmp")
+        os.close(fd)
+        return path
+
+    def _prune(self):
+        # เรียกขณะถือ lock: อ่าน manifest ปัจจุบันใหม่แล้วเก็บไฟล์ที่มันชี้ไว้ ไฟล์ .arrow/.pkl อื่นเป็นชุดเก่าทั้งหมด
+        try:
+            with open(self.manifest_path, encoding="utf-8") as fp: manifest = json.load(fp)
+        except: return
+        keep = {manifest.get('daily'), manifest.get('meta')}
+        now = time.time()
+        for name in os.listdir(self.snap_dir):
+            path = os.path.join(self.snap_dir, name)
+            try:
+                stale_tmp = name.endswith('.tmp') and now - os.path.getmtime(path) > STALE_TMP_SECONDS
+                if stale_tmp or (name.endswith(('.arrow', '.pkl')) and name not in keep): os.remove(path)
+            except: pass
+
+# ------------------------------
+# DATA REFRESHER (โหลดข้อมูลใหม่เบื้องหลัง ระหว่างนั้นใช้ชุดเดิมไปก่อน)
+# ------------------------------
+REFRESH_INTERVAL = 600 # วินาที
+REFRESH_DEBOUNCE = 30 # วินาที: กดรีเฟรชซ้ำภายในช่วงนี้หลังโหลดเสร็จจะใช้ชุดเดิม
+SNAPSHOT_POLL_INTERVAL = 30 # วินาที: ตรวจว่ามีชุดใหม่บนดิสก์ (จาก `python pipeline.py`) หรือยัง
+
+class DataRefresher:
+    # เก็บผลของ build_fn ชุดล่าสุดที่สร้างเสร็จแล้วไว้ในหน่วยความจำ ทุก session อ่านชุดเดียวกัน
+    # เธรดเบื้องหลังสร้างชุดใหม่ทุก interval วินาที แล้วสลับเข้าไปทีเดียวเมื่อเสร็จ (ระหว่างนั้นยังใช้ชุดเดิม)
+    # ถ้าสร้างไม่สำเร็จจะเก็บ error ไว้และใช้ชุดเดิมต่อ
+    # การสร้างเป็นแบบ single-flight: ทั้ง process มีได้ครั้งละ 1 รอบ ผู้เรียนคนอื่นรอรอบเดียวกันหรือรับชุดเดิมไป
+    # warm_start: ฟังก์ชันคืน (data, built_at) ชุดเก่าจากดิสก์หรือ None ใช้เป็นชุดแรกก่อนสร้างเอง แล้วสั่งซิงก์เบื้องหลังทันที
+    # poll: ฟังก์ชันรับ snapshot ปัจจุบัน คืน (data, built_at) ชุดที่ใหม่กว่าซึ่ง process อื่นสร้างไว้ (เช่น cron) หรือ None
+    #   เธรดเบื้องหลังเรียกทุก poll_interval วินาที เจอชุดใหม่ก็สลับเข้ามาเลยและเลื่อนรอบสร้างเองออกไปอีก interval
+    # build_fn=None: ไม่สร้างเองใน process นี้ (snapshot-only) refresh() และรอบเบื้องหลังใช้ poll อย่างเดียว
+    def __init__(self, build_fn, interval=REFRESH_INTERVAL, warm_start=None, poll=None, poll_interval=SNAPSHOT_POLL_INTERVAL):
+        if build_fn is None and poll is None: raise ValueError("ต้องมี build_fn หรือ poll อย่างน้อยหนึ่งอย่าง")
+        self.build_fn = build_fn
+        self.interval = interval
+        self.warm_start = warm_start
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.snapshot = None # {'data': ผลของ build_fn, 'built_at': epoch วินาที, 'duration': วินาที, 'from_disk': ชุดจาก warm_start}
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._inflight = None # threading.Event ของรอบที่กำลังสร้างอยู่
+        self._started = 0 # จำนวนรอบที่เริ่มสร้างแล้ว (เลขรอบล่าสุด)
+        self._finished = 0 # เลขรอบล่าสุดที่สร้างเสร็จ (สำเร็จหรือไม่ก็ตาม)
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def refreshing(self):
+        return self._inflight is not None
+
+    def refresh(self, wait=True, debounce=0, fresh=False):
+        # wait=False: ถ้ามีรอบอื่นกำลังสร้างอยู่และมีชุดเดิมแล้ว คืนชุดเดิมทันทีไม่ต้องรอ
+        # debounce: ถ้าชุดปัจจุบันเพิ่งสร้างเสร็จไม่เกิน debounce วินาที ไม่สร้างใหม่
+        # fresh=True: ต้องได้ชุดที่เริ่มสร้างหลังจากเรียก (เช่น หลังบันทึก MASTER) ถ้ามีรอบเก่าค้างอยู่ให้รอแล้วสร้างต่ออีกรอบ
+        #   ผู้เรียน fresh หลายคนที่รอรอบเก่าเดียวกันใช้รอบถัดไปรอบเดียวร่วมกัน
+        need = None
+        while True:
+            with self._lock:
+                snap = self.snapshot
+                if snap is not None and debounce and time.time() - snap['built_at'] < debounce: return snap
+                if need is None: need = self._started + 1
+                inflight = self._inflight
+                if inflight is None:
+                    self._inflight = threading.Event()
+                    self._started += 1
+                    build_no = self._started
+
+            if inflight is None: break
+            if snap is not None and not wait: return snap
+            inflight.wait()
+            if fresh and self._finished < need: continue
+            if self.snapshot is None: raise self.last_error
+            return self.snapshot
+
+        t0 = time.monotonic()
+        try:
+            if self.build_fn is not None:
+                data = self.build_fn()
+                self.snapshot = {'data': data, 'built_at': time.time(), 'duration': time.monotonic() - t0}
+            else:
+                loaded = self.poll(self.snapshot)
+                if loaded is not None: self.snapshot = self._from_disk(loaded, time.monotonic() - t0)
+                if self.snapshot is None: raise RuntimeError("ยังไม่มีข้อมูลบนดิสก์ (รัน python pipeline.py ก่อน)")
+            self.last_error = None
+        except Exception as e:
+            self.last_error = e
+            if self.snapshot is None: raise
+        finally:
+            with self._lock:
+                done, self._inflight = self._inflight, None
+                self._finished = build_no
+            done.set()
+        return self.snapshot
+
+    def get(self):
+        snap = self.snapshot
+        if snap is None and self.warm_start is not None: snap = self._warm()
+        if snap is None: snap = self.refresh()
+        self.start()
+        return snap
+
+    def _warm(self):
+        # อ่านจากดิสก์ครั้งเดียวต่อ process (session ที่เข้ามาพร้อมกันรอคนแรกอ่านเสร็จ)
+        # ล้าง warm_start หลังตั้ง snapshot แล้วเท่านั้น: ระหว่างอ่าน get() ของ session อื่นยังเห็น warm_start จึงมารอที่ lock
+        # แทนที่จะไปสร้างชุดใหม่เองทั้งชุด
+        with self._lock:
+            if self.warm_start is None or self.snapshot is not None: return self.snapshot
+            try:
+                loaded = self.warm_start()
+                if loaded is not None: self.snapshot = self._from_disk(loaded, 0.0)
+            finally:
+                self.warm_start = None
+        if loaded is not None: self.refresh_async()
+        return self.snapshot
+
+    @staticmethod
+    def _from_disk(loaded, duration):
+        return {'data': loaded[0], 'built_at': loaded[1], 'duration': duration, 'from_disk': True}
+
+    def _poll_newer(self):
+        # คืน True เมื่อสลับเป็นชุดใหม่จาก poll (ไม่สลับระหว่างที่กำลังสร้างเอง เพราะรอบนั้นจะได้ชุดที่ใหม่กว่าอยู่แล้ว)
+        snap = self.snapshot
+        if snap is None or self._inflight is not None: return False
+        t0 = time.monotonic()
+        loaded = self.poll(snap)
+        if loaded is None: return False
+        with self._lock:
+            if self.snapshot is not snap or self._inflight is not None: return False
+            self.snapshot = self._from_disk(loaded, time.monotonic() - t0)
+        return True
+
+    def refresh_async(self):
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="data-refresher", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        # snapshot-only: รอบปกติคือ poll ทุก poll_interval / มีทั้งสองอย่าง: poll ทุก poll_interval และสร้างเองทุก interval
+        interval = self.interval if self.build_fn is not None else self.poll_interval
+        next_build = time.monotonic() + interval
+        while True:
+            timeout = next_build - time.monotonic()
+            if self.poll is not None and self.build_fn is not None: timeout = min(timeout, self.poll_interval)
+            woke = self._wake.wait(max(timeout, 0))
+            self._wake.clear()
+            try:
+                if woke or time.monotonic() >= next_build:
+                    next_build = time.monotonic() + interval
+                    self.refresh(wait=False)
+                elif self._poll_newer(): next_build = time.monotonic() + interval
+            except: pass
+
+# ------------------------------
+# CLI: python pipeline.py [--data-dir โฟลเดอร์] [--credentials ไฟล์] [--cache-dir โฟลเดอร์]
+# ------------------------------
+# รัน process_data ครบชุดนอกเว็บ (เช่นจาก cron) แล้วเขียน snapshot ลงดิสก์ให้แอปเปิดใช้ได้ทันทีตอนเริ่ม
+# พิมพ์เวลาที่ใช้แต่ละขั้น: sales = ดึงรายการ + โหลด/parse ไฟล์ JST/ADS + เตรียมคอลัมน์,
+#   read_master = อ่าน MASTER_ITEM / FIX_COST (รันคู่ขนานกับ sales ผลรวมจึงมากกว่า total ได้), master, costing, snapshot
+# exit code 1 เฉพาะเมื่อเขียน snapshot ไม่สำเร็จ (ไม่มีข้อมูลหรือชุดเดิมอยู่แล้ว = ไม่ต้องเขียน ถือว่าสำเร็จ)
+CLI_STAGES = ['sales', 'read_master', 'master', 'costing']
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="โหลดและคำนวณข้อมูลร้านค้า แล้วเขียน snapshot สำหรับแอป")
+    parser.add_argument("--data-dir", default=None, help="โฟลเดอร์ข้อมูลบนเครื่อง (ค่าเริ่มต้น: SHOP_DATA_DIR หรือ Google Drive)")
+    parser.add_argument("--credentials", default=SECRETS_PATH, help="secrets.toml หรือ JSON ของ service account (ใช้เมื่ออ่านจาก Drive)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="โฟลเดอร์แคช (ไฟล์ที่ parse แล้ว + snapshot)")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    source = get_data_source(lambda: load_credentials(args.credentials), args.data_dir)
+    stages = StageCache()
+    data = process_data(source, stages, cache_dir=args.cache_dir)
+    total = time.perf_counter() - t0
+    for stage in CLI_STAGES:
+        if stage in stages.timings: print(f"{stage:<12}{stages.timings[stage]:8.2f} s")
+    print(f"{'total':<12}{total:8.2f} s  ({len(data['df_daily'])} แถว, {len(data['sku_list'])} SKU)")
+
+    disk = DiskSnapshot(os.path.join(args.cache_dir, "snapshot"), data_source_id(args.data_dir))
+    t0 = time.perf_counter()
+    written = disk.save(data, stages.key('costing'))
+    seconds = time.perf_counter() - t0
+    if disk.last_error is not None:
+        print(f"{'snapshot':<12}{seconds:8.2f} s  เขียนไม่สำเร็จ: {disk.last_error!r}", file=sys.stderr)
+        return 1
+    if written: print(f"{'snapshot':<12}{seconds:8.2f} s  -> {disk.manifest_path}")
+    else: print(f"{'snapshot':<12}{seconds:8.2f} s  ไม่ได้เขียน (ไม่มีข้อมูล)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,7 @@
+# ให้ import pipeline / app จาก root ของ repo และ synth_data จาก benchmarks/ ได้ไม่ว่าจะรัน pytest จากโฟลเดอร์ไหน
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
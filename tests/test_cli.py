@@ -0,0 +1,40 @@
+# ------------------------------
+# python pipeline.py: exit code และเวลาที่พิมพ์แต่ละขั้น
+# ------------------------------
+import glob
+import os
+
+from pipeline import main
+from synth_data import make_dataset
+
+def run(capsys, root, cache_dir):
+    code = main(["--data-dir", root, "--cache-dir", cache_dir])
+    out = capsys.readouterr()
+    return code, out.out, out.err
+
+def test_cli_writes_snapshot(tmp_path, capsys):
+    root, cache_dir = str(tmp_path / "data"), str(tmp_path / "cache")
+    make_dataset(root, months=1, orders_per_day=20, skus=10)
+    code, out, _ = run(capsys, root, cache_dir)
+    assert code == 0
+    stages = [line.split()[0] for line in out.splitlines()]
+    assert stages[:4] == ['sales', 'read_master', 'master', 'costing']
+    assert os.path.exists(os.path.join(cache_dir, "snapshot", "snapshot.json"))
+
+def test_cli_empty_data_is_not_a_failure(tmp_path, capsys):
+    root, cache_dir = str(tmp_path / "data"), str(tmp_path / "cache")
+    make_dataset(root, months=1, orders_per_day=20, skus=10)
+    for path in glob.glob(os.path.join(root, "sales", "*")) + glob.glob(os.path.join(root, "ads", "*")): os.remove(path)
+    code, out, _ = run(capsys, root, cache_dir)
+    assert code == 0
+    assert "read_master" in out
+    assert not os.path.exists(os.path.join(cache_dir, "snapshot", "snapshot.json"))
+
+def test_cli_save_error_fails(tmp_path, capsys):
+    root, cache_dir = str(tmp_path / "data"), str(tmp_path / "cache")
+    make_dataset(root, months=1, orders_per_day=20, skus=10)
+    os.makedirs(cache_dir)
+    with open(os.path.join(cache_dir, "snapshot"), "w") as fp: fp.write("")  # ไฟล์ขวางโฟลเดอร์ snapshot
+    code, _, err = run(capsys, root, cache_dir)
+    assert code == 1
+    assert "snapshot" in err
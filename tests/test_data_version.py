@@ -0,0 +1,35 @@
+# ------------------------------
+# version ของชุดข้อมูล (ใช้เป็น key ของแคชหน้าในแอป) ต้องเปลี่ยนเฉพาะเมื่อ input เปลี่ยน
+# ------------------------------
+import os
+
+import pandas as pd
+
+from pipeline import LocalFolderSource, StageCache, DiskSnapshot, process_data, data_source_id
+from synth_data import make_dataset
+
+def test_version_follows_content(tmp_path):
+    root = str(tmp_path / "data")
+    make_dataset(root, months=1, orders_per_day=20, skus=10)
+    cache_dir = str(tmp_path / "cache")
+    stages = StageCache()
+    first = process_data(LocalFolderSource(root), stages, cache_dir=cache_dir)
+    assert first['version']
+
+    # รีเฟรชซ้ำโดยไม่มีอะไรเปลี่ยน (ทั้ง StageCache เดิมและ process ใหม่) ได้เวอร์ชันเดิม
+    assert process_data(LocalFolderSource(root), stages, cache_dir=cache_dir)['version'] == first['version']
+    assert process_data(LocalFolderSource(root), StageCache(), cache_dir=cache_dir)['version'] == first['version']
+
+    # ชุดที่เปิดจาก snapshot บนดิสก์ได้เวอร์ชันเดียวกับชุดที่คำนวณ (warm start -> ซิงก์รอบแรกไม่ล้างแคชหน้า)
+    disk = DiskSnapshot(str(tmp_path / "snapshot"), data_source_id(root))
+    disk.save(first, stages.key('costing'))
+    loaded, _ = DiskSnapshot(str(tmp_path / "snapshot"), data_source_id(root)).load()
+    assert loaded['version'] == first['version']
+
+    # แก้ MASTER_ITEM แล้วเวอร์ชันเปลี่ยน
+    master_path = os.path.join(root, "MASTER_ITEM.xlsx")
+    sheets = pd.read_excel(master_path, sheet_name=None)
+    sheets['MASTER_ITEM'].loc[0, 'ทุน'] += 1
+    with pd.ExcelWriter(master_path) as writer:
+        for name, df in sheets.items(): df.to_excel(writer, sheet_name=name, index=False)
+    assert process_data(LocalFolderSource(root), stages, cache_dir=cache_dir)['version'] != first['version']
@@ -0,0 +1,65 @@
+# ------------------------------
+# build_day_matrix ต้องได้ตัวเลขเดียวกับลูปเดิมของหน้า REPORT_MONTH / REPORT_ADS (กรองทีละวัน ทีละ SKU)
+# ------------------------------
+import numpy as np
+import pandas as pd
+
+from pipeline import build_day_matrix, compact_daily, slice_dates
+
+TOTAL_COLS = ['รายละเอียดยอดที่ชำระแล้ว', 'จำนวนออเดอร์', 'Net_Profit', 'Ads_Amount']
+
+def make_daily(seed=0):
+    # df_daily ขนาดเล็ก: เว้นบางวันไม่มีข้อมูลเลย มีแถวซ้ำวัน/SKU เดียวกัน และ SKU ที่ไม่อยู่ในรายการที่เลือก
+    rng = np.random.default_rng(seed)
+    days = [d for d in pd.date_range('2025-03-01', '2025-03-20') if d.day not in (4, 5, 11)]
+    rows = []
+    for d in days:
+        for sku in rng.choice(['A01', 'B02', 'C03', 'D04', 'OTHER'], size=rng.integers(1, 7)):
+            rows.append({'Date': d, 'SKU_Main': sku,
+                         'รายละเอียดยอดที่ชำระแล้ว': rng.uniform(0, 5000), 'จำนวนออเดอร์': int(rng.integers(0, 20)),
+                         'Net_Profit': rng.uniform(-800, 1500), 'Ads_Amount': rng.uniform(0, 300)})
+    return compact_daily(pd.DataFrame(rows))
+
+def loop_reference(df, dates, skus, value_col, total_cols):
+    # ลูปเดิม: กรอง df ทีละวัน แล้วทีละ SKU ในวันนั้น
+    totals, grid = [], []
+    for d in dates:
+        day_data = df[df['Date'] == d]
+        totals.append([day_data[c].sum() for c in total_cols])
+        grid.append([day_data[day_data['SKU_Main'] == sku][value_col].sum() for sku in skus])
+    return np.array(totals, dtype=float).reshape(len(dates), len(total_cols)), np.array(grid, dtype=float).reshape(len(dates), len(skus))
+
+def check(df, dates, skus, value_col, total_cols):
+    day_totals, sku_grid = build_day_matrix(df, dates, skus, value_col, total_cols)
+    ref_totals, ref_grid = loop_reference(df, dates, skus, value_col, total_cols)
+    assert list(day_totals.index) == list(dates) and list(day_totals.columns) == total_cols
+    assert list(sku_grid.index) == list(dates) and list(sku_grid.columns) == list(skus)
+    np.testing.assert_allclose(day_totals.to_numpy(dtype=float), ref_totals, rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(sku_grid.to_numpy(dtype=float), ref_grid, rtol=1e-9, atol=1e-9)
+    return day_totals, sku_grid
+
+def test_report_month_matrix():
+    df = make_daily()
+    dates = pd.date_range('2025-03-01', '2025-03-31')  # ต่อท้ายด้วยวันที่ไม่มีข้อมูล
+    day_totals, sku_grid = check(df, dates, ['A01', 'B02', 'C03', 'D04'], 'Net_Profit', TOTAL_COLS)
+    assert (day_totals.loc['2025-03-04'] == 0).all() and (sku_grid.loc['2025-03-25'] == 0).all()
+
+def test_report_ads_matrix_with_missing_skus():
+    df = make_daily(1)
+    skus = ['D04', 'NOT_SOLD', 'A01', 'ZZ9']  # SKU ที่ไม่มีในข้อมูลต้องเป็นคอลัมน์ 0
+    _, sku_grid = check(df, pd.date_range('2025-02-25', '2025-03-10'), skus, 'Ads_Amount', ['Ads_Amount'])
+    assert (sku_grid['NOT_SOLD'] == 0).all() and (sku_grid['ZZ9'] == 0).all()
+    assert (sku_grid.loc[:'2025-02-28'] == 0).all().all()
+
+def test_sliced_view_and_object_skus():
+    # หน้า report ส่ง df ที่ slice ตามช่วงวันที่แล้ว / SKU เป็น object แทน category ก็ต้องได้ผลเดียวกัน
+    df = make_daily(2)
+    dates = pd.date_range('2025-03-06', '2025-03-15')
+    view = slice_dates(df, dates[0].date(), dates[-1].date())
+    check(view, dates, ['C03', 'A01', 'B02'], 'Net_Profit', TOTAL_COLS)
+    check(view.assign(SKU_Main=view['SKU_Main'].astype(object)), dates, ['C03', 'A01'], 'Net_Profit', TOTAL_COLS)
+
+def test_empty_inputs():
+    df = make_daily()
+    check(df.iloc[:0], pd.date_range('2025-03-01', '2025-03-03'), ['A01'], 'Net_Profit', TOTAL_COLS)
+    check(df, pd.date_range('2025-03-01', '2025-03-03'), [], 'Net_Profit', TOTAL_COLS)
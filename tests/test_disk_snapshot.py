@@ -0,0 +1,95 @@
+# ------------------------------
+# DiskSnapshot: แอปกับ python pipeline.py เขียนโฟลเดอร์ snapshot เดียวกันพร้อมกันได้
+# ------------------------------
+import json
+import multiprocessing
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from pipeline import LocalFolderSource, StageCache, DiskSnapshot, process_data, data_source_id
+from synth_data import make_dataset
+
+ROUNDS = 30
+
+@pytest.fixture(scope="module")
+def datasets(tmp_path_factory):
+    # ผลของ process_data 2 ชุดที่ต่างกัน (Net_Profit รวมไม่เท่ากัน) ใช้แทนผลจากสองผู้เขียน
+    root = str(tmp_path_factory.mktemp("data"))
+    make_dataset(root, months=1, orders_per_day=20, skus=10)
+    data_a = process_data(LocalFolderSource(root), StageCache(), cache_dir=None)
+    data_b = dict(data_a, df_daily=data_a['df_daily'].assign(Net_Profit=data_a['df_daily']['Net_Profit'] + 1))
+    return data_a, data_b
+
+def save_rounds(snap_dir, tag, data, errors):
+    disk = DiskSnapshot(snap_dir, "src")
+    for i in range(ROUNDS):
+        if not disk.save(data, (tag, i)): errors.put(repr(disk.last_error))
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="ต้องใช้ fork")
+def test_two_savers_and_a_reader(tmp_path, datasets):
+    # ผู้เขียน 2 process (เหมือนแอป + cron) เขียนชุดต่างกันสลับกันหลายรอบ ระหว่างนั้นอ่านวนไปเรื่อยๆ
+    snap_dir = str(tmp_path / "snapshot")
+    profits = {round(float(d['df_daily']['Net_Profit'].sum()), 6) for d in datasets}
+    ctx = multiprocessing.get_context("fork")
+    errors = ctx.Queue()
+    writers = [ctx.Process(target=save_rounds, args=(snap_dir, tag, data, errors)) for tag, data in zip("ab", datasets)]
+    for p in writers: p.start()
+
+    disk, loads, misses = DiskSnapshot(snap_dir, "src"), [], 0
+    while any(p.is_alive() for p in writers):
+        published = os.path.exists(os.path.join(snap_dir, "snapshot.json"))
+        loaded = disk.load()
+        if loaded is not None: loads.append(round(float(loaded[0]['df_daily']['Net_Profit'].sum()), 6))
+        elif published: misses += 1
+    for p in writers: p.join(60)
+
+    assert all(p.exitcode == 0 for p in writers)
+    assert errors.empty()
+    assert misses == 0  # มี manifest แล้วต้องอ่านได้เสมอ (ไม่เจอไฟล์ที่อีกฝั่งเพิ่งลบ)
+    assert loads and set(loads) <= profits  # ทุกครั้งที่อ่านได้ต้องเป็นชุดที่สมบูรณ์ของผู้เขียนคนใดคนหนึ่ง
+    with open(os.path.join(snap_dir, "snapshot.json"), encoding="utf-8") as fp: manifest = json.load(fp)
+    assert sorted(os.listdir(snap_dir)) == sorted([manifest['daily'], manifest['meta'], "snapshot.json", "snapshot.lock"])
+    loaded, _ = DiskSnapshot(snap_dir, "src").load()
+    assert loaded['version'] == manifest['key']
+
+def test_save_skips_and_stale_tmp(tmp_path, datasets):
+    snap_dir = str(tmp_path / "snapshot")
+    disk = DiskSnapshot(snap_dir, data_source_id(None))
+    assert disk.save(datasets[0], ("a",))
+    assert not disk.save(datasets[0], ("a",))  # ชุดเดิม ไม่ต้องเขียนซ้ำ
+    assert disk.last_error is None
+
+    stale = os.path.join(snap_dir, "tmpdead.tmp")
+    with open(stale, "w") as fp: fp.write("x")
+    os.utime(stale, (0, 0))
+    assert disk.save(datasets[1], ("b",))
+    assert not os.path.exists(stale)
+
+def test_load_round_trip_without_copy(tmp_path, datasets):
+    data = datasets[0]
+    assert DiskSnapshot(str(tmp_path / "snapshot"), "src").save(data, ("a",))
+    before = pa.total_allocated_bytes()
+    loaded, _ = DiskSnapshot(str(tmp_path / "snapshot"), "src").load()
+    arrow_alloc = pa.total_allocated_bytes() - before
+    pd.testing.assert_frame_equal(loaded['df_daily'], data['df_daily'])
+    # คอลัมน์ตัวเลขเป็น view บนไฟล์ที่ map ไว้: ไม่ได้ copy ทั้งตารางเข้า memory pool ของ Arrow
+    assert arrow_alloc < data['df_daily'].memory_usage().sum() / 4
+
+def test_load_newer(tmp_path, datasets):
+    # poll ของแอป: เปิดชุดบนดิสก์เฉพาะเมื่อเป็นคนละชุดและใหม่กว่าที่ใช้อยู่
+    snap_dir = str(tmp_path / "snapshot")
+    app_disk, cli_disk = DiskSnapshot(snap_dir, "src"), DiskSnapshot(snap_dir, "src")
+    assert app_disk.load_newer(None) is None  # ยังไม่มีอะไรบนดิสก์
+    assert app_disk.save(datasets[0], ("a",))
+    data, built_at = app_disk.load_newer(None)
+    current = {'data': data, 'built_at': built_at}
+    assert app_disk.load_newer(current) is None  # ชุดเดิม
+    assert app_disk.load_newer({'data': dict(data, version="other"), 'built_at': built_at + 1}) is None  # บนดิสก์เก่ากว่า
+
+    assert cli_disk.save(datasets[1], ("b",))
+    newer, newer_at = app_disk.load_newer(current)
+    assert newer_at > built_at
+    pd.testing.assert_frame_equal(newer['df_daily'], datasets[1]['df_daily'])
@@ -0,0 +1,125 @@
+# ------------------------------
+# DriveSource + load_export_files: ดาวน์โหลดพร้อมกันด้วย Drive service ปลอม
+# ------------------------------
+import threading
+import time
+
+import httplib2
+import pytest
+
+from pipeline import DriveSource, list_export_files, load_export_files
+
+class FakeDrive:
+    # service ปลอมของ Drive v3 เท่าที่ DriveSource ใช้: files().list(...).execute() / files().get_media(fileId)
+    # ไฟล์แต่ละไฟล์มีเวลาดาวน์โหลด (delay) ของตัวเอง ไฟล์ใน failing ตอบ HTTP 500
+    def __init__(self, folders, page_size=2, failing=()):
+        self.folders = folders  # {folder_id: [(name, content bytes, delay), ...]}
+        self.page_size = page_size
+        self.failing = set(failing)
+        self.by_id = {name: (content, delay) for files in folders.values() for name, content, delay in files}
+        self.active = 0
+        self.max_active = 0
+        self.downloaded = []
+        self._lock = threading.Lock()
+
+    def files(self):
+        return self
+
+    def list(self, q, fields, pageSize, pageToken=None):
+        folder = q.split("'")[1]
+        start = int(pageToken or 0)
+        page = self.folders[folder][start:start + self.page_size]
+        result = {'files': [{'id': name, 'name': name, 'modifiedTime': "2025-01-01T00:00:00Z"} for name, _, _ in page]}
+        if start + self.page_size < len(self.folders[folder]): result['nextPageToken'] = str(start + self.page_size)
+        return Call(result)
+
+    def get_media(self, fileId):
+        return MediaRequest(self, fileId)
+
+    def request(self, uri, method="GET", **kwargs):
+        # เรียกจาก MediaIoBaseDownload.next_chunk (ผ่าน request.http)
+        content, delay = self.by_id[uri]
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try: time.sleep(delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.downloaded.append(uri)
+        if uri in self.failing: return httplib2.Response({'status': '500'}), b"backend error"
+        return httplib2.Response({'status': '200', 'content-length': str(len(content))}), content
+
+class Call:
+    def __init__(self, result): self.result = result
+    def execute(self): return self.result
+
+class MediaRequest:
+    def __init__(self, drive, file_id):
+        self.http = drive
+        self.uri = file_id
+        self.headers = {}
+
+def sales_csv(i):
+    return f"หมายเลขคำสั่งซื้อออนไลน์,เวลาสั่งซื้อ,จำนวน,รายละเอียดยอดที่ชำระแล้ว\n{i},2025-01-{i % 28 + 1:02d} 10:00:00,1,\"1,000\"\n".encode("utf-8")
+
+def ads_csv(i):
+    return f"วัน,ชื่อแคมเปญ,จำนวนเงินที่ใช้จ่ายไป (THB)\n2025-01-01,[SKU{i}],{i}\n".encode("utf-8")
+
+def make_source(n_data=12, n_ads=4, failing=()):
+    # ไฟล์แรกในรายการช้าที่สุด จึงดาวน์โหลดเสร็จย้อนลำดับกับรายการ
+    folders = {
+        'F_DATA': [(f"JST_{i:02d}.csv", sales_csv(i), 0.02 + 0.01 * (n_data - i)) for i in range(n_data)],
+        'F_ADS': [(f"ADS_{i:02d}.csv", ads_csv(i), 0.01 * (n_ads - i)) for i in range(n_ads)],
+    }
+    drive = FakeDrive(folders, failing=failing)
+    source = DriveSource(service_factory=lambda: drive, gc=object(), folder_data='F_DATA', folder_ads='F_ADS')
+    return source, drive
+
+def test_list_files_follows_pages():
+    source, _ = make_source(n_data=5)
+    files_data, files_ads = list_export_files(source)
+    assert [f['name'] for f in files_data] == [f"JST_{i:02d}.csv" for i in range(5)]
+    assert [f['name'] for f in files_ads] == [f"ADS_{i:02d}.csv" for i in range(4)]
+
+def test_results_follow_listing_order_and_worker_limit():
+    source, drive = make_source()
+    files_data, files_ads = list_export_files(source)
+    df_data, df_ads = load_export_files(source, files_data, files_ads, max_workers=3, cache_dir=None)
+    assert df_data['หมายเลขคำสั่งซื้อออนไลน์'].tolist() == [str(i) for i in range(12)]
+    assert df_data['รายละเอียดยอดที่ชำระแล้ว'].tolist() == [1000.0] * 12
+    assert df_ads['จำนวนเงินที่ใช้จ่ายไป (THB)'].tolist() == [0.0, 1.0, 2.0, 3.0]
+    assert drive.downloaded != [f['id'] for f in files_data + files_ads]  # เสร็จไม่ตรงลำดับรายการจริง
+    assert 1 < drive.max_active <= 3
+
+def test_single_worker_is_sequential():
+    source, drive = make_source(n_data=4, n_ads=2)
+    files_data, files_ads = list_export_files(source)
+    load_export_files(source, files_data, files_ads, max_workers=1, cache_dir=None)
+    assert drive.max_active == 1
+
+def test_failed_download_raises_instead_of_hanging():
+    source, drive = make_source(failing={"JST_05.csv"})
+    files_data, files_ads = list_export_files(source)
+    outcome = {}
+
+    def run():
+        try: load_export_files(source, files_data, files_ads, max_workers=3, cache_dir=None)
+        except Exception as e: outcome['error'] = e
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    t.join(10)
+    assert not t.is_alive()
+    assert isinstance(outcome.get('error'), RuntimeError)
+    assert "JST_05.csv" in str(outcome['error'])
+
+def test_failed_download_keeps_finished_files_in_cache(tmp_path):
+    source, drive = make_source(failing={"JST_05.csv"})
+    files_data, files_ads = list_export_files(source)
+    with pytest.raises(RuntimeError):
+        load_export_files(source, files_data, files_ads, max_workers=3, cache_dir=str(tmp_path))
+    drive.failing.clear()
+    drive.downloaded.clear()
+    df_data, _ = load_export_files(source, files_data, files_ads, max_workers=3, cache_dir=str(tmp_path))
+    assert df_data['หมายเลขคำสั่งซื้อออนไลน์'].tolist() == [str(i) for i in range(12)]
+    assert "JST_05.csv" in drive.downloaded and "JST_00.csv" not in drive.downloaded
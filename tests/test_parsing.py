@@ -0,0 +1,79 @@
+# ------------------------------
+# safe_float_series / safe_date_series ต้องได้ผลเหมือน safe_float / safe_date ที่เรียกทีละแถว
+# ------------------------------
+from datetime import date, datetime
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from pipeline import safe_float, safe_float_series, safe_date, safe_date_series
+
+def assert_same_floats(series):
+    got = safe_float_series(series)
+    assert got.dtype == float
+    assert got.index.equals(series.index)
+    np.testing.assert_array_equal(got.to_numpy(), series.map(safe_float).to_numpy(dtype=float))
+
+def test_float_text_values():
+    assert_same_floats(pd.Series([
+        '1,234.50', '12,345,678', '฿1,200', '฿ 99.5', ' 42 ', '1 000', '', ' ', '-', 'nan', 'NaN', 'None',
+        None, np.nan, '5%', '12.5 %', '%', '-3%', '1_000', '๑๒๓', '๑,๒๐๐.๕', '-1,500.25', '+7', '1e3',
+        'inf', 'abc', '12abc', '--5', '1,234.50',
+    ], dtype=object))
+
+def test_float_mixed_objects():
+    assert_same_floats(pd.Series([True, False, 3, 2.5, np.nan, None, '7', pd.NA], dtype=object))
+    assert_same_floats(pd.Series(['1,000', '2,000', None], dtype='str'))
+    assert_same_floats(pd.Series(pd.Categorical(['1,000', '5%', None, '1,000'])))
+
+def test_float_numeric_dtypes():
+    assert_same_floats(pd.Series([True, False, True]))
+    assert_same_floats(pd.Series([True, None], dtype='boolean'))
+    assert_same_floats(pd.Series([1, -2, 0], dtype='int64'))
+    assert_same_floats(pd.Series([1.5, np.nan, -0.25, np.inf]))
+    assert_same_floats(pd.Series([1, None, 3], dtype='Int64'))
+    assert_same_floats(pd.Series([1.5, None], dtype='Float64'))
+
+def test_float_empty():
+    assert_same_floats(pd.Series([], dtype=object))
+    assert_same_floats(pd.Series([None, np.nan, ''], dtype=object, index=[5, 7, 9]))
+
+def reference_dates(series):
+    # ผลของ safe_date ทีละแถว แปลงเป็น datetime64 แบบเดียวกับที่ pipeline ใช้ต่อ (None / นอกช่วง = NaT)
+    def to_ts(d):
+        if d is None or pd.isna(d): return pd.NaT
+        ts = pd.Timestamp(d)
+        return ts if pd.Timestamp.min <= ts <= pd.Timestamp.max else pd.NaT
+    return pd.Series([to_ts(safe_date(v)) for v in series], dtype='datetime64[ns]')
+
+def assert_same_dates(series):
+    got = safe_date_series(series)
+    assert str(got.dtype) == 'datetime64[ns]'
+    assert len(got) == len(series)
+    np.testing.assert_array_equal(got.to_numpy(), reference_dates(series).to_numpy())
+
+def test_date_formats_and_junk():
+    assert_same_dates(pd.Series([
+        '2025-01-05 13:45:00', '2025-01-05 13:45', '2025-01-05', '2025/01/05 08:00:01', '2025/01/05 08:00',
+        '2025/1/5', '05/01/2025', 'Jan 5, 2025', '2025-01-05 13:45:00', '', ' ', '-', 'abc', 'nan',
+        None, np.nan, '0001-01-01', '9999-12-31',
+    ], dtype=object))
+
+def test_mixed_objects():
+    assert_same_dates(pd.Series([pd.Timestamp('2025-03-01 10:00'), datetime(2025, 3, 2, 23, 59), date(2025, 3, 3),
+                                 '2025-03-04', 20250305, None], dtype=object))
+
+def test_datetime_dtypes():
+    s = pd.Series(pd.to_datetime(['2025-01-01 10:00', None, '2025-01-02 23:59']))
+    assert_same_dates(s)
+    got = safe_date_series(s.dt.tz_localize('Asia/Bangkok'))
+    np.testing.assert_array_equal(got.to_numpy(), reference_dates(s).to_numpy())
+
+def test_all_missing_column():
+    # CSV ที่คอลัมน์วันที่ว่างทั้งคอลัมน์ ต้องได้ NaT ทุกแถว ไม่ใช่ error (ไม่งั้นทั้งไฟล์ถูกทิ้ง)
+    blank = pd.read_csv(StringIO('a,b\n1,\n2,\n'))['b']
+    assert_same_dates(blank)
+    assert safe_date_series(blank).isna().all()
+    assert_same_dates(pd.Series([None, None], dtype=object))
+    assert_same_dates(pd.Series([], dtype=object))
@@ -0,0 +1,40 @@
+# ------------------------------
+# READ_SPECS: ไฟล์ ADS หัวคอลัมน์ภาษาอังกฤษ (Date/Campaign/Cost) ปนกับภาษาไทยในโฟลเดอร์เดียวกัน
+# ------------------------------
+import os
+
+import pandas as pd
+
+from pipeline import LocalFolderSource, list_export_files, load_export_files, aggregate_ads, read_export_file
+
+def write_ads(root, name, text):
+    os.makedirs(os.path.join(root, "ads"), exist_ok=True)
+    with open(os.path.join(root, "ads", name), "w", encoding="utf-8") as fp: fp.write(text)
+
+def test_mixed_header_ads_files(tmp_path):
+    # หัวคอลัมน์ถูกเลือกทีละไฟล์ แถวจากไฟล์ภาษาอังกฤษจึงไม่หายไป
+    # (เดิม concat ก่อนแล้วค่อยเลือกคอลัมน์ แถวของไฟล์ที่หัวไม่ตรงกับคอลัมน์ที่เลือกได้วันที่ว่างและถูกทิ้ง)
+    root = str(tmp_path)
+    write_ads(root, "ads_en.csv", "Date,Campaign,Cost\n2025-01-01,[SKU1] promo,100\n2025-01-02,[SKU2],\"1,250.50\"\n")
+    write_ads(root, "ads_th.csv", "วัน,ชื่อแคมเปญ,จำนวนเงินที่ใช้จ่ายไป (THB)\n2025-01-01,[SKU1],50\n2025-01-03,[SKU 3],7\n")
+    source = LocalFolderSource(root)
+    files_data, files_ads = list_export_files(source)
+    _, df_ads = load_export_files(source, files_data, files_ads, cache_dir=None)
+
+    assert list(df_ads.columns) == ['จำนวนเงินที่ใช้จ่ายไป (THB)', 'วัน', 'ชื่อแคมเปญ']
+    assert df_ads['จำนวนเงินที่ใช้จ่ายไป (THB)'].tolist() == [100.0, 1250.5, 50.0, 7.0]
+    assert df_ads['วัน'].notna().all()
+
+    agg = aggregate_ads(df_ads).sort_values(['Date', 'SKU_Main']).reset_index(drop=True)
+    assert agg['SKU_Main'].tolist() == ['SKU1', 'SKU2', 'SKU3']
+    assert agg['Ads_Amount'].tolist() == [150.0, 1250.5, 7.0]
+
+def test_header_priority_within_one_file(tmp_path):
+    # ไฟล์เดียวมีทั้งสองแบบ ใช้หัวที่อยู่ก่อนในรายการ (ภาษาไทย)
+    path = str(tmp_path / "ads.csv")
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write("วัน,Date,ชื่อแคมเปญ,Cost,จำนวนเงินที่ใช้จ่ายไป (THB),Extra\n2025-01-01,2025-02-01,[A],1,2,x\n")
+    df = read_export_file(path, "ads.csv", 'ads')
+    assert list(df.columns) == ['จำนวนเงินที่ใช้จ่ายไป (THB)', 'วัน', 'ชื่อแคมเปญ']
+    assert df['จำนวนเงินที่ใช้จ่ายไป (THB)'].tolist() == [2.0]
+    assert df['วัน'].tolist() == [pd.Timestamp("2025-01-01")]
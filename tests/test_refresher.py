@@ -0,0 +1,200 @@
+# ------------------------------
+# DataRefresher: single-flight / wait=False / fresh=True / poll (ชุดใหม่จาก process อื่น)
+# ------------------------------
+import threading
+import time
+
+import pytest
+
+from pipeline import DataRefresher
+
+N_CALLERS = 16
+
+class SlowSource:
+    # build_fn ปลอม: ช้า delay วินาที นับจำนวนครั้งที่ถูกเรียก คืนเลขรอบ (1, 2, ...)
+    def __init__(self, delay=0.3):
+        self.delay = delay
+        self.calls = 0
+        self.started = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            n = self.calls
+        self.started.set()
+        time.sleep(self.delay)
+        return n
+
+def run_together(fn, n=N_CALLERS):
+    # เรียก fn พร้อมกัน n thread (ปล่อยพร้อมกันด้วย Barrier) คืนผลของทุก thread
+    barrier = threading.Barrier(n)
+    results, errors = [None] * n, []
+
+    def worker(i):
+        barrier.wait()
+        try: results[i] = fn()
+        except Exception as e: errors.append(e)
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads: t.start()
+    for t in threads: t.join(10)
+    assert not errors
+    return results
+
+def in_background(fn):
+    out = {}
+    t = threading.Thread(target=lambda: out.setdefault('value', fn()))
+    t.start()
+    return t, out
+
+def test_concurrent_refresh_loads_once():
+    source = SlowSource()
+    refresher = DataRefresher(source, interval=3600)
+    results = run_together(refresher.refresh)
+    assert source.calls == 1
+    assert all(r is results[0] for r in results)
+    assert results[0]['data'] == 1
+    assert not refresher.refreshing
+
+def test_concurrent_get_loads_once():
+    source = SlowSource()
+    refresher = DataRefresher(source, interval=3600)
+    results = run_together(refresher.get)
+    assert source.calls == 1
+    assert all(r is results[0] for r in results)
+
+def test_concurrent_get_warm_start_reads_disk_once():
+    source = SlowSource()
+    warm_calls = []
+
+    def warm_start():
+        warm_calls.append(1)
+        time.sleep(0.1)
+        return 'from-disk', 1.0
+    refresher = DataRefresher(source, interval=3600, warm_start=warm_start)
+    results = run_together(refresher.get)
+    assert len(warm_calls) == 1
+    assert all(r is results[0] and r['data'] == 'from-disk' and r['from_disk'] for r in results)
+    # ชุดจากดิสก์สั่งซิงก์เบื้องหลังทันที 1 รอบ
+    deadline = time.time() + 5
+    while (source.calls == 0 or refresher.refreshing) and time.time() < deadline: time.sleep(0.01)
+    assert source.calls == 1
+    assert refresher.snapshot['data'] == 1
+
+def test_wait_false_returns_current_snapshot():
+    source = SlowSource()
+    refresher = DataRefresher(source, interval=3600)
+    first = refresher.refresh()
+    source.started.clear()
+    t, out = in_background(refresher.refresh)
+    assert source.started.wait(5)
+
+    t0 = time.monotonic()
+    results = run_together(lambda: refresher.refresh(wait=False))
+    assert time.monotonic() - t0 < source.delay
+    assert all(r is first for r in results)
+
+    t.join(5)
+    assert source.calls == 2
+    assert out['value']['data'] == 2
+    assert refresher.snapshot is out['value']
+
+def test_wait_false_without_snapshot_waits():
+    source = SlowSource()
+    refresher = DataRefresher(source, interval=3600)
+    results = run_together(lambda: refresher.refresh(wait=False))
+    assert source.calls == 1
+    assert all(r is results[0] and r['data'] == 1 for r in results)
+
+def test_fresh_waits_for_a_build_started_after_the_call():
+    source = SlowSource()
+    refresher = DataRefresher(source, interval=3600)
+    refresher.refresh()
+    source.started.clear()
+    t, out = in_background(refresher.refresh)  # รอบที่ 2 เริ่มก่อนเรียก fresh
+    assert source.started.wait(5)
+
+    snap = refresher.refresh(fresh=True)
+    t.join(5)
+    assert out['value']['data'] == 2
+    assert snap['data'] == 3
+    assert source.calls == 3
+
+def test_concurrent_fresh_share_one_new_build():
+    # ผู้เรียน fresh หลายคนระหว่างที่รอบเก่ากำลังสร้าง ต้องใช้รอบใหม่รอบเดียวร่วมกัน
+    source = SlowSource()
+    refresher = DataRefresher(source, interval=3600)
+    refresher.refresh()
+    source.started.clear()
+    t, out = in_background(refresher.refresh)
+    assert source.started.wait(5)
+
+    results = run_together(lambda: refresher.refresh(fresh=True), 8)
+    t.join(5)
+    assert source.calls == 3
+    assert all(r is results[0] and r['data'] == 3 for r in results)
+
+def test_fresh_without_inflight_builds_once():
+    source = SlowSource()
+    refresher = DataRefresher(source, interval=3600)
+    refresher.refresh()
+    assert refresher.refresh(fresh=True)['data'] == 2
+    assert source.calls == 2
+
+def test_failed_build_keeps_previous_snapshot():
+    calls = []
+
+    def build():
+        calls.append(1)
+        if len(calls) > 1: raise RuntimeError("drive down")
+        return 'ok'
+    refresher = DataRefresher(build, interval=3600)
+    first = refresher.refresh()
+    assert refresher.refresh() is first
+    assert isinstance(refresher.last_error, RuntimeError)
+
+class DiskDrop:
+    # poll ปลอม: publish() = มีชุดใหม่บนดิสก์ (เหมือน cron เขียน snapshot) คืนชุดที่ใหม่กว่า snapshot ปัจจุบันเท่านั้น
+    def __init__(self):
+        self.latest = None
+        self.calls = 0
+
+    def publish(self, data):
+        self.latest = (data, time.time())
+
+    def __call__(self, snap):
+        self.calls += 1
+        if self.latest is None or (snap is not None and self.latest[1] <= snap['built_at']): return None
+        return self.latest
+
+def wait_for(cond, timeout=5):
+    deadline = time.time() + timeout
+    while not cond() and time.time() < deadline: time.sleep(0.01)
+    return cond()
+
+def test_poll_swaps_in_newer_snapshot_without_building():
+    source, disk = SlowSource(0.01), DiskDrop()
+    refresher = DataRefresher(source, interval=3600, poll=disk, poll_interval=0.05)
+    assert refresher.get()['data'] == 1
+    disk.publish('from-cron')
+    assert wait_for(lambda: refresher.snapshot['data'] == 'from-cron')
+    assert refresher.snapshot['from_disk']
+    assert source.calls == 1
+
+def test_snapshot_only_never_builds():
+    disk = DiskDrop()
+    refresher = DataRefresher(None, poll=disk, poll_interval=0.05)
+    with pytest.raises(RuntimeError):
+        refresher.get()  # ยังไม่มีชุดบนดิสก์
+    disk.publish('v1')
+    assert refresher.get()['data'] == 'v1'
+    disk.publish('v2')
+    assert wait_for(lambda: refresher.snapshot['data'] == 'v2')  # เธรดเบื้องหลัง poll เอง
+    disk.publish('v3')
+    assert refresher.refresh()['data'] == 'v3'  # ปุ่มรีเฟรช = poll ทันที
+    assert refresher.refresh()['data'] == 'v3'
+    assert refresher.last_error is None
+
+def test_needs_build_fn_or_poll():
+    with pytest.raises(ValueError):
+        DataRefresher(None)